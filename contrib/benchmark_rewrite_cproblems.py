@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Benchmark for the rewriting of preprocessed C code before parsing it with pycparser.
+
+Compares the run time of tbf.utils._rewrite_cproblems with its original, regex-per-line
+implementation on a large preprocessed input, and checks that both produce the same output.
+
+Usage: contrib/benchmark_rewrite_cproblems.py [--size MB] [--repetitions N]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import timeit
+
+sys.path[:0] = [os.path.join(os.path.dirname(__file__), '..', 'lib', 'py'), os.path.join(os.path.dirname(__file__), '..')]
+
+import tbf.utils as utils  # noqa: E402
+
+HEADERS = ('stdio.h', 'stdlib.h', 'string.h', 'math.h', 'pthread.h', 'signal.h', 'wchar.h', 'sys/socket.h')
+
+
+def rewrite_cproblems_reference(content):
+    need_struct_body = False
+    skip_asm = False
+    in_attribute = False
+    in_cxx_comment = False
+    prepared_content = ''
+    for line in [c + "\n" for c in content.split('\n')]:
+        # remove C++-style comments
+        if in_cxx_comment:
+            if re.search(r'\*/', line):
+                line = re.sub(r'.*\*/', '', line)
+                in_cxx_comment = False
+            else:
+                line = ''
+        else:
+            line = re.sub(r'/\*.*?\*/', '', line)
+        if re.search(r'/\*', line):
+            line = re.sub(r'/\*.*', '', line)
+            in_cxx_comment = True
+        # remove __attribute__
+        line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\)\)\s*', '', line)
+        line = re.sub(r'__attribute__\s*\(\(.*\)\)\s*', '', line)
+        if re.search(r'__attribute__\s*\(\(', line):
+            line = re.sub(r'__attribute__\s*\(\(.*', '', line)
+            in_attribute = True
+        elif in_attribute:
+            line = re.sub(r'.*\)\)', '', line)
+            in_attribute = False
+        # rewrite some GCC extensions
+        line = re.sub(r'__extension__', '', line)
+        line = re.sub(r'__restrict', '', line)
+        line = re.sub(r'__restrict__', '', line)
+        line = re.sub(r'__inline__', '', line)
+        line = re.sub(r'__inline', '', line)
+        line = re.sub(r'__const', 'const', line)
+        line = re.sub(r'__signed__', 'signed', line)
+        line = re.sub(r'__builtin_va_list', 'int', line)
+        # a hack for some C-standards violating code in LDV benchmarks
+        if need_struct_body and re.match(r'^\s*}\s*;\s*$', line):
+            line = 'int __dummy; ' + line
+            need_struct_body = False
+        elif need_struct_body:
+            need_struct_body = re.match(r'^\s*$', line) is not None
+        elif re.match(r'^\s*struct\s+[a-zA-Z0-9_]+\s*{\s*$', line):
+            need_struct_body = True
+        # remove inline asm
+        if re.match(r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*$', line):
+            skip_asm = True
+        elif skip_asm and re.search(r'\)\s*;\s*$', line):
+            skip_asm = False
+            line = '\n'
+        if (skip_asm or re.match(
+                r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*\)\s*;\s*$',
+                line)):
+            line = '\n'
+        # remove asm renaming
+        line = re.sub(r'__asm__\s*\(""\s+"[a-zA-Z0-9_]+"\)', '', line)
+        prepared_content += line
+    return prepared_content
+
+
+def get_preprocessed_input(size):
+    source = ''.join('#include <{}>\n'.format(h) for h in HEADERS)
+    result = subprocess.run(['gcc', '-E', '-xc', '-std=gnu11', '-'], input=source,
+                            stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    repetitions = max(1, size * 1024 * 1024 // len(result.stdout))
+    return result.stdout * repetitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=10, help="approximate size of the input, in MB")
+    parser.add_argument('--repetitions', type=int, default=3, help="number of runs of each implementation")
+    args = parser.parse_args()
+
+    content = get_preprocessed_input(args.size)
+    print("Input: {:.1f} MB, {} lines".format(len(content) / 1024 / 1024, content.count('\n') + 1))
+
+    if rewrite_cproblems_reference(content) != utils._rewrite_cproblems(content):
+        sys.exit("Outputs differ")
+
+    reference_time = min(timeit.repeat(lambda: rewrite_cproblems_reference(content), number=1,
+                                       repeat=args.repetitions))
+    current_time = min(timeit.repeat(lambda: utils._rewrite_cproblems(content), number=1,
+                                     repeat=args.repetitions))
+    print("Reference: {:.3f}s".format(reference_time))
+    print("Current:   {:.3f}s".format(current_time))
+    print("Speedup:   {:.1f}x".format(reference_time / current_time))
+
+
+if __name__ == '__main__':
+    main()
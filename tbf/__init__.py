@@ -6,43 +6,37 @@ import multiprocessing.dummy as mp
 import os
 import shutil
 import sys
-from ctypes import c_bool
 from multiprocessing.context import TimeoutError
 from time import sleep
 
+import tbf.batch as batch
+import tbf.cache as cache
+import tbf.portfolio as portfolio
+import tbf.scheduling as scheduling
 import tbf.testcase_converter as testcase_converter
-import tbf.tools.afl as afl
-import tbf.tools.cpatiger as cpatiger
-import tbf.tools.crest as crest
-import tbf.tools.fshell as fshell
-import tbf.tools.klee as klee
-import tbf.tools.random_tester as random_tester
-import tbf.tools.dummy as dummy
+import tbf.tools as tools
 import tbf.utils as utils
-from tbf.testcase_processing import ProcessingConfig, ExecutionRunner
+from tbf.testcase_processing import ProcessingConfig, ExecutionRunner, DEFAULT_OUTPUT_LIMIT
+from tbf.utils import StopEvent
 
 __VERSION__ = "0.2-dev"
 
 
-XML_DIR = utils.get_output_path('test-suite')
+XML_DIR = 'test-suite'
 
+INPUT_GENERATORS = tools.BUILTIN_GENERATOR_NAMES
 
-class StopEvent(object):
+ORCHESTRATORS = ('threads', 'asyncio')
+DEFAULT_ORCHESTRATOR = 'threads'
 
-    def __init__(self, parent=None):
-        m = mp.Manager()
-        self.val = m.Value(c_bool, False)
-        self._parent = parent
 
-    def is_set(self):
-        return self.val.value or (self._parent and self._parent.val.value)
-
-    def set(self):
-        self.val.value = True
-
-
-def _create_cli_arg_parser():
+def _create_cli_arg_parser(batch_mode=False):
+    if batch_mode:
+        prog = 'tbf batch'
+    else:
+        prog = None
     parser = argparse.ArgumentParser(
+        prog=prog,
         description='An Automatic Test-Case Generation and Execution Framework',
         add_help=False)
 
@@ -57,8 +51,10 @@ def _create_cli_arg_parser():
         dest="input_generator",
         action="store",
         required=True,
-        choices=['afl', 'fshell', 'klee', 'crest', 'cpatiger', 'random', "dummy"],
-        help="input generator to use")
+        help="input generator to use, one of: " + ', '.join(INPUT_GENERATORS) +
+             ", or a generator registered for entry point group '" + tools.ENTRY_POINT_GROUP + "'" +
+             ". Multiple input generators can be given as comma-separated list" +
+             " to run them in parallel")
 
     input_generator_args.add_argument(
         "--use-existing-test-dir",
@@ -87,6 +83,31 @@ def _create_cli_arg_parser():
         "only expect methods to be non-deterministic according to sv-comp guidelines"
     )
 
+    input_generator_args.add_argument(
+        "--afl-instances",
+        dest="afl_instances",
+        action="store",
+        type=int,
+        default=1,
+        help="number of afl-fuzz instances to run in parallel, each pinned to its own CPU core. Default: 1")
+
+    input_generator_args.add_argument(
+        "--afl-persistent",
+        dest="afl_persistent",
+        action="store_true",
+        default=False,
+        help="run the program in afl's persistent mode, which handles many inputs in one process." +
+             " Requires afl-clang-fast")
+
+    input_generator_args.add_argument(
+        "--prtest-workers",
+        dest="prtest_workers",
+        action="store",
+        type=int,
+        default=1,
+        help="number of PRTest processes that create tests in parallel with different seeds"
+             " and shared coverage. Default: 1")
+
     validation_args = run_args.add_argument_group('Validation')
 
     validation_args.add_argument(
@@ -113,6 +134,62 @@ def _create_cli_arg_parser():
         "If no error was found and all test cases were handled, assume that the program under test is safe"
     )
 
+    validation_args.add_argument(
+        "--fork-server",
+        dest="fork_server",
+        action="store_true",
+        default=False,
+        help="start the test harness once and fork it for each test execution")
+
+    validation_args.add_argument(
+        "--binary-input",
+        dest="binary_input",
+        action="store_true",
+        default=False,
+        help="provide test inputs to the test harness in a binary format instead of line by line")
+
+    validation_args.add_argument(
+        "--validation-jobs",
+        dest="validation_jobs",
+        action="store",
+        type=int,
+        default=1,
+        help="number of test vectors to execute in parallel during validation. Default: 1")
+
+    validation_args.add_argument(
+        '--test-order',
+        dest='test_order',
+        choices=scheduling.POLICIES,
+        default=scheduling.DEFAULT_POLICY,
+        help="order in which pending tests are executed, if tests are created faster than they can be executed:"
+        " in order of intake (fifo), newest test files first (newest), shortest first (shortest),"
+        " tests marked as interesting by the test-case generator first (hints),"
+        " or tests with the most new inputs first (novelty). Default: " + scheduling.DEFAULT_POLICY)
+
+    validation_args.add_argument(
+        '--no-test-deduplication',
+        dest='deduplicate_tests',
+        action='store_false',
+        default=True,
+        help="execute all tests, even if they read the same inputs as an already executed test")
+
+    validation_args.add_argument(
+        '--test-output-limit',
+        dest='test_output_limit',
+        action='store',
+        type=int,
+        default=DEFAULT_OUTPUT_LIMIT,
+        help="maximum number of bytes of the output of a test execution that are kept."
+        " Only the last bytes are kept. Default: " + str(DEFAULT_OUTPUT_LIMIT))
+
+    validation_args.add_argument(
+        '--minimize-tests',
+        dest='minimize_tests',
+        action='store_true',
+        default=False,
+        help="reduce the created tests to a subset with the same branch coverage."
+        " The written test-format XML files are reduced accordingly")
+
     machine_model_args = run_args.add_mutually_exclusive_group()
     machine_model_args.add_argument(
         '-32',
@@ -149,6 +226,22 @@ def _create_cli_arg_parser():
         default=True,
         help="do not run input generation and tests in parallel")
 
+    run_args.add_argument(
+        '--orchestrator',
+        dest='orchestrator',
+        choices=ORCHESTRATORS,
+        default=DEFAULT_ORCHESTRATOR,
+        help="how to coordinate input generation and test processing: with threads that poll for changes"
+        " (threads), or with tasks on a single asyncio event loop that react to changes (asyncio)."
+        " Default: " + DEFAULT_ORCHESTRATOR)
+
+    run_args.add_argument(
+        '--no-compile-cache',
+        dest='use_compile_cache',
+        action='store_false',
+        default=True,
+        help="do not reuse compilation and parsing results of earlier runs, and do not store them")
+
     run_args.add_argument(
         '--keep-files',
         dest='keep_files',
@@ -204,7 +297,34 @@ def _create_cli_arg_parser():
         help="write test-format XML files for created tests"
     )
 
-    run_args.add_argument("file", type=str, help="file to verify")
+    if batch_mode:
+        batch_args = run_args.add_argument_group(
+            title="Batch args",
+            description="arguments for running tbf on many tasks")
+        batch_args.add_argument(
+            "--jobs",
+            '-j',
+            dest="jobs",
+            action="store",
+            type=int,
+            default=os.cpu_count(),
+            help="number of tasks to run in parallel. Default: number of CPUs")
+
+        batch_args.add_argument(
+            "--results-file",
+            dest="results_file",
+            action="store",
+            default=None,
+            help="file to write the aggregated results to. Default: " +
+                 batch.RESULTS_FILE + " in the output directory")
+
+        run_args.add_argument(
+            "task_lists",
+            type=str,
+            nargs='+',
+            help="task list or .set file with one file (or glob pattern) per line")
+    else:
+        run_args.add_argument("file", type=str, help="file to verify")
 
     args.add_argument(
         "--version", action="version", version='{}'.format(__VERSION__))
@@ -212,7 +332,7 @@ def _create_cli_arg_parser():
     return parser
 
 
-def _parse_cli_args(argv):
+def _parse_cli_args(argv, batch_mode=False):
     try:
         end_idx = argv.index('--')
         known_args = argv[:end_idx]
@@ -221,11 +341,18 @@ def _parse_cli_args(argv):
         known_args = argv
         input_gen_args = None
 
-    parser = _create_cli_arg_parser()
+    parser = _create_cli_arg_parser(batch_mode)
     args = parser.parse_args(known_args)
 
     args.ig_options = input_gen_args if input_gen_args else list()
 
+    generator_names = _get_input_generator_names(args)
+    for generator in generator_names:
+        if not tools.is_generator(generator):
+            parser.error("Unknown input generator: " + generator)
+    if len(set(generator_names)) < len(generator_names):
+        parser.error("Input generator given more than once: " + args.input_generator)
+
     args.timelimit = int(args.timelimit) if args.timelimit else None
     args.ig_timelimit = int(args.ig_timelimit) if args.ig_timelimit else None
     if not args.machine_model:
@@ -245,79 +372,115 @@ def _parse_cli_args(argv):
         else:
             args.existing_tests_dir = os.path.abspath(args.existing_tests_dir)
 
-    args.file = os.path.abspath(args.file)
+    if args.test_output_limit < len(utils.ERROR_STRING):
+        parser.error("Test output limit must be at least {} bytes".format(len(utils.ERROR_STRING)))
+    if args.validation_jobs < 1:
+        parser.error("Number of validation jobs must be at least 1")
+    if args.afl_instances < 1:
+        parser.error("Number of afl-fuzz instances must be at least 1")
+
+    if args.prtest_workers < 1:
+        parser.error("Number of PRTest workers must be at least 1")
+
+    if batch_mode:
+        if args.jobs is None or args.jobs < 1:
+            parser.error("Number of jobs must be at least 1")
+        args.task_lists = [os.path.abspath(t) for t in args.task_lists]
+    else:
+        args.file = os.path.abspath(args.file)
 
     return args
 
 
+def _get_input_generator_names(args):
+    return [g.strip().lower() for g in args.input_generator.split(',')]
+
+
 def _get_input_generator(args):
-    input_generator = args.input_generator.lower()
-
-    if input_generator == 'afl':
-        return afl.InputGenerator(args.machine_model, args.log_verbose, args.ig_options)
-
-    elif input_generator == 'fshell':
-        return fshell.InputGenerator(args.machine_model, args.log_verbose, args.ig_options)
-
-    elif input_generator == 'klee':
-        return klee.InputGenerator(
-            args.ig_timelimit,
-            args.log_verbose,
-            args.ig_options,
-            machine_model=args.machine_model)
-
-    elif input_generator == 'crest':
-        return crest.InputGenerator(
-            args.log_verbose,
-            args.ig_options,
-            machine_model=args.machine_model)
-
-    elif input_generator == 'cpatiger':
-        return cpatiger.InputGenerator(
-            args.ig_timelimit,
-            args.log_verbose,
-            args.ig_options,
-            machine_model=args.machine_model)
-
-    elif input_generator == 'random':
-        return random_tester.InputGenerator(args.machine_model, args.log_verbose, args.ig_options)
-
-    elif input_generator == "dummy":
-        return dummy.InputGenerator(
-            args.machine_model,
-            args.log_verbose,
-            args.ig_options
-        )
+    generator_names = _get_input_generator_names(args)
+    if len(generator_names) == 1:
+        return _create_input_generator(generator_names[0], args)
     else:
+        generators = [(n, _create_input_generator(n, args)) for n in generator_names]
+        return portfolio.PortfolioInputGenerator(generators)
+
+
+def _create_input_generator(input_generator, args):
+    generator = _create_input_generator_for_name(input_generator, args)
+    if args.use_compile_cache:
+        generator.compile_cache = cache.FileCache()
+    return generator
+
+
+def _create_input_generator_for_name(input_generator, args):
+    try:
+        generator_module = tools.get_generator(input_generator)
+    except KeyError:
         raise utils.ConfigError('Unhandled input generator: ' + input_generator)
+    return generator_module.create_input_generator(args)
+
+
+def _minimize_tests(args, test_processor, processing_result, filename, error_method, nondet_methods, timelimit):
+    """Reduce the created tests to a subset with the same branch coverage and return the statistics of minimization.
+
+    A test that reveals a bug is always kept.
+
+    :param timelimit: the time in seconds that minimization may take. If None, there is no limit.
+        Tests that aren't measured within this time are kept.
+    """
+    import tbf.minimization as minimization
+
+    test_vectors = test_processor.get_all_test_vectors(args.existing_tests_dir)
+    minimization_dir = os.path.abspath(utils.provide_directory('minimization'))
+    work_dir = os.path.abspath('.')
+    compile_cache = cache.FileCache() if args.use_compile_cache else None
+    minimizer = minimization.TestSuiteMinimizer(args.machine_model, compile_cache, args.test_output_limit)
+    stop_minimization_event = StopEvent()
+    stop_timer = None
+    if timelimit is not None:
+        stop_timer = utils.set_stop_timer(max(timelimit, 0), stop_minimization_event)
+    _change_dir(minimization_dir)
+    try:
+        selected_tests = minimizer.minimize(filename, test_vectors, error_method, nondet_methods,
+                                            stop_minimization_event)
+    finally:
+        if stop_timer is not None:
+            stop_timer.cancel()
+        _change_dir(work_dir)
+
+    if args.write_xml:
+        kept_tests = set(t.name for t in selected_tests)
+        if processing_result.is_positive():
+            kept_tests.add(processing_result.test_vector.name)
+        removed_tests = [t for t in test_vectors if t.name not in kept_tests]
+        minimization.remove_test_xmls(removed_tests, utils.get_output_path(XML_DIR))
+    return minimizer.statistics
 
 
 def _get_test_processor(args, write_xml, nondet_methods):
-    generator = args.input_generator.lower()
+    generator_names = _get_input_generator_names(args)
     processing_config = ProcessingConfig(args)
-    if generator == 'afl':
-        extractor = afl.AflTestConverter()
-    elif generator == "fshell":
-        extractor = fshell.FshellTestConverter(nondet_methods)
-    elif generator == 'klee':
-        extractor = klee.KleeTestConverter()
-    elif generator == 'crest':
-        extractor = crest.CrestTestConverter()
-    elif generator == 'cpatiger':
-        extractor = cpatiger.CpaTigerTestConverter()
-    elif generator == 'random':
-        extractor = random_tester.RandomTestConverter()
-    elif generator == "dummy":
-        extractor = dummy.DummyTestConverter()
+    if len(generator_names) == 1:
+        extractor = _create_test_converter(generator_names[0], args, nondet_methods)
     else:
-        raise AssertionError('Unhandled validator: ' + generator)
+        converters = [(n, _create_test_converter(n, args, nondet_methods), _get_tests_dir(n))
+                      for n in generator_names]
+        extractor = portfolio.PortfolioTestConverter(converters)
 
     if write_xml:
-        extractor = testcase_converter.XmlWritingTestConverter(extractor, XML_DIR)
+        extractor = testcase_converter.XmlWritingTestConverter(extractor, utils.get_output_path(XML_DIR))
 
     return testcase_processing.TestProcessor(processing_config, extractor)
 
 
+def _create_test_converter(generator, args, nondet_methods):
+    return tools.get_generator(generator).create_test_converter(args, nondet_methods)
+
+
+def _get_tests_dir(generator):
+    return tools.get_generator(generator).tests_dir
+
+
 def run(args, stop_all_event=None):
     """
     Runs tbf with the given arguments in the current working directory.
@@ -325,19 +488,22 @@ def run(args, stop_all_event=None):
 
     :param args:
     :param stop_all_event:
-    :return:
+    :return: the TBF verdict of the run
     """
     if args.use_error_method:
         error_method = args.error_method
     else:
         error_method = None
     default_err = "Unknown error"
+    run_watch = utils.Stopwatch()
+    run_watch.start()
 
     processing_result = utils.VerdictUnknown()
 
     filename = args.file
     processing_stats = None
     generator_stats = None
+    minimization_stats = None
     old_dir_abs = os.path.abspath('.')
     if args.keep_files:
         created_dir = utils.provide_directory(utils.get_output_path('created_files'))
@@ -355,7 +521,8 @@ def run(args, stop_all_event=None):
             error_method_exclude = ()
             specification = utils.get_coverage_spec()
 
-        nondet_methods = utils.find_nondet_methods(filename, args.svcomp_nondets_only, error_method_exclude)
+        nondet_methods = utils.find_nondet_methods(filename, args.svcomp_nondets_only, error_method_exclude,
+                                                   cache.FileCache() if args.use_compile_cache else None)
 
         input_generator = _get_input_generator(args)
         test_processor = _get_test_processor(args, args.write_xml, nondet_methods)
@@ -366,74 +533,98 @@ def run(args, stop_all_event=None):
                 input_generator.get_name(),
                 specification,
                 args.machine_model,
-                directory=XML_DIR
+                directory=utils.get_output_path(XML_DIR)
             )
 
         assert not stop_all_event.is_set(
         ), "Stop event is already set before starting input generation"
 
-        stop_input_generator_event = StopEvent(stop_all_event)
-        generator_pool = mp.Pool(processes=1)
-        if args.existing_tests_dir is None:
-            # Define the methods for running test generation and test processing in parallel/sequentially
-            if args.run_parallel and _is_processing_necessary(args):
-                generator_function = generator_pool.apply_async
+        if args.orchestrator == 'asyncio':
+            # asyncio takes long to import, so we only import it if necessary
+            import tbf.orchestration as orchestration
 
-                def get_generation_result(res):
-                    return res.get(3)
+            generation_result, (processing_result, processing_stats) = orchestration.AsyncioOrchestrator().run(
+                input_generator if args.existing_tests_dir is None else None,
+                test_processor,
+                filename,
+                error_method,
+                nondet_methods,
+                stop_all_event,
+                generation_timelimit=args.ig_timelimit,
+                tests_directory=args.existing_tests_dir,
+                sequential=not (args.run_parallel and _is_processing_necessary(args)))
+            generation_done = generation_result is not None
+            if generation_done:
+                generation_success, generator_stats = generation_result
+        else:
+            stop_input_generator_event = StopEvent(stop_all_event)
+            generator_pool = mp.Pool(processes=1)
+            if args.existing_tests_dir is None:
+                # Define the methods for running test generation and test processing in parallel/sequentially
+                if args.run_parallel and _is_processing_necessary(args):
+                    generator_function = generator_pool.apply_async
+
+                    def get_generation_result(res):
+                        return res.get(3)
+
+                    def is_ready0(r):
+                        return r.ready()
+                else:
+                    generator_function = generator_pool.apply
+
+                    def get_generation_result(res):
+                        return res
+
+                    def is_ready0(r):
+                        return True
+
+                if args.ig_timelimit:
+                    utils.set_stop_timer(args.ig_timelimit, stop_input_generator_event)
+                generation_result = generator_function(
+                    input_generator.generate_input,
+                    args=(filename, error_method, nondet_methods, stop_input_generator_event))
 
-                def is_ready0(r):
-                    return r.ready()
             else:
-                generator_function = generator_pool.apply
+                generation_result = None
 
                 def get_generation_result(res):
-                    return res
+                    return True, None
 
                 def is_ready0(r):
                     return True
 
-            if args.ig_timelimit:
-                utils.set_stop_timer(args.ig_timelimit, stop_input_generator_event)
-            generation_result = generator_function(
-                input_generator.generate_input,
-                args=(filename, error_method, nondet_methods, stop_input_generator_event))
-
-        else:
-            generation_result = None
-
-            def get_generation_result(res):
-                return True, None
-
-            def is_ready0(r):
-                return True
+            # We can't use a def here because we pass this function to a different function,
+            # in which the def wouldn't be defined
+            is_ready = lambda: is_ready0(generation_result)
 
-        # We can't use a def here because we pass this function to a different function,
-        # in which the def wouldn't be defined
-        is_ready = lambda: is_ready0(generation_result)
+            if stop_all_event.is_set():
+                stop_input_generator_event.set()
+                logging.info("Stop-all event is set, returning from execution")
+                return
 
-        if stop_all_event.is_set():
+            processing_result, processing_stats = test_processor.process_inputs(
+                filename, error_method, nondet_methods, is_ready, stop_all_event, args.existing_tests_dir)
             stop_input_generator_event.set()
-            logging.info("Stop-all event is set, returning from execution")
-            return
-
-        processing_result, processing_stats = test_processor.process_inputs(
-            filename, error_method, nondet_methods, is_ready, stop_all_event, args.existing_tests_dir)
-        stop_input_generator_event.set()
-        stop_all_event.set()
-        logging.debug("Processing terminated and got results")
-
-        try:
-            generation_success, generator_stats = get_generation_result(
-                generation_result)
-            generation_done = True
-        except TimeoutError:
-            logging.warning("Couldn't' get result of input generation")
-            generation_done = False
-            generator_pool.terminate()
-        logging.debug("Input generation terminated and got results")
+            stop_all_event.set()
+            logging.debug("Processing terminated and got results")
 
-        _change_dir(old_dir_abs)
+            try:
+                generation_success, generator_stats = get_generation_result(
+                    generation_result)
+                generation_done = True
+            except TimeoutError:
+                logging.warning("Couldn't' get result of input generation")
+                generation_done = False
+                generator_pool.terminate()
+            logging.debug("Input generation terminated and got results")
+
+        if args.minimize_tests:
+            minimization_timelimit = args.timelimit - run_watch.curr_s() if args.timelimit else None
+            minimization_stats = _minimize_tests(args, test_processor, processing_result, filename, error_method,
+                                                 nondet_methods, minimization_timelimit)
+
+        # We stay in the work directory until the final harness is compiled,
+        # so that the compiled program can be reused
         if processing_result.is_positive():
             test_name = os.path.basename(processing_result.test_vector.origin)
             persistent_test = utils.get_output_path(test_name)
@@ -445,13 +636,15 @@ def run(args, stop_all_event=None):
 
                 # Create an ExecutionRunner only for the purpose of
                 # compiling the persistent harness
-                validator_for_compilation = ExecutionRunner(args.machine_model,
-                                                            processing_result.test)
+                compile_cache = cache.FileCache() if args.use_compile_cache else None
+                validator_for_compilation = ExecutionRunner(args.machine_model, processing_result.test,
+                                                            compile_cache=compile_cache)
                 final_harness_name = utils.get_output_path('a.out')
                 validator_for_compilation.compile(filename, persistent_harness, final_harness_name)
 
         elif not generation_done:
             processing_result = utils.VerdictUnknown()
+        _change_dir(old_dir_abs)
 
     except utils.CompileError as e:
         # This is a proper error because the program can't be compiled, so no tests can be executed
@@ -473,6 +666,10 @@ def run(args, stop_all_event=None):
             if statistics:  # If other statistics are there, add some spacing
                 statistics += "\n\n"
             statistics += str(processing_stats)
+        if minimization_stats:
+            if statistics:
+                statistics += "\n\n"
+            statistics += str(minimization_stats)
 
         if not error_method:
             verdict = utils.DONE
@@ -494,6 +691,8 @@ def run(args, stop_all_event=None):
         if not args.keep_files:
             shutil.rmtree(work_dir, ignore_errors=True)
 
+    return verdict
+
 
 def _is_processing_necessary(arguments):
     return arguments.execution_validation or arguments.klee_replay_validation \
@@ -506,6 +705,15 @@ def _change_dir(directory):
 
 
 def main():
+    if sys.argv[1:2] == ['batch']:
+        return batch.main(sys.argv[2:])
+    if sys.argv[1:2] == ['serve']:
+        import tbf.server as server
+        return server.serve_main(sys.argv[2:])
+    if sys.argv[1:2] == ['submit']:
+        import tbf.server as server
+        return server.submit_main(sys.argv[2:])
+
     timeout_watch = utils.Stopwatch()
     timeout_watch.start()
 
@@ -1,3 +1,4 @@
+import codecs
 import re
 from abc import abstractmethod, ABCMeta
 
@@ -582,3 +583,108 @@ class FuncDeclCollector(a.NodeVisitor):
 
     def visit_Typedef(self, node):
         pass # Don't go deeper so we don't collect typedef functions
+
+
+class GlobalVariableCollector(a.NodeVisitor):
+    """Collects the declarations of all variables that are defined at file scope and are not constant."""
+
+    def __init__(self):
+        self.global_variables = []
+
+    def visit_FileAST(self, node):
+        for ext in node.ext:
+            if isinstance(ext, a.Decl) and ext.name and not isinstance(ext.type, a.FuncDecl) \
+                    and 'extern' not in ext.storage and not _is_constant(ext):
+                self.global_variables.append(ext)
+
+
+class StaticLocalVariableCollector(a.NodeVisitor):
+    """Collects the declarations of all variables that are declared static within a function."""
+
+    def __init__(self):
+        self.static_variables = []
+        self._in_function = False
+
+    def visit_FuncDef(self, node):
+        self._in_function = True
+        self.visit(node.body)
+        self._in_function = False
+
+    def visit_Decl(self, node):
+        if self._in_function and 'static' in node.storage and not isinstance(node.type, a.FuncDecl):
+            self.static_variables.append(node)
+        self.generic_visit(node)
+
+
+def _is_constant(decl):
+    if 'const' in decl.quals:
+        return True
+    node = decl.type
+    while isinstance(node, a.ArrayDecl):
+        node = node.type
+    return 'const' in getattr(node, 'quals', ())
+
+
+_COMPARISON_OPERATORS = ('==', '!=', '<', '<=', '>', '>=')
+
+
+class ComparisonConstantCollector(a.NodeVisitor):
+    """Collects the values of all constants that expressions are compared with, in order of appearance.
+
+    Case labels of switch statements count as comparisons.
+    """
+
+    def __init__(self):
+        self.constants = []
+
+    def _add(self, node):
+        value = get_constant_value(node)
+        if value is not None and value not in self.constants:
+            self.constants.append(value)
+
+    def visit_BinaryOp(self, node):
+        if node.op in _COMPARISON_OPERATORS:
+            self._add(node.left)
+            self._add(node.right)
+        self.generic_visit(node)
+
+    def visit_Case(self, node):
+        self._add(node.expr)
+        self.generic_visit(node)
+
+
+def get_constant_value(node):
+    """Return the value of the given constant expression as int or float,
+    or None if the node is no numeric constant."""
+    if type(node) is a.Cast:
+        return get_constant_value(node.expr)
+    elif type(node) is a.UnaryOp and node.op in ('-', '+'):
+        value = get_constant_value(node.expr)
+        if value is not None and node.op == '-':
+            value = -value
+        return value
+    elif type(node) is not a.Constant:
+        return None
+
+    literal = node.value
+    try:
+        if node.type == 'char':
+            character = codecs.decode(literal[1:-1], 'unicode_escape')
+            return ord(character) if len(character) == 1 else None
+        elif 'int' in node.type:
+            literal = literal.rstrip('uUlL')
+            if literal[:2] in ('0x', '0X'):
+                return int(literal, 16)
+            elif literal[:2] in ('0b', '0B'):
+                return int(literal, 2)
+            elif literal.startswith('0') and len(literal) > 1:
+                return int(literal, 8)
+            return int(literal)
+        elif node.type in ('float', 'double', 'long double'):
+            literal = literal.rstrip('fFlL')
+            if literal[:2] in ('0x', '0X'):
+                return float.fromhex(literal)
+            return float(literal)
+    except ValueError:
+        pass
+    return None
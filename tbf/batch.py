@@ -0,0 +1,190 @@
+"""Batch mode of tbf: runs tbf on many tasks with a bounded pool of worker processes.
+
+Each worker process imports tbf and its tools once and then handles
+one task after the other, so startup costs are only paid once per worker.
+"""
+
+import copy
+import csv
+import glob
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+from contextlib import redirect_stdout
+
+import tbf
+import tbf.utils as utils
+
+RESULTS_FILE = 'results.csv'
+TASK_OUTPUT_FILE = 'Output.txt'
+
+_RESULT_COLUMNS = ('task', 'verdict', 'walltime', 'output')
+
+
+def read_task_list(task_list):
+    """Return all task files described by the given task list.
+
+    A task list is either a plain text file or an SV-COMP `.set` file.
+    Each line of it is a file or a glob pattern, relative to
+    the directory of the task list.
+    Empty lines and lines starting with '#' are ignored.
+
+    :param str task_list: path to the task list
+    :return List[str]: absolute paths to the described task files, in the order given
+    """
+    base_dir = os.path.dirname(os.path.abspath(task_list))
+    tasks = list()
+    with open(task_list, 'r') as inp:
+        for line in inp:
+            pattern = line.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            pattern = os.path.join(base_dir, pattern)
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                logging.warning("No task matches pattern %s", pattern)
+            tasks += [os.path.abspath(m) for m in matches]
+    return tasks
+
+
+def get_tasks(task_lists):
+    """Return all task files described by the given task lists, without duplicates."""
+    tasks = list()
+    known_tasks = set()
+    for task_list in task_lists:
+        for task in read_task_list(task_list):
+            if task not in known_tasks:
+                known_tasks.add(task)
+                tasks.append(task)
+    return tasks
+
+
+def get_task_output_dir(base_dir, task_number, task):
+    task_name = os.path.basename(task)
+    return os.path.join(base_dir, "{:05d}-{}".format(task_number, task_name))
+
+
+def run_task(args, output_dir):
+    """Run tbf with the given arguments and write all output to the given directory.
+
+    :param args: parsed tbf arguments, with `args.file` set to the task
+    :param str output_dir: directory for all output files of this task
+    :return dict: the result of the run with entries 'task', 'verdict', 'walltime' and 'output'
+    """
+    utils.set_output_dir(output_dir)
+    stop_event = tbf.StopEvent()
+    if args.timelimit:
+        timer = threading.Timer(args.timelimit, stop_event.set)
+        timer.start()
+    else:
+        timer = None
+
+    stopwatch = utils.Stopwatch()
+    stopwatch.start()
+    verdict = None
+    try:
+        with open(utils.get_output_path(TASK_OUTPUT_FILE), 'w+') as outp:
+            with redirect_stdout(outp):
+                verdict = tbf.run(args, stop_event)
+    except Exception as e:
+        logging.error("Running tbf on %s failed: %s", args.file, e)
+        verdict = utils.ERROR
+    finally:
+        stopwatch.stop()
+        if timer:
+            timer.cancel()
+
+    return {
+        'task': args.file,
+        'verdict': verdict if verdict else utils.UNKNOWN,
+        'walltime': stopwatch.sum(),
+        'output': output_dir
+    }
+
+
+def _work(task_queue, result_queue):
+    for task_number, args, output_dir in iter(task_queue.get, None):
+        result = run_task(args, output_dir)
+        result_queue.put((task_number, result))
+
+
+def run_batch(args, tasks, output_dir):
+    """Run tbf on all given tasks, with at most `args.jobs` tasks in parallel.
+
+    :return List[dict]: the results of all tasks, in the order of the given tasks
+    """
+    task_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    for task_number, task in enumerate(tasks):
+        task_args = copy.copy(args)
+        task_args.file = task
+        task_queue.put((task_number, task_args,
+                        get_task_output_dir(output_dir, task_number, task)))
+
+    worker_number = min(args.jobs, len(tasks))
+    workers = list()
+    for _ in range(worker_number):
+        task_queue.put(None)
+        # Workers are no daemon processes because they may need to start processes themselves
+        worker = multiprocessing.Process(target=_work, args=(task_queue, result_queue))
+        worker.start()
+        workers.append(worker)
+
+    results = [None] * len(tasks)
+    finished = 0
+    try:
+        while finished < len(tasks):
+            try:
+                task_number, result = result_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(w.is_alive() for w in workers):
+                    logging.error("All workers terminated before all tasks were handled")
+                    break
+                continue
+            finished += 1
+            results[task_number] = result
+            logging.info("[%s/%s] %s: %s", finished, len(tasks), result['task'],
+                         result['verdict'])
+    finally:
+        for worker in workers:
+            worker.join()
+    return [r for r in results if r is not None]
+
+
+def write_results(results, results_file):
+    with open(results_file, 'w+', newline='') as outp:
+        writer = csv.DictWriter(outp, fieldnames=_RESULT_COLUMNS)
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+
+def main(argv):
+    args = tbf._parse_cli_args(argv, batch_mode=True)
+
+    if args.log_verbose:
+        logging.getLogger().setLevel(level=logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(level=logging.INFO)
+
+    tasks = get_tasks(args.task_lists)
+    if not tasks:
+        sys.exit("No tasks given.")
+
+    output_dir = utils.OUTPUT_DIR
+    if args.results_file:
+        results_file = os.path.abspath(args.results_file)
+    else:
+        results_file = utils.get_output_path(RESULTS_FILE)
+
+    logging.info("Running %s task(s) with %s job(s)", len(tasks), min(args.jobs, len(tasks)))
+    results = run_batch(args, tasks, output_dir)
+    write_results(results, results_file)
+
+    verdicts = [r['verdict'] for r in results]
+    print("Results written to " + results_file)
+    for verdict in sorted(set(verdicts)):
+        print("{}: {}".format(verdict, verdicts.count(verdict)))
@@ -0,0 +1,290 @@
+"""Local, content-addressed cache for the outputs of compilations and other expensive computations.
+
+Each entry of the cache holds either the output files of one compilation, or one JSON value.
+Compilation entries are identified by a hash of the full command line, the contents of all input files
+and of all headers they include, the identity of the compiler and the relevant environment variables.
+Value entries are identified by a hash of a description of the computation that created them.
+If the cache grows larger than its maximum size, the least recently used entries are removed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import tbf.utils as utils
+
+# Increase whenever the layout of the cache or the computation of keys changes
+CACHE_VERSION = '2'
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024
+VALUE_FILE = 'value.json'
+
+
+def get_default_cache_dir():
+    """Return the default cache directory of tbf, as defined by the XDG base directory specification."""
+    cache_home = os.environ.get('XDG_CACHE_HOME')
+    if not cache_home:
+        cache_home = os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'tbf')
+
+
+_compiler_identities = dict()
+
+
+def get_compiler_identity(compiler):
+    """Return a string that identifies the given compiler executable and its version."""
+    if compiler not in _compiler_identities:
+        executable = utils.get_executable(compiler)
+        if executable is None:
+            identity = compiler
+        else:
+            executable = os.path.realpath(executable)
+            stat = os.stat(executable)
+            result = utils.execute([executable, '--version'], quiet=True, err_to_output=True)
+            identity = '{}:{}:{}:{}'.format(executable, stat.st_size, stat.st_mtime, result.stdout)
+        _compiler_identities[compiler] = identity
+    return _compiler_identities[compiler]
+
+
+def _hash_file(hash_obj, path):
+    with open(path, 'rb') as inp:
+        for chunk in iter(lambda: inp.read(1024 * 1024), b''):
+            hash_obj.update(chunk)
+
+
+def _hash_input(hash_obj, path):
+    if os.path.isdir(path):
+        for directory, dirs, files in os.walk(path):
+            dirs.sort()
+            for f in sorted(files):
+                file_path = os.path.join(directory, f)
+                hash_obj.update(os.path.relpath(file_path, path).encode())
+                _hash_file(hash_obj, file_path)
+    else:
+        _hash_file(hash_obj, path)
+
+
+# Separates the file names in a make rule: whitespace that isn't escaped, and line continuations
+_MAKE_RULE_SEPARATOR = re.compile(r'(?:\\\n|(?<!\\)\s)+')
+C_SOURCE_SUFFIXES = ('.c', '.h')
+
+
+def _get_dependency_cmd(command):
+    # Without the output file, the compiler writes the dependencies to stdout
+    dependency_cmd = [command[0], '-M']
+    args = iter(command[1:])
+    for arg in args:
+        if arg == '-o':
+            next(args, None)
+        else:
+            dependency_cmd.append(arg)
+    return dependency_cmd
+
+
+def get_dependencies(command, env=None):
+    """Return all files that the C sources of the given compile command include, as reported by the compiler.
+
+    :param utils.CompileCommand command: the compile command
+    :param dict env: the environment the command is run in. If None, the current environment is used.
+    :return List[str]: the included files. Empty if the compile command has no C sources
+        or if the compiler can't determine the dependencies.
+    """
+    if not any(i.endswith(C_SOURCE_SUFFIXES) for i in command.inputs):
+        return []
+    result = utils.execute(_get_dependency_cmd(command), quiet=True, env=env, err_to_output=False)
+    if result.returncode != 0:
+        return []
+    # The output contains one rule of the form 'target.o: source.c header.h ...' for each source
+    dependencies = set()
+    for name in _MAKE_RULE_SEPARATOR.split(result.stdout):
+        if name and not name.endswith(':'):
+            dependencies.add(name.replace('\\ ', ' '))
+    return sorted(dependencies)
+
+
+class FileCache(object):
+    """On-disk cache of files, with least-recently-used eviction."""
+
+    def __init__(self, directory=None, max_size=DEFAULT_MAX_SIZE):
+        """Create a new file cache.
+
+        :param str directory: the directory of the cache. If None, the default cache directory is used.
+        :param int max_size: the maximum size of the cache, in bytes
+        """
+        if directory is None:
+            directory = get_default_cache_dir()
+        self.directory = os.path.join(os.path.abspath(directory), 'v' + CACHE_VERSION)
+        self.max_size = max_size
+
+    def get_key(self, command, env=None):
+        """Return the cache key for the given compile command.
+
+        :param utils.CompileCommand command: the compile command
+        :param dict env: the environment the command is run in. If None, the current environment is used.
+        """
+        if env is None:
+            env = os.environ
+        key = hashlib.sha256()
+        key.update(get_compiler_identity(command[0]).encode())
+        key.update(json.dumps(list(command)).encode())
+        key.update(json.dumps([(k, env.get(k)) for k in command.env_keys]).encode())
+        key.update(json.dumps(command.outputs).encode())
+        for input_file in command.inputs:
+            key.update(input_file.encode())
+            _hash_input(key, input_file)
+        # Included headers aren't listed as inputs
+        for dependency in get_dependencies(command, env):
+            key.update(dependency.encode())
+            _hash_file(key, dependency)
+        return key.hexdigest()
+
+    @staticmethod
+    def get_value_key(*description):
+        """Return the cache key for a value that is described by the given JSON-serializable objects."""
+        return hashlib.sha256(json.dumps(['value', CACHE_VERSION] + list(description)).encode()).hexdigest()
+
+    def _get_entry_dir(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key, output_files):
+        """Copy the files of the given cache entry to the given output files.
+
+        :return bool: whether the cache contained an entry for the given key
+        """
+        entry_dir = self._get_entry_dir(key)
+        if not os.path.isdir(entry_dir):
+            return False
+        try:
+            for index, output_file in enumerate(output_files):
+                cached_file = os.path.join(entry_dir, str(index))
+                shutil.copyfile(cached_file, output_file)
+                shutil.copymode(cached_file, output_file)
+            # Mark the entry as recently used
+            os.utime(entry_dir)
+        except OSError as e:
+            # The entry may have been evicted concurrently
+            logging.debug("Couldn't use cache entry %s: %s", key, e)
+            return False
+        return True
+
+    def put(self, key, output_files):
+        """Store the given files in the cache, under the given key."""
+
+        def write_files(entry_dir):
+            for index, output_file in enumerate(output_files):
+                cached_file = os.path.join(entry_dir, str(index))
+                shutil.copyfile(output_file, cached_file)
+                shutil.copymode(output_file, cached_file)
+
+        self._create_entry(key, write_files)
+
+    def get_value(self, key):
+        """Return the value stored under the given key, or None if the cache contains no such value."""
+        entry_dir = self._get_entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, VALUE_FILE), 'r') as inp:
+                value = json.load(inp)
+            os.utime(entry_dir)
+        except (OSError, ValueError) as e:
+            logging.debug("Couldn't use cache entry %s: %s", key, e)
+            return None
+        return value
+
+    def put_value(self, key, value):
+        """Store the given value in the cache, under the given key.
+
+        :param str key: the key of the value, as returned by `get_value_key`
+        :param value: the value to store. Must be serializable to JSON.
+        """
+
+        def write_value(entry_dir):
+            with open(os.path.join(entry_dir, VALUE_FILE), 'w') as outp:
+                json.dump(value, outp)
+
+        self._create_entry(key, write_value)
+
+    def _create_entry(self, key, write_function):
+        entry_dir = self._get_entry_dir(key)
+        if os.path.isdir(entry_dir):
+            return
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        # Create the entry in a temporary directory and move it to its place afterwards,
+        # so that no other process sees an incomplete entry
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=os.path.dirname(entry_dir))
+        try:
+            write_function(tmp_dir)
+            os.rename(tmp_dir, entry_dir)
+        except OSError as e:
+            # Another process may have created the same entry in the meantime
+            logging.debug("Couldn't create cache entry %s: %s", key, e)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._evict()
+
+    def _get_entries(self):
+        entries = list()
+        if not os.path.isdir(self.directory):
+            return entries
+        for prefix_dir in os.scandir(self.directory):
+            if not prefix_dir.is_dir():
+                continue
+            for entry in os.scandir(prefix_dir.path):
+                if entry.name.startswith('.tmp_') or not entry.is_dir():
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+                except OSError:
+                    continue
+        return entries
+
+    def _evict(self):
+        entries = self._get_entries()
+        total_size = sum(size for _, size, _ in entries)
+        # Oldest entries first
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+
+
+def execute_cached(command, file_cache, **kwargs):
+    """Execute the given command, or take its outputs from the given cache.
+
+    Only commands of type utils.CompileCommand are cached.
+    All other commands are always executed. Commands of type utils.ParallelCommands
+    are executed with utils.execute_parallel.
+
+    :param command: the command to execute
+    :param FileCache file_cache: the cache to use. If None, the command is always executed.
+    :param kwargs: the arguments for utils.execute
+    :return utils.ExecutionResult: the result of the execution. If the outputs of the command are
+        taken from the cache, the result has return code 0 and no output.
+    """
+    if isinstance(command, utils.ParallelCommands):
+        return utils.execute_parallel(command, **kwargs)
+    if file_cache is None or not isinstance(command, utils.CompileCommand):
+        return utils.execute(command, **kwargs)
+
+    try:
+        key = file_cache.get_key(command, kwargs.get('env'))
+    except OSError as e:
+        logging.debug("Can't compute cache key for command: %s", e)
+        return utils.execute(command, **kwargs)
+
+    if file_cache.get(key, command.outputs):
+        log_cmd = logging.debug if kwargs.get('quiet') else logging.info
+        log_cmd("Using cached outputs of: %s", " ".join(command))
+        return utils.ExecutionResult(0, '', '')
+
+    result = utils.execute(command, **kwargs)
+    if result.returncode == 0 and all(os.path.exists(o) for o in command.outputs):
+        try:
+            file_cache.put(key, command.outputs)
+        except OSError as e:
+            logging.warning("Couldn't write to compile cache: %s", e)
+    return result
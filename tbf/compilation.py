@@ -0,0 +1,186 @@
+"""Compilation of test harnesses against the program under test.
+
+The program under test is compiled to an object file only once for each combination of
+program content, machine model, C standard and compiler flags.
+Each harness is compiled on its own and linked against that object file.
+If a harness can't be compiled on its own, e.g., because it uses types that are only
+defined in the program, program and harness are compiled as a single unit.
+
+Compiled program objects are memoized by their absolute path for the lifetime of the process.
+The memoized object stays in the work directory it was compiled in, and is reused from there
+for compilations in other work directories as long as it exists.
+Coverage data of a binary that is linked against it is thus written to the original work directory, too.
+
+If a file cache is given, the outputs of all compilations are taken from it, if possible.
+Compilations for coverage measurement are never cached, because the created binaries
+write their coverage data to the absolute path of the compilation's work directory.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+
+import tbf.cache as cache
+import tbf.utils as utils
+
+C_VERSIONS = ('gnu11', 'gnu90')
+
+_lock = threading.Lock()
+# Maps (program hash, machine model, C version, flags) to the absolute path of the compiled object file,
+# in the work directory it was compiled in
+_program_objects = dict()
+# Maps (program hash, machine model) to the C version the program compiles with
+_program_c_versions = dict()
+# Contains (program hash, machine model) of all programs that have to be compiled together with their harness
+_combined_programs = set()
+
+
+def _get_file_hash(filename):
+    with open(filename, 'rb') as inp:
+        return hashlib.sha256(inp.read()).hexdigest()
+
+
+def _get_compile_cmd(machine_model, c_version, flags):
+    return ['gcc', '-std={}'.format(c_version), machine_model.compile_parameter, '-D__alias__(x)='] + list(flags)
+
+
+def _get_link_cmd(object_files, output_file, machine_model, flags):
+    return ['gcc', machine_model.compile_parameter] + list(flags) + ['-o', output_file] + list(object_files) + ['-lm']
+
+
+COVERAGE_FLAG = '-fprofile-arcs'
+
+
+def get_object_name(source_file):
+    """Return the name of the object file that is created for the given source file.
+
+    Object files are created in the current work directory, not next to their source.
+    We use relative paths so that compile commands are the same in each work directory.
+    """
+    return os.path.splitext(os.path.basename(source_file))[0] + '.o'
+
+
+def get_coverage_data_file(object_file):
+    """Return the file that binaries compiled with coverage flags write the coverage data of the given object to.
+
+    The coverage data is always written next to the object file, independent of the current work directory.
+    """
+    return os.path.splitext(os.path.abspath(object_file))[0] + '.gcda'
+
+
+def _get_compile_outputs(object_file, flags):
+    outputs = [object_file]
+    if '-ftest-coverage' in flags:
+        outputs.append(os.path.splitext(object_file)[0] + '.gcno')
+    return outputs
+
+
+def _execute(command, file_cache, **kwargs):
+    if COVERAGE_FLAG in command:
+        file_cache = None
+    return cache.execute_cached(command, file_cache, **kwargs)
+
+
+def _compile_program_object(program_file, program_hash, machine_model, flags, file_cache):
+    program_key = (program_hash, machine_model.name)
+    if program_key in _program_c_versions:
+        c_versions = [_program_c_versions[program_key]]
+    else:
+        c_versions = C_VERSIONS
+
+    program_name = os.path.splitext(os.path.basename(program_file))[0]
+    for c_version in c_versions:
+        key = (program_hash, machine_model.name, c_version, tuple(flags))
+        object_file = _program_objects.get(key)
+        if object_file and os.path.exists(object_file):
+            return object_file, c_version
+
+        # The object file is named after the key, so that differently compiled objects don't clash
+        key_hash = hashlib.sha256(repr(key).encode()).hexdigest()[:12]
+        object_file = '{}.{}.o'.format(program_name, key_hash)
+        compile_cmd = utils.CompileCommand(
+            _get_compile_cmd(machine_model, c_version, flags) + ['-c', program_file, '-o', object_file],
+            inputs=[program_file],
+            outputs=_get_compile_outputs(object_file, flags))
+        result = _execute(compile_cmd, file_cache, quiet=False)
+        if result.returncode == 0:
+            object_file = os.path.abspath(object_file)
+            _program_objects[key] = object_file
+            _program_c_versions[program_key] = c_version
+            return object_file, c_version
+    raise utils.CompileError("Compilation failed for program {}".format(program_file))
+
+
+def _compile_separately(program_object, c_version, harness_file, output_file, machine_model, flags,
+                        file_cache):
+    harness_object = get_object_name(harness_file)
+    compile_cmd = utils.CompileCommand(
+        _get_compile_cmd(machine_model, c_version, flags) + ['-c', harness_file, '-o', harness_object],
+        inputs=[harness_file],
+        outputs=_get_compile_outputs(harness_object, flags))
+    result = _execute(compile_cmd, file_cache, quiet=True)
+    if result.returncode != 0:
+        return False
+    program_object = os.path.relpath(program_object)
+    link_cmd = utils.CompileCommand(
+        _get_link_cmd([program_object, harness_object], output_file, machine_model, flags),
+        inputs=[program_object, harness_object],
+        outputs=[output_file])
+    result = _execute(link_cmd, file_cache, quiet=False)
+    return result.returncode == 0
+
+
+def _compile_together(program_file, c_version, harness_file, output_file, machine_model, flags, file_cache):
+    harness_object = get_object_name(harness_file)
+    compile_cmd = utils.CompileCommand(
+        _get_compile_cmd(machine_model, c_version, flags) + [
+            '-include', program_file, '-c', harness_file, '-o', harness_object
+        ],
+        inputs=[program_file, harness_file],
+        outputs=_get_compile_outputs(harness_object, flags))
+    result = _execute(compile_cmd, file_cache, quiet=False, err_to_output=True)
+    if result.returncode != 0:
+        raise utils.CompileError("Compilation failed for harness {}".format(harness_file))
+
+    link_cmd = utils.CompileCommand(
+        _get_link_cmd([harness_object], output_file, machine_model, flags),
+        inputs=[harness_object],
+        outputs=[output_file])
+    result = _execute(link_cmd, file_cache, quiet=False, err_to_output=True)
+    if result.returncode != 0:
+        raise utils.CompileError("Linking failed for harness {}".format(harness_file))
+    return os.path.abspath(harness_object)
+
+
+def compile_harness(program_file, harness_file, output_file, machine_model, flags=(), file_cache=None):
+    """Compile the given harness and link it with the given program.
+
+    All object files are created in the current work directory.
+
+    :param str program_file: the program under test
+    :param str harness_file: the harness for the program
+    :param str output_file: the executable to create
+    :param utils.MachineModel machine_model: the machine model to compile for
+    :param Sequence[str] flags: additional flags for compiling and linking
+    :param cache.FileCache file_cache: the cache for compilation outputs. If None, no cache is used.
+    :return str: the object file that contains the code of the program under test.
+        This is either the shared object file of the program, or the object file of the harness
+        if harness and program had to be compiled together.
+    :raises utils.CompileError: if the program or harness can't be compiled
+    """
+    program_hash = _get_file_hash(program_file)
+    program_key = (program_hash, machine_model.name)
+    if program_key in _combined_programs:
+        c_version = _program_c_versions[program_key]
+    else:
+        with _lock:
+            program_object, c_version = _compile_program_object(program_file, program_hash, machine_model, flags,
+                                                                file_cache)
+        if _compile_separately(program_object, c_version, harness_file, output_file, machine_model, flags,
+                               file_cache):
+            return program_object
+
+        logging.debug("Separate compilation of harness %s failed, compiling it together with program", harness_file)
+        _combined_programs.add(program_key)
+    return _compile_together(program_file, c_version, harness_file, output_file, machine_model, flags, file_cache)
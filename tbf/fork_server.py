@@ -0,0 +1,168 @@
+"""Execution of test vectors through a fork server.
+
+A harness created with `fork_server=True` can run as fork server:
+it is started once, stops right before `main` is run, and forks a new child
+for each test vector it is told to run.
+This avoids the costs of `execve`, dynamic linking and libc initialization for each test.
+"""
+
+import logging
+import os
+import select
+import shutil
+import signal
+import struct
+import subprocess
+import tempfile
+import time
+
+import tbf.utils as utils
+from tbf.harness_generation import FORK_SERVER_CONTROL_VAR, FORK_SERVER_STATUS_VAR, FORK_SERVER_HELLO
+
+_MESSAGE = struct.Struct('i')
+
+STARTUP_TIMELIMIT = 5
+
+
+class ForkServer(object):
+    """Fork server of a single executable harness.
+
+    A fork server runs one test at a time. To run multiple tests in parallel,
+    use multiple fork servers.
+    """
+
+    def __init__(self, executable):
+        """Start a new fork server for the given executable.
+
+        :param str executable: the harness executable, created with `fork_server=True`
+        :raises utils.ForkServerError: if the fork server could not be started
+        """
+        self._work_dir = tempfile.mkdtemp(prefix='tbf_fork_server_')
+        self._input_file = os.path.join(self._work_dir, 'input')
+        self._error_file = os.path.join(self._work_dir, 'error')
+        self._process = None
+
+        control_read, self._control_write = os.pipe()
+        self._status_read, status_write = os.pipe()
+        env = utils.get_env()
+        env[FORK_SERVER_CONTROL_VAR] = str(control_read)
+        env[FORK_SERVER_STATUS_VAR] = str(status_write)
+        open(self._input_file, 'wb').close()
+        try:
+            with open(self._input_file, 'rb') as inp, open(self._error_file, 'wb') as err:
+                self._process = subprocess.Popen(
+                    [executable],
+                    stdin=inp,
+                    stdout=subprocess.DEVNULL,
+                    stderr=err,
+                    pass_fds=(control_read, status_write),
+                    env=env)
+        except OSError as e:
+            self.close()
+            raise utils.ForkServerError("Fork server could not be started: " + str(e), e)
+        finally:
+            os.close(control_read)
+            os.close(status_write)
+
+        hello = self._read_message(time.monotonic() + STARTUP_TIMELIMIT)
+        if hello != FORK_SERVER_HELLO:
+            self.close()
+            raise utils.ForkServerError("Executable is no fork server: " + executable)
+
+    def _read_message(self, deadline=None, stop_flag=None):
+        """Read the next message from the status pipe.
+
+        :return: the message, or None if the deadline was reached or the stop flag was set.
+        :raises utils.ForkServerError: if the fork server terminated
+        """
+        data = b''
+        while len(data) < _MESSAGE.size:
+            if stop_flag and stop_flag.is_set():
+                return None
+            wait_time = 0.1 if stop_flag else None
+            if deadline:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait_time = min(wait_time, remaining) if wait_time else remaining
+            readable, _, _ = select.select([self._status_read], [], [], wait_time)
+            if readable:
+                new_data = os.read(self._status_read, _MESSAGE.size - len(data))
+                if not new_data:
+                    raise utils.ForkServerError("Fork server terminated")
+                data += new_data
+        return _MESSAGE.unpack(data)[0]
+
+    @staticmethod
+    def _get_returncode(status):
+        if os.WIFSIGNALED(status):
+            return -os.WTERMSIG(status)
+        else:
+            return os.WEXITSTATUS(status)
+
+    def run(self, input_str, timelimit=None, stop_flag=None, output_limit=None):
+        """Run the program of the fork server on the given input.
+
+        The run is killed if it takes longer than the given time limit or the given stop flag is set.
+
+        :param bytes input_str: the input to provide to the program on stdin
+        :param timelimit: the time limit for the run, in seconds
+        :param stop_flag: an event that tells to stop the run
+        :param int output_limit: if given, only the last output_limit bytes of the error output are kept
+        :return utils.ExecutionResult: the result of the run. Standard output of the program is not kept.
+        :raises utils.ForkServerError: if the fork server failed
+        """
+        if type(input_str) is not bytes:
+            input_str = input_str.encode()
+        with open(self._input_file, 'wb') as outp:
+            outp.write(input_str)
+
+        deadline = time.monotonic() + timelimit if timelimit else None
+        try:
+            os.write(self._control_write, _MESSAGE.pack(0))
+        except OSError as e:
+            raise utils.ForkServerError("Fork server terminated", e)
+        child = self._read_message()
+
+        status = self._read_message(deadline, stop_flag)
+        if status is None:
+            logging.info("Timeout of %ss expired or told to stop. Killing process.", timelimit if timelimit else "- ")
+            try:
+                os.kill(child, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            status = self._read_message()
+
+        with open(self._error_file, 'rb') as inp:
+            skipped = 0
+            if output_limit is not None:
+                skipped = max(0, os.path.getsize(self._error_file) - output_limit)
+                inp.seek(skipped)
+            err_output = inp.read()
+        if skipped:
+            err_output = utils.strip_partial_character(err_output)
+        try:
+            err_output = err_output.decode()
+        except UnicodeDecodeError:
+            pass
+        if err_output:
+            logging.debug(err_output)
+        return utils.ExecutionResult(self._get_returncode(status), '', err_output)
+
+    def close(self):
+        """Stop the fork server and remove all its files."""
+        if self._control_write is not None:
+            # The fork server terminates as soon as the control pipe is closed
+            os.close(self._control_write)
+            self._control_write = None
+        if self._process:
+            try:
+                self._process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+            self._process = None
+        if self._status_read is not None:
+            os.close(self._status_read)
+            self._status_read = None
+        shutil.rmtree(self._work_dir, ignore_errors=True)
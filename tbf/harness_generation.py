@@ -1,5 +1,58 @@
+import re
+import struct
+
 import tbf.utils as utils
 
+FORK_SERVER_CONTROL_VAR = 'TBF_FORK_SERVER_CONTROL'
+FORK_SERVER_STATUS_VAR = 'TBF_FORK_SERVER_STATUS'
+# Sent by the fork server on startup, so that we know that the started executable is one
+FORK_SERVER_HELLO = 0x54424621
+
+BINARY_INTEGER_TAG = b'i'
+BINARY_FLOAT_TAG = b'f'
+BINARY_INVALID_TAG = b'e'
+
+_BINARY_COUNT = struct.Struct('=I')
+_BINARY_INTEGER = struct.Struct('=cQ')
+_BINARY_FLOAT = struct.Struct('=cd')
+_BINARY_INVALID = _BINARY_INTEGER.pack(BINARY_INVALID_TAG, 0)
+
+# Printed by the generic harness when the program terminates normally
+INPUTS_READ_MESSAGE = 'TBF inputs read: '
+_INPUTS_READ_PATTERN = re.compile(re.escape(INPUTS_READ_MESSAGE) + r'([0-9]+)\n?$')
+
+
+def get_binary_input(test_vector):
+    """Return the given test vector in the binary input format of the harness.
+
+    :param utils.TestVector test_vector: the test vector to encode
+    :return bytes: the input for a harness created with `binary_input=True`
+    """
+    records = [_BINARY_COUNT.pack(len(test_vector.vector))]
+    for item in test_vector.vector:
+        value = utils.parse_c_value(item['value'])
+        if value is None:
+            records.append(_BINARY_INVALID)
+        elif type(value) is float:
+            records.append(_BINARY_FLOAT.pack(BINARY_FLOAT_TAG, value))
+        else:
+            records.append(_BINARY_INTEGER.pack(BINARY_INTEGER_TAG, value))
+    return b''.join(records)
+
+
+def get_inputs_read(error_output):
+    """Return the number of inputs that the program read in a run of the generic harness.
+
+    :param error_output: the error output of the harness run, as str or bytes
+    :return int: the number of inputs read, or None if the program didn't terminate normally
+    """
+    if not error_output:
+        return None
+    if type(error_output) is bytes:
+        error_output = error_output.decode(errors='replace')
+    match = _INPUTS_READ_PATTERN.search(error_output)
+    return int(match.group(1)) if match else None
+
 
 class HarnessCreator(object):
 
@@ -36,16 +89,129 @@ class HarnessCreator(object):
     return value_pointer;
 }\n\n"""
 
+    def _get_binary_vector_read_method(self):
+        """Return a method that reads the next input value in the binary input format.
+
+        The binary input starts with the number of values, as unsigned 32-bit integer.
+        Each value is one tag byte followed by 8 bytes, all in native byte order.
+        The tag tells whether the 8 bytes are an integer (BINARY_INTEGER_TAG), a double (BINARY_FLOAT_TAG),
+        or whether the value can't be parsed (BINARY_INVALID_TAG).
+        Values are parsed in the same way as by `parse_inp`.
+        If no value is left, the harness aborts.
+        """
+        return b"""extern size_t fread (void *__restrict __ptr, size_t __size,
+    size_t __n, FILE *__restrict __stream);
+
+unsigned int __inputs_left = 0;
+int __inputs_started = 0;
+char __input_value[16];
+
+char * parse_binary_inp() {
+    unsigned char record[9];
+    unsigned int i;
+    if (!__inputs_started) {
+        __inputs_started = 1;
+        if (fread(&__inputs_left, 4, 1, stdin) != 1) {
+            __inputs_left = 0;
+        }
+    }
+    if (__inputs_left == 0 || fread(record, 9, 1, stdin) != 1) {
+        fprintf(stderr, "No input left\\n");
+        abort();
+    }
+    __inputs_left--;
+
+    for (i = 0; i < sizeof(__input_value); i++) {
+        __input_value[i] = 0;
+    }
+    if (record[0] == '""" + BINARY_INTEGER_TAG + b"""') {
+        memcpy(__input_value, record + 1, 8);
+    } else if (record[0] == '""" + BINARY_FLOAT_TAG + b"""') {
+        double doubleVal;
+        memcpy(&doubleVal, record + 1, 8);
+        long double floatVal = doubleVal;
+        memcpy(__input_value, &floatVal, sizeof(floatVal));
+    } else {
+        fprintf(stderr, "Can't parse input\\n");
+        abort();
+    }
+    return __input_value;
+}\n\n"""
+
+    def _get_fork_server(self):
+        """Return a constructor that turns the harness into a fork server, if requested.
+
+        If environment variables FORK_SERVER_CONTROL_VAR and FORK_SERVER_STATUS_VAR
+        name a control and a status pipe, the harness does not run the program directly.
+        Instead, it forks a new child that runs the program for each command read from the control pipe.
+        For each child, its pid and, after it terminated, its wait status is written to the status pipe.
+        Each child reads its input from the file at stdin and writes its error output to the file at stderr.
+        Both files are reset before each fork.
+
+        The declarations of system functions must match those of the C library for all machine models,
+        because the harness may be compiled together with a program that includes them.
+        ssize_t and size_t of glibc are the types of __PTRDIFF_TYPE__ and __SIZE_TYPE__.
+        """
+        return b"""extern char *getenv (const char *__name);
+extern int atoi (const char *__nptr);
+extern int fork (void);
+extern int waitpid (int __pid, int *__stat_loc, int __options);
+extern __PTRDIFF_TYPE__ read (int __fd, void *__buf, __SIZE_TYPE__ __nbytes);
+extern __PTRDIFF_TYPE__ write (int __fd, const void *__buf, __SIZE_TYPE__ __n);
+extern long lseek (int __fd, long __offset, int __whence);
+extern int ftruncate (int __fd, long __length);
+extern int close (int __fd);
+extern void _exit (int __status) __attribute__ ((__noreturn__));
+
+static void __tbf_fork_server(void) __attribute__ ((constructor));
+static void __tbf_fork_server(void) {
+    char * control_var = getenv(\"""" + FORK_SERVER_CONTROL_VAR.encode() + b"""\");
+    char * status_var = getenv(\"""" + FORK_SERVER_STATUS_VAR.encode() + b"""\");
+    if (control_var == 0 || status_var == 0) {
+        return;
+    }
+    int control_fd = atoi(control_var);
+    int status_fd = atoi(status_var);
+    int message = """ + str(FORK_SERVER_HELLO).encode() + b""";
+    if (write(status_fd, &message, 4) != 4) {
+        _exit(2);
+    }
+
+    while (read(control_fd, &message, 4) == 4) {
+        lseek(0, 0, 0);
+        ftruncate(2, 0);
+        lseek(2, 0, 0);
+        int child = fork();
+        if (child < 0) {
+            _exit(2);
+        } else if (child == 0) {
+            close(control_fd);
+            close(status_fd);
+            return;
+        }
+
+        int status;
+        if (write(status_fd, &child, 4) != 4 || waitpid(child, &status, 0) < 0
+                || write(status_fd, &status, 4) != 4) {
+            _exit(2);
+        }
+    }
+    _exit(0);
+}\n\n"""
+
     def __init__(self):
         self.repr_type = b"__repr"
 
-    def _get_preamble(self):
+    def _get_preamble(self, binary_input=False):
         preamble = ''
         preamble += utils.EXTERNAL_DECLARATIONS
         preamble += "\n"
         preamble += utils.get_assume_method() + "\n"
         preamble = preamble.encode()
-        preamble += self._get_vector_read_method()
+        if binary_input:
+            preamble += self._get_binary_vector_read_method()
+        else:
+            preamble += self._get_vector_read_method()
         return preamble
 
     def _get_error_definition(self, method_name):
@@ -55,15 +221,33 @@ class HarnessCreator(object):
         definition += '    exit(1);\n}\n\n'
         return definition.encode()
 
-    def _get_nondet_method_definitions(self, nondet_methods, test_vector):
+    def _get_inputs_read_report(self):
+        """Return a destructor that prints the number of inputs read when the program terminates normally."""
+        return b"""unsigned int __tbf_inputs_read = 0;
+
+static void __tbf_report_inputs_read(void) __attribute__ ((destructor));
+static void __tbf_report_inputs_read(void) {
+    fprintf(stderr, \"""" + INPUTS_READ_MESSAGE.encode() + b"""%u\\n", __tbf_inputs_read);
+}\n\n"""
+
+    def _get_nondet_method_definitions(self, nondet_methods, test_vector, binary_input=False):
         definitions = b''
         if test_vector is not None:
             definitions += b'unsigned int access_counter = 0;\n\n'
+        else:
+            definitions += self._get_inputs_read_report()
         for method in nondet_methods:
             definitions += utils.get_method_head(method['name'], method['type'],
                                                  method['params']).encode()
             definitions += b' {\n'
-            if method['type'] != 'void':
+            if method['type'] != 'void' and test_vector is None:
+                definitions += b'    __tbf_inputs_read++;\n'
+            if method['type'] != 'void' and binary_input:
+                definitions += b''.join([
+                    b'    return *((', method['type'].encode(),
+                    b' *) parse_binary_inp());\n'
+                ])
+            elif method['type'] != 'void':
                 definitions += "    unsigned int inp_size = 3000;\n".encode()
                 definitions += "    char * inp_var = malloc(inp_size);\n".encode(
                 )
@@ -94,12 +278,27 @@ class HarnessCreator(object):
             definitions += b'}\n\n'
         return definitions
 
-    def create_harness(self, nondet_methods, error_method, test_vector=None):
+    def create_harness(self, nondet_methods, error_method, test_vector=None, fork_server=False,
+                       binary_input=False):
+        """Create a test harness for the given non-deterministic methods.
+
+        :param nondet_methods: the non-deterministic methods to define
+        :param error_method: the error method to define. If None, no error method is defined
+        :param test_vector: the test vector to hard-code into the harness. If None,
+            a generic harness that reads test inputs from stdin is created.
+        :param fork_server: whether the generic harness should be able to run as fork server
+        :param binary_input: whether the generic harness should read test inputs in the binary input format
+            instead of line by line. Test inputs in the binary format can be created with `get_binary_input`.
+        """
+        assert not fork_server or test_vector is None
+        assert not binary_input or test_vector is None
         harness = b''
-        harness += self._get_preamble()
+        harness += self._get_preamble(binary_input)
+        if fork_server:
+            harness += self._get_fork_server()
         if error_method:
             harness += self._get_error_definition(error_method)
         harness += self._get_nondet_method_definitions(nondet_methods,
-                                                       test_vector)
+                                                       test_vector, binary_input)
 
         return harness
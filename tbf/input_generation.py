@@ -1,3 +1,4 @@
+import tbf.cache as cache
 import tbf.utils as utils
 import os
 import logging
@@ -31,6 +32,8 @@ class BaseInputGenerator(object):
         self.show_tool_output = show_tool_output
         self.cli_options = additional_options
         self.program_preprocessor = preprocessor
+        # Cache for the outputs of compile commands. If None, compile commands are always executed
+        self.compile_cache = None
 
         self.statistics = utils.Statistics("Input Generator " + self.get_name())
 
@@ -49,63 +52,82 @@ class BaseInputGenerator(object):
                                   self.timer_prepare)
 
     def generate_input(self, filename, error_method, nondet_methods, stop_flag):
-        default_err = "Unknown error"
         self.timer_input_gen.start()
         try:
-            file_to_analyze = utils.get_prepared_name(filename, self.get_name())
-
-            self.timer_file_access.start()
-            with open(filename, 'r') as outp:
-                filecontent = outp.read()
-            self.timer_file_access.stop()
-
-            if os.path.exists(file_to_analyze):
-                logging.warning(
-                    "Prepared file already exists. Not preparing again.")
-            else:
-                self.timer_prepare.start()
-                prepared_content = self.program_preprocessor.prepare(filecontent, nondet_methods, error_method)
-                self.timer_file_access.start()
-                with open(file_to_analyze, 'w+') as new_file:
-                    new_file.write(prepared_content)
-                self.timer_file_access.stop()
-                self.timer_prepare.stop()
-
-            cmds = self.create_input_generation_cmds(file_to_analyze, self.cli_options)
+            cmds = self.prepare_input_generation(filename, error_method, nondet_methods)
             for cmd in cmds:
                 self.timer_generator.start()
-                result = utils.execute(
+                result = cache.execute_cached(
                     cmd,
+                    self.compile_cache,
                     env=self.get_run_env(),
                     quiet=False,
                     err_to_output=True,
                     stop_flag=stop_flag,
                     show_output=self.show_tool_output)
                 self.timer_generator.stop()
-                if BaseInputGenerator.failed(result) \
-                        and (not stop_flag or not stop_flag.is_set()):
-                    raise utils.InputGenerationError("Failed at command: " +
-                                                     ' '.join(cmd))
+                self.check_result(cmd, result, stop_flag and stop_flag.is_set())
 
             return self._get_success_and_stats()
 
-        except utils.CompileError as e:
-            logging.error("Compile error in input generation: %s", e.msg if e.msg else default_err)
-            return self._get_failed_and_stats()
-        except utils.InputGenerationError as e:
-            # Should be error because an error in input generation is not expected
-            logging.error("Input generation error: %s", e.msg
-            if e.msg else default_err)
-            return self._get_failed_and_stats()
-        except utils.ParseError as e:
-            logging.error("Parse error: %s", e.msg if e.msg else default_err)
-            return self._get_failed_and_stats()
+        except (utils.CompileError, utils.InputGenerationError, utils.ParseError) as e:
+            return self.handle_error(e)
 
         finally:
-            self.timer_input_gen.stop()
-            for n, s in self.statistics.stats:
-                if type(s) is utils.Stopwatch and s.is_running():
-                    s.stop()
+            self.finish_input_generation()
+
+    def prepare_input_generation(self, filename, error_method, nondet_methods):
+        """Prepare the given program for the input generator and return the commands to run.
+
+        :return: the commands that generate tests for the prepared program, to be run in order
+        """
+        file_to_analyze = utils.get_prepared_name(filename, self.get_name())
+
+        self.timer_file_access.start()
+        with open(filename, 'r') as outp:
+            filecontent = outp.read()
+        self.timer_file_access.stop()
+
+        if os.path.exists(file_to_analyze):
+            logging.warning(
+                "Prepared file already exists. Not preparing again.")
+        else:
+            self.timer_prepare.start()
+            prepared_content = self.program_preprocessor.prepare(filecontent, nondet_methods, error_method)
+            self.timer_file_access.start()
+            with open(file_to_analyze, 'w+') as new_file:
+                new_file.write(prepared_content)
+            self.timer_file_access.stop()
+            self.timer_prepare.stop()
+
+        return self.create_input_generation_cmds(file_to_analyze, self.cli_options)
+
+    @staticmethod
+    def check_result(cmd, result, stopped):
+        """Raise an InputGenerationError if the given command failed and wasn't stopped on purpose."""
+        if BaseInputGenerator.failed(result) and not stopped:
+            cmd_str = str(cmd) if isinstance(cmd, utils.ParallelCommands) else ' '.join(cmd)
+            raise utils.InputGenerationError("Failed at command: " + cmd_str)
+
+    def handle_error(self, error):
+        """Log the given error of the input generation and return the result of the failed generation."""
+        default_err = "Unknown error"
+        if isinstance(error, utils.CompileError):
+            logging.error("Compile error in input generation: %s", error.msg if error.msg else default_err)
+        elif isinstance(error, utils.InputGenerationError):
+            # Should be error because an error in input generation is not expected
+            logging.error("Input generation error: %s", error.msg
+            if error.msg else default_err)
+        else:
+            logging.error("Parse error: %s", error.msg if error.msg else default_err)
+        return self._get_failed_and_stats()
+
+    def finish_input_generation(self):
+        """Stop all timers of the input generation."""
+        self.timer_input_gen.stop()
+        for n, s in self.statistics.stats:
+            if type(s) is utils.Stopwatch and s.is_running():
+                s.stop()
 
     def _get_failed_and_stats(self):
         return False, self.statistics
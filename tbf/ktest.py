@@ -0,0 +1,199 @@
+"""Reading and writing of KLEE's binary .ktest test format.
+
+A .ktest file consists of the following, with all integers big-endian, 4-byte signed:
+
+    magic ('KTEST', or 'BOUT\\n' for old files), version,
+    number of arguments, for each argument: length, argument,
+    (version >= 2 only) number of symbolic argvs, length of symbolic argvs,
+    number of objects, for each object: length of name, name, length of data, data
+"""
+
+import math
+import struct
+
+import tbf.utils as utils
+
+KTEST_MAGIC = b'KTEST'
+BOUT_MAGIC = b'BOUT\n'
+KTEST_VERSION = 3
+
+_INT = struct.Struct('>i')
+
+
+class KTest(object):
+    """Content of a .ktest file.
+
+    Each object is a pair of name and data, both of type bytes.
+    """
+
+    def __init__(self, args=(), objects=(), sym_argvs=0, sym_argv_len=0, version=KTEST_VERSION):
+        self.version = version
+        self.args = list(args)
+        self.sym_argvs = sym_argvs
+        self.sym_argv_len = sym_argv_len
+        self.objects = list(objects)
+
+
+def read_ktest(content):
+    """Parse the given content of a .ktest file.
+
+    :param bytes content: the content of a .ktest file
+    :return KTest: the parsed test
+    :raises utils.ParseError: if the content is no valid .ktest file
+    """
+    view = memoryview(content)
+    offset = 0
+
+    def read_int():
+        nonlocal offset
+        value, = _INT.unpack_from(view, offset)
+        offset += _INT.size
+        return value
+
+    def read_bytes():
+        nonlocal offset
+        size = read_int()
+        if size < 0 or offset + size > len(view):
+            raise utils.ParseError("Invalid size in ktest file: {}".format(size))
+        value = view[offset:offset + size].tobytes()
+        offset += size
+        return value
+
+    magic = view[:len(KTEST_MAGIC)].tobytes()
+    if magic != KTEST_MAGIC and magic != BOUT_MAGIC:
+        raise utils.ParseError("Unrecognized ktest file")
+    offset = len(KTEST_MAGIC)
+    try:
+        version = read_int()
+        if version > KTEST_VERSION:
+            raise utils.ParseError("Unrecognized ktest version: {}".format(version))
+        # Arguments aren't necessarily UTF-8 encoded. Undecodable bytes are kept as surrogates,
+        # so that they are written back unchanged
+        args = [read_bytes().decode(errors='surrogateescape') for _ in range(read_int())]
+        if version >= 2:
+            sym_argvs = read_int()
+            sym_argv_len = read_int()
+        else:
+            sym_argvs = 0
+            sym_argv_len = 0
+        objects = list()
+        for _ in range(read_int()):
+            name = read_bytes()
+            objects.append((name, read_bytes()))
+    except struct.error as e:
+        raise utils.ParseError("Truncated ktest file", e)
+    return KTest(args, objects, sym_argvs, sym_argv_len, version)
+
+
+def read_ktest_file(ktest_file):
+    with open(ktest_file, 'rb') as inp:
+        return read_ktest(inp.read())
+
+
+def write_ktest(ktest):
+    """Return the content of a .ktest file for the given test.
+
+    :param KTest ktest: the test to write
+    :return bytes: the content of the .ktest file
+    """
+    content = [KTEST_MAGIC, _INT.pack(ktest.version), _INT.pack(len(ktest.args))]
+    for arg in ktest.args:
+        arg = arg.encode(errors='surrogateescape')
+        content += [_INT.pack(len(arg)), arg]
+    if ktest.version >= 2:
+        content += [_INT.pack(ktest.sym_argvs), _INT.pack(ktest.sym_argv_len)]
+    content.append(_INT.pack(len(ktest.objects)))
+    for name, data in ktest.objects:
+        content += [_INT.pack(len(name)), name, _INT.pack(len(data)), data]
+    return b''.join(content)
+
+
+def write_ktest_file(ktest_file, ktest):
+    with open(ktest_file, 'wb') as outp:
+        outp.write(write_ktest(ktest))
+
+
+def get_test_value(data):
+    """Return the test input for the given object data, as used in test vectors.
+
+    The data is interpreted as a little-endian integer, e.g. b'\\x01\\x00' becomes '0x0001'.
+    """
+    return '0x' + bytes(reversed(data)).hex()
+
+
+def _get_type_size(data_type, machine_model):
+    if '*' in data_type:
+        return 8 if machine_model.is_64 else 4
+    elif 'char' in data_type or data_type == '_Bool':
+        return 1
+    return machine_model.get_size(data_type)
+
+
+def _get_long_double_bytes(value, size):
+    # x87 extended precision: 64 bit mantissa with explicit integer bit, 15 bit exponent, sign
+    sign = 0x8000 if math.copysign(1, value) < 0 else 0
+    if math.isnan(value):
+        exponent, mantissa = 0x7fff, 0xc000000000000000
+    elif math.isinf(value):
+        exponent, mantissa = 0x7fff, 0x8000000000000000
+    elif value == 0:
+        exponent, mantissa = 0, 0
+    else:
+        fraction, exponent = math.frexp(abs(value))
+        exponent += 16382
+        mantissa = int(fraction * 2**64)
+    return struct.pack('<QH', mantissa, sign | exponent).ljust(size, b'\0')
+
+
+def get_object_data(value, data_type, machine_model):
+    """Return the object data that represents the given test input for the given type.
+
+    Integer inputs describe the bytes of the object, as for the test harness.
+    Floating-point inputs are encoded as a value of the given type, with at most double precision.
+
+    :param str value: the test input
+    :param str data_type: the type of the object
+    :param utils.MachineModel machine_model: the machine model that defines the size of the object
+    :raises utils.ParseError: if the value can't be parsed or the type isn't supported
+    """
+    parsed_value = utils.parse_c_value(value)
+    if parsed_value is None:
+        raise utils.ParseError("Can't parse test input: {}".format(value))
+    try:
+        size = _get_type_size(data_type, machine_model)
+    except AssertionError as e:
+        raise utils.ParseError("Unsupported type: {}".format(data_type), e)
+
+    if isinstance(parsed_value, float):
+        if 'long double' in data_type:
+            return _get_long_double_bytes(parsed_value, size)
+        elif 'double' in data_type:
+            return struct.pack('<d', parsed_value)
+        elif 'float' in data_type:
+            return struct.pack('<f', parsed_value)
+        elif math.isnan(parsed_value) or math.isinf(parsed_value):
+            raise utils.ParseError("Can't convert {} to type {}".format(value, data_type))
+        parsed_value = int(parsed_value)
+    return (parsed_value % 2**(8 * size)).to_bytes(size, 'little')
+
+
+def get_ktest(test_vector, nondet_methods, machine_model):
+    """Return a KTest that contains the inputs of the given test vector.
+
+    The names of the created objects are those used by the tbf preparation for KLEE,
+    so that the created test can be used to replay or seed programs prepared for KLEE.
+
+    :param utils.TestVector test_vector: the test vector. Each input must name the method it's for.
+    :param nondet_methods: the signatures of the input methods of the program
+    :param utils.MachineModel machine_model: the machine model that defines the size of types
+    :raises utils.ParseError: if an input can't be converted
+    """
+    method_types = {m['name']: m['type'] for m in nondet_methods}
+    objects = list()
+    for test_input in test_vector.vector:
+        method = test_input['name']
+        if method not in method_types:
+            raise utils.ParseError("Unknown input method for test input: {}".format(method))
+        name = utils.get_sym_var_name(method).encode()
+        objects.append((name, get_object_data(test_input['value'], method_types[method], machine_model)))
+    return KTest(args=[test_vector.origin], objects=objects)
@@ -0,0 +1,150 @@
+"""Minimization of test suites to a subset with the same branch coverage.
+
+Each test is executed once on a harness that is compiled for coverage measurement,
+and gcov reports the branches that the test covers.
+From the covered branches of all tests, a subset of tests is selected greedily
+that covers the same branches: the test that covers the most branches not covered yet
+comes first, shorter tests first in case of ties.
+"""
+
+import logging
+import os
+import re
+
+import tbf.utils as utils
+from tbf.testcase_processing import CoverageMeasuringExecutionRunner, ExecutedTestVectors
+
+# Source line in a .gcov file, e.g., '        1:   14:  if (x > y) {'
+_GCOV_LINE_PATTERN = re.compile(r'^\s*[^:]+:\s*(\d+):')
+# Branch information in a .gcov file, e.g., 'branch  0 taken 1 (fallthrough)'
+_GCOV_BRANCH_PATTERN = re.compile(r'^branch\s+(\d+)\s+taken\s+(\d+)')
+
+
+def get_covered_branches(gcov_content):
+    """Return the branches that are covered according to the given content of a .gcov file.
+
+    :param str gcov_content: the content of a .gcov file created with `gcov -b -c`
+    :return frozenset: the covered branches, as pairs of line number and number of the branch in that line
+    """
+    covered = set()
+    line_number = None
+    for line in gcov_content.splitlines():
+        match = _GCOV_LINE_PATTERN.match(line)
+        if match:
+            line_number = int(match.group(1))
+            continue
+        match = _GCOV_BRANCH_PATTERN.match(line)
+        if match and line_number is not None and int(match.group(2)) > 0:
+            covered.add((line_number, int(match.group(1))))
+    return frozenset(covered)
+
+
+def select_covering_tests(test_coverages):
+    """Return a subset of the given tests that covers the same branches as all of them.
+
+    :param test_coverages: pairs of test vector and the branches it covers
+    :return List[utils.TestVector]: the selected test vectors, in order of selection
+    """
+    uncovered = set()
+    for _, branches in test_coverages:
+        uncovered |= branches
+    candidates = list(test_coverages)
+    selected = list()
+    while uncovered:
+        best = max(candidates, key=lambda c: (len(c[1] & uncovered), -len(c[0])))
+        candidates.remove(best)
+        selected.append(best[0])
+        uncovered -= best[1]
+    return selected
+
+
+class TestSuiteMinimizer(object):
+    """Reduces a test suite to a subset with the same branch coverage.
+
+    Must be used in a directory of its own, because the harness and its coverage data
+    are created in the current work directory.
+    """
+
+    def __init__(self, machine_model, compile_cache=None, output_limit=None):
+        self._runner = CoverageMeasuringExecutionRunner(machine_model, 'Test-Suite Minimization',
+                                                        compile_cache=compile_cache, output_limit=output_limit)
+
+        self.statistics = utils.Statistics('Test-Suite Minimization')
+        self.timer_minimization = utils.Stopwatch()
+        self.statistics.add_value('Time for minimization', self.timer_minimization)
+        self.counter_tests_before = utils.Counter()
+        self.statistics.add_value('Number of tests before minimization', self.counter_tests_before)
+        self.counter_tests_after = utils.Counter()
+        self.statistics.add_value('Number of tests after minimization', self.counter_tests_after)
+        self.counter_covered_branches = utils.Counter()
+        self.statistics.add_value('Number of branches covered', self.counter_covered_branches)
+
+    def minimize(self, program_file, test_vectors, error_method, nondet_methods, stop_flag=None):
+        """Return a subset of the given test vectors with the same branch coverage.
+
+        Test vectors that are read like an earlier test vector are never selected.
+        Test vectors whose coverage can't be measured are always selected.
+        If the harness can't be compiled, all test vectors are returned.
+
+        :param stop_flag: an event that tells to stop minimization.
+            If it is set, the test vectors that weren't measured yet are selected.
+        """
+        self.timer_minimization.start()
+        try:
+            test_coverages = list()
+            unmeasured_tests = list()
+            executed_tests = ExecutedTestVectors()
+            for test_vector in test_vectors:
+                self.counter_tests_before.inc()
+                if stop_flag is not None and stop_flag.is_set():
+                    unmeasured_tests.append(test_vector)
+                    continue
+                if executed_tests.contains(test_vector):
+                    continue
+                executed_tests.add(test_vector)
+                covered_branches = self._get_covered_branches(program_file, test_vector, error_method,
+                                                              nondet_methods, stop_flag)
+                if covered_branches is None:
+                    unmeasured_tests.append(test_vector)
+                else:
+                    test_coverages.append((test_vector, covered_branches))
+                executed_tests.add_inputs_read(test_vector)
+
+            selected = select_covering_tests(test_coverages) + unmeasured_tests
+            self.counter_tests_after.inc(len(selected))
+            self.counter_covered_branches.inc(len(frozenset().union(*(c for _, c in test_coverages))))
+            logging.info("Minimized %s tests to %s tests", self.counter_tests_before.count, len(selected))
+            return selected
+        except utils.CompileError as e:
+            logging.warning("Can't compile harness for test-suite minimization, keeping all tests: %s", e.msg)
+            return list(test_vectors)
+        finally:
+            self._runner.close()
+            self.timer_minimization.stop()
+
+    def _get_covered_branches(self, program_file, test_vector, error_method, nondet_methods, stop_flag):
+        """Return the branches the given test vector covers, or None if they can't be measured."""
+        self._runner.get_executable_harness(program_file, error_method, nondet_methods)
+        # gcov adds up the coverage of all executions, so we remove the data of earlier executions
+        self._runner.reset_coverage()
+        self._runner.run(program_file, test_vector, error_method, nondet_methods, stop_flag=stop_flag)
+        if stop_flag is not None and stop_flag.is_set():
+            return None
+
+        result = utils.execute(['gcov', '-b', '-c', self._runner.program_object], quiet=True, err_to_output=False)
+        gcov_file = os.path.basename(program_file) + '.gcov'
+        if result.returncode != 0 or not os.path.exists(gcov_file):
+            logging.warning("Couldn't measure coverage of test %s", test_vector.name)
+            return None
+        with open(gcov_file, 'r') as inp:
+            covered_branches = get_covered_branches(inp.read())
+        os.remove(gcov_file)
+        return covered_branches
+
+
+def remove_test_xmls(test_vectors, directory):
+    """Remove the test-format XML files of the given test vectors from the given directory."""
+    for test_vector in test_vectors:
+        xml_file = os.path.join(directory, test_vector.name + '.xml')
+        if os.path.exists(xml_file):
+            os.remove(xml_file)
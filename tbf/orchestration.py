@@ -0,0 +1,222 @@
+"""Orchestration of test generation and test validation on a single asyncio event loop.
+
+Input generation, the intake of new tests, the validation of tests and all time limits
+are tasks on the same event loop, so each step reacts to the events of the others
+without polling. Blocking work, like the execution of tests, runs in executor threads.
+"""
+
+import asyncio
+import functools
+import logging
+import subprocess
+import sys
+
+import tbf.cache as cache
+import tbf.utils as utils
+from tbf.input_generation import BaseInputGenerator
+
+# Time to wait for the result of the input generation after it was told to stop, in seconds
+GENERATION_SHUTDOWN_TIMEOUT = 3
+
+
+def _supports_subprocesses():
+    # Before Python 3.8, asyncio can only watch child processes from the main thread,
+    # and tbf runs in a separate thread
+    return sys.version_info >= (3, 8)
+
+
+async def wait_for_any(events, futures=(), timeout=None):
+    """Wait until any of the given asyncio events is set, any of the given futures is done,
+    or the timeout is reached.
+
+    :param events: the asyncio.Event objects to wait for
+    :param futures: the futures to wait for. They are not cancelled if they aren't done.
+    :param timeout: the maximum time to wait, in seconds. If None, there is no time limit.
+    """
+    waiters = [asyncio.ensure_future(e.wait()) for e in events]
+    try:
+        await asyncio.wait(waiters + list(futures), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+
+class AsyncioOrchestrator(object):
+    """Runs input generation and test processing as tasks on one asyncio event loop.
+
+    The test processor is started in an executor thread, so that its control flow stays unchanged.
+    It runs its processing loop on the event loop through `run_processing`.
+    """
+
+    def __init__(self):
+        self.loop = None
+        # Set on the event loop as soon as the input generation is finished
+        self.generation_done = None
+        # Set on the event loop as soon as all work should stop
+        self.stop_requested = None
+        # Set as soon as the input generation should stop, to stop commands that run in threads
+        self._generation_stopped = utils.StopEvent()
+        self._generator_process = None
+
+    def run(self, input_generator, test_processor, program_file, error_method, nondet_methods, stop_event,
+            generation_timelimit=None, tests_directory=None, sequential=False):
+        """Run the given input generator and process its tests with the given test processor.
+
+        :param input_generator: the input generator to run. If None, only the existing tests
+            in the tests directory are processed.
+        :param TestProcessor test_processor: the test processor for the created tests
+        :param utils.StopEvent stop_event: the event that tells to stop all work.
+            It is set when this method returns.
+        :param generation_timelimit: the time limit for the input generation, in seconds
+        :param tests_directory: the directory of the tests to process. If None, the directory of
+            the input generator is used.
+        :param bool sequential: whether to only start the test processing after the input generation finished
+        :return: the result of the input generation as pair of success and statistics,
+            or None if the input generation didn't finish, and the result of the test processing
+            as pair of verdict and statistics
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        test_processor.orchestrator = self
+        try:
+            return self.loop.run_until_complete(self._run(
+                input_generator, test_processor, program_file, error_method, nondet_methods, stop_event,
+                generation_timelimit, tests_directory, sequential))
+        finally:
+            test_processor.orchestrator = None
+            asyncio.set_event_loop(None)
+            self.loop.close()
+
+    def run_processing(self, coroutine):
+        """Run the given coroutine on the event loop and return its result.
+
+        This must be called from a thread other than the thread of the event loop.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    async def _run(self, input_generator, test_processor, program_file, error_method, nondet_methods, stop_event,
+                   generation_timelimit, tests_directory, sequential):
+        self.generation_done = asyncio.Event()
+        self.stop_requested = asyncio.Event()
+        request_stop = functools.partial(self.loop.call_soon_threadsafe, self._request_stop)
+        stop_event.add_callback(request_stop)
+
+        generation = None
+        timer = None
+        if input_generator:
+            generation = asyncio.ensure_future(
+                self._generate(input_generator, program_file, error_method, nondet_methods))
+            generation.add_done_callback(lambda _: self.generation_done.set())
+            if generation_timelimit:
+                timer = self.loop.call_later(generation_timelimit, self.stop_generation)
+        else:
+            self.generation_done.set()
+
+        try:
+            if sequential:
+                await wait_for_any([self.generation_done, self.stop_requested])
+            processing = self.loop.run_in_executor(
+                None, test_processor.process_inputs, program_file, error_method, nondet_methods,
+                lambda: generation is None or generation.done(), stop_event, tests_directory)
+            processing_result = await processing
+            self.stop_generation()
+
+            if generation is None:
+                return (True, None), processing_result
+            try:
+                generation_result = await asyncio.wait_for(asyncio.shield(generation), GENERATION_SHUTDOWN_TIMEOUT)
+            except asyncio.TimeoutError:
+                logging.warning("Couldn't' get result of input generation")
+                generation_result = None
+            return generation_result, processing_result
+
+        finally:
+            if timer:
+                timer.cancel()
+            self.stop_generation()
+            stop_event.remove_callback(request_stop)
+            stop_event.set()
+            if generation and not generation.done():
+                generation.cancel()
+                await asyncio.wait([generation])
+
+    def _request_stop(self):
+        self.stop_requested.set()
+        self.stop_generation()
+
+    def stop_generation(self):
+        """Stop the input generation. Must be called on the event loop."""
+        self._generation_stopped.set()
+        if self._generator_process and self._generator_process.returncode is None:
+            logging.info("Input generation told to stop. Killing process.")
+            try:
+                self._generator_process.kill()
+            except ProcessLookupError:
+                pass
+
+    async def _generate(self, input_generator, program_file, error_method, nondet_methods):
+        if not isinstance(input_generator, BaseInputGenerator) or not _supports_subprocesses():
+            # The input generator runs its commands itself, e.g., in multiple processes
+            return await self.loop.run_in_executor(
+                None, input_generator.generate_input, program_file, error_method, nondet_methods,
+                self._generation_stopped)
+
+        input_generator.timer_input_gen.start()
+        try:
+            cmds = await self.loop.run_in_executor(
+                None, input_generator.prepare_input_generation, program_file, error_method, nondet_methods)
+            for cmd in cmds:
+                if self._generation_stopped.is_set():
+                    break
+                input_generator.timer_generator.start()
+                result = await self._execute(input_generator, cmd)
+                input_generator.timer_generator.stop()
+                input_generator.check_result(cmd, result, self._generation_stopped.is_set())
+            return True, input_generator.statistics
+
+        except (utils.CompileError, utils.InputGenerationError, utils.ParseError) as e:
+            return input_generator.handle_error(e)
+
+        finally:
+            input_generator.finish_input_generation()
+
+    async def _execute(self, input_generator, cmd):
+        if isinstance(cmd, (utils.CompileCommand, utils.ParallelCommands)):
+            # Compilations are short and may be cached, so we run them like all other compilations.
+            # Parallel commands are run the same way, so that they are started and stopped together
+            return await self.loop.run_in_executor(
+                None,
+                functools.partial(
+                    cache.execute_cached,
+                    cmd,
+                    input_generator.compile_cache,
+                    env=input_generator.get_run_env(),
+                    err_to_output=True,
+                    stop_flag=self._generation_stopped,
+                    show_output=input_generator.show_tool_output))
+
+        logging.info(" ".join(cmd))
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=input_generator.get_run_env())
+        self._generator_process = process
+        try:
+            if self._generation_stopped.is_set():
+                self.stop_generation()
+            output, _ = await process.communicate()
+        finally:
+            self._generator_process = None
+            if process.returncode is None:
+                try:
+                    process.kill()
+                except ProcessLookupError:
+                    pass
+                await process.wait()
+
+        try:
+            output = output.decode() if output else ''
+        except UnicodeDecodeError:
+            pass
+        if output:
+            log_output = logging.info if input_generator.show_tool_output else logging.debug
+            log_output(output)
+        return utils.ExecutionResult(process.returncode, output, '')
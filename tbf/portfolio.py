@@ -0,0 +1,194 @@
+"""Portfolio of input generators that run in parallel on the same program.
+
+Each input generator of the portfolio runs in its own process and
+its own sub-directory of the current work directory.
+The tests of all generators are collected by a single test converter,
+so the first test that reaches the error method stops all generators.
+"""
+
+import copy
+import logging
+import multiprocessing
+import os
+import queue
+
+import tbf.utils as utils
+from tbf.testcase_converter import TestConverter
+
+NAME_SEPARATOR = '.'
+
+
+def get_work_dir(generator_name):
+    return generator_name
+
+
+def _generate_in_directory(index, generator, work_dir, filename, error_method, nondet_methods, stop_flag,
+                           result_queue):
+    try:
+        os.chdir(work_dir)
+        result = generator.generate_input(filename, error_method, nondet_methods, stop_flag)
+    except Exception as e:
+        logging.error("Input generation with %s failed: %s", generator.get_name(), e)
+        result = (False, None)
+    result_queue.put((index, result))
+
+
+class PortfolioInputGenerator(object):
+    """Input generator that runs multiple input generators in parallel."""
+
+    def __init__(self, generators):
+        """Create a new portfolio of the given input generators.
+
+        :param Sequence[Tuple[str, BaseInputGenerator]] generators: the input generators to run,
+            each together with its unique name. The name determines the work directory of the
+            generator and has to be the same as used for the PortfolioTestConverter.
+        """
+        self._generators = generators
+        self.statistics = utils.StatisticsPool()
+
+    def get_name(self):
+        return '+'.join(g.get_name() for _, g in self._generators)
+
+    def generate_input(self, filename, error_method, nondet_methods, stop_flag):
+        # Generator processes only see the events that are given to them at their creation,
+        # so they get their own stop event that is set together with the given stop flag
+        generator_stop = utils.StopEvent(stop_flag)
+        result_queue = multiprocessing.Queue()
+        processes = list()
+        for index, (generator_name, generator) in enumerate(self._generators):
+            work_dir = os.path.abspath(get_work_dir(generator_name))
+            if not os.path.exists(work_dir):
+                os.mkdir(work_dir)
+            process = multiprocessing.Process(
+                target=_generate_in_directory,
+                args=(index, generator, work_dir, filename, error_method, nondet_methods, generator_stop,
+                      result_queue))
+            process.start()
+            processes.append(process)
+
+        results = [(False, None)] * len(processes)
+        pending = len(processes)
+        try:
+            while pending > 0:
+                try:
+                    index, result = result_queue.get(timeout=0.1)
+                    results[index] = result
+                    pending -= 1
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processes) and result_queue.empty():
+                        logging.warning("Input generator terminated without result")
+                        break
+        finally:
+            generator_stop.set()
+            if stop_flag is not None:
+                stop_flag.remove_callback(generator_stop.set)
+            for process in processes:
+                process.join()
+
+        for _, stats in results:
+            if stats:
+                self.statistics.add(stats)
+        return any(success for success, _ in results), self.statistics
+
+
+class PortfolioTestConverter(TestConverter):
+    """Test converter that collects the tests of all input generators of a portfolio.
+
+    To keep test names unique, the name of each test is prefixed with the name of
+    the input generator that created it.
+    """
+
+    def __init__(self, converters):
+        """Create a new test converter for a portfolio.
+
+        :param Sequence[Tuple[str, TestConverter, str]] converters: the test converters of the portfolio,
+            each together with the unique name of its input generator and the
+            directory it expects the tests in, relative to the work directory of the generator.
+        """
+        self._converters = converters
+
+    @staticmethod
+    def _get_prefix(generator_name):
+        return generator_name + NAME_SEPARATOR
+
+    def _get_converter(self, test_name):
+        for generator_name, converter, _ in self._converters:
+            prefix = self._get_prefix(generator_name)
+            if test_name.startswith(prefix):
+                return prefix, converter
+        raise AssertionError("Test doesn't belong to any input generator: " + test_name)
+
+    def _get_test_cases_in_dir(self, directory=None, exclude=()):
+        if directory is None:
+            directory = '.'
+        if exclude is None:
+            exclude = ()
+        tcs = list()
+        for generator_name, converter, tests_dir in self._converters:
+            prefix = self._get_prefix(generator_name)
+            generator_tests_dir = os.path.join(directory, get_work_dir(generator_name), tests_dir)
+            generator_exclude = set(t[len(prefix):] for t in exclude if t.startswith(prefix))
+            for test in converter._get_test_cases_in_dir(generator_tests_dir, generator_exclude):
+                tcs.append(utils.TestCase(prefix + test.name, test.origin, test.content))
+        return tcs
+
+    def _get_file_owner(self, test_file):
+        test_file = os.path.abspath(test_file)
+        for generator_name, converter, _ in self._converters:
+            work_dir = os.path.abspath(get_work_dir(generator_name))
+            if test_file.startswith(work_dir + os.sep):
+                return generator_name, converter
+        return None, None
+
+    def _get_test_case_from_file(self, test_file):
+        generator_name, converter = self._get_file_owner(test_file)
+        if converter is None:
+            raise AssertionError("Test doesn't belong to any input generator: " + test_file)
+        test = converter._get_test_case_from_file(test_file)
+        return utils.TestCase(self._get_prefix(generator_name) + test.name, test.origin, test.content)
+
+    def get_test_directories(self, directory=None):
+        if directory is None:
+            directory = '.'
+        test_dirs = list()
+        for generator_name, converter, tests_dir in self._converters:
+            generator_tests_dir = os.path.join(directory, get_work_dir(generator_name), tests_dir)
+            test_dirs += converter.get_test_directories(generator_tests_dir)
+        return test_dirs
+
+    def is_test_file(self, test_file):
+        _, converter = self._get_file_owner(test_file)
+        return converter is not None and converter.is_test_file(test_file)
+
+    def get_priority_hint(self, test_vector):
+        prefix, converter = self._get_converter(test_vector.name)
+        # The converter knows the test vector by the name its input generator gave it
+        generator_vector = copy.copy(test_vector)
+        generator_vector.name = test_vector.name[len(prefix):]
+        return converter.get_priority_hint(generator_vector)
+
+    def is_growing_test_file(self, test_file):
+        _, converter = self._get_file_owner(test_file)
+        return converter is not None and converter.is_growing_test_file(test_file)
+
+    def get_test_vectors_from_files(self, test_files, exclude=None):
+        if exclude is None:
+            exclude = ()
+        vectors = list()
+        for generator_name, converter, _ in self._converters:
+            prefix = self._get_prefix(generator_name)
+            generator_files = [f for f in test_files if self._get_file_owner(f)[0] == generator_name]
+            if not generator_files:
+                continue
+            for vector in converter.get_test_vectors_from_files(generator_files):
+                vector.name = prefix + vector.name
+                if vector.name not in exclude:
+                    vectors.append(vector)
+        return vectors
+
+    def get_test_vector(self, test_case):
+        prefix, converter = self._get_converter(test_case.name)
+        generator_test = utils.TestCase(test_case.name[len(prefix):], test_case.origin, test_case.content)
+        vector = converter.get_test_vector(generator_test)
+        vector.name = test_case.name
+        return vector
@@ -0,0 +1,160 @@
+"""Scheduling of test vectors that wait for their validation.
+
+If test-case generators create tests faster than they can be validated,
+the order of validation decides how early a violation is found.
+A TestScheduler keeps all pending test vectors in a priority queue.
+The order is defined by a scheduling policy.
+"""
+
+import hashlib
+import heapq
+import itertools
+import os
+
+DEFAULT_POLICY = 'fifo'
+
+
+class FifoPolicy(object):
+    """Validate test vectors in the order they were taken in."""
+
+    # Whether the priorities of pending test vectors change when other test vectors are validated
+    dynamic = False
+
+    def get_priority(self, test_vector, sequence_number):
+        return sequence_number,
+
+    def executed(self, test_vector):
+        pass
+
+
+class NewestFirstPolicy(FifoPolicy):
+    """Validate the most recently created test vectors first.
+
+    The creation time of a test vector is the modification time of its file.
+    Test vectors of the same time, e.g., from the same file, are validated in reverse order of their intake.
+    """
+
+    @staticmethod
+    def _get_creation_time(test_vector):
+        try:
+            return os.stat(test_vector.origin).st_mtime_ns
+        except OSError:
+            return 0
+
+    def get_priority(self, test_vector, sequence_number):
+        return -self._get_creation_time(test_vector), -sequence_number
+
+
+class ShortestFirstPolicy(FifoPolicy):
+    """Validate short test vectors first. They are cheap to run and often reach shallow violations."""
+
+    def get_priority(self, test_vector, sequence_number):
+        return len(test_vector), sequence_number
+
+
+class HintsPolicy(FifoPolicy):
+    """Validate test vectors first that the test-case generator considers interesting.
+
+    The interest is given by the test converter's `get_priority_hint`.
+    """
+
+    def __init__(self, converter):
+        self._converter = converter
+
+    def get_priority(self, test_vector, sequence_number):
+        return -self._converter.get_priority_hint(test_vector), sequence_number
+
+
+class NoveltyPolicy(FifoPolicy):
+    """Validate test vectors first that share the shortest prefix of inputs with any validated test vector.
+
+    Test vectors that start like an already validated test vector likely run along the same path,
+    so test vectors with new inputs early on are more likely to reach new parts of the program.
+    """
+
+    dynamic = True
+
+    def __init__(self):
+        self._executed_prefixes = set()
+
+    @staticmethod
+    def _get_prefix_hashes(test_vector):
+        hash_obj = hashlib.sha256()
+        for value in test_vector.get_canonical_values():
+            hash_obj.update(repr(value).encode() + b'\n')
+            yield hash_obj.digest()
+
+    def get_priority(self, test_vector, sequence_number):
+        shared_prefix = 0
+        for prefix in self._get_prefix_hashes(test_vector):
+            if prefix not in self._executed_prefixes:
+                break
+            shared_prefix += 1
+        return shared_prefix, sequence_number
+
+    def executed(self, test_vector):
+        self._executed_prefixes.update(self._get_prefix_hashes(test_vector))
+
+
+POLICIES = ('fifo', 'newest', 'shortest', 'hints', 'novelty')
+
+
+def create_policy(name, converter):
+    """Create the scheduling policy with the given name.
+
+    :param str name: the name of the policy. One of POLICIES.
+    :param TestConverter converter: the test converter that creates the scheduled test vectors
+    """
+    if name == 'fifo':
+        return FifoPolicy()
+    elif name == 'newest':
+        return NewestFirstPolicy()
+    elif name == 'shortest':
+        return ShortestFirstPolicy()
+    elif name == 'hints':
+        return HintsPolicy(converter)
+    elif name == 'novelty':
+        return NoveltyPolicy()
+    raise AssertionError("Unhandled scheduling policy: " + name)
+
+
+class TestScheduler(object):
+    """Priority queue of test vectors that wait for their validation."""
+
+    def __init__(self, policy):
+        self._policy = policy
+        self._queue = list()
+        self._sequence = itertools.count()
+
+    def __len__(self):
+        return len(self._queue)
+
+    def push(self, test_vectors):
+        """Add the given test vectors to the pending test vectors."""
+        for test_vector in test_vectors:
+            sequence_number = next(self._sequence)
+            priority = self._policy.get_priority(test_vector, sequence_number)
+            heapq.heappush(self._queue, (priority, sequence_number, test_vector))
+
+    def pop(self, count):
+        """Remove and return the given number of pending test vectors with the highest priority.
+
+        If fewer test vectors are pending, all of them are returned.
+        """
+        test_vectors = list()
+        while self._queue and len(test_vectors) < count:
+            priority, sequence_number, test_vector = heapq.heappop(self._queue)
+            if self._policy.dynamic:
+                # Priorities only get worse over time, so we re-evaluate lazily:
+                # if the priority changed, the test vector goes back to the queue.
+                current_priority = self._policy.get_priority(test_vector, sequence_number)
+                if current_priority != priority:
+                    heapq.heappush(self._queue, (current_priority, sequence_number, test_vector))
+                    continue
+            test_vectors.append(test_vector)
+        return test_vectors
+
+    def executed(self, test_vectors):
+        """Inform the scheduler that the given test vectors were validated."""
+        for test_vector in test_vectors:
+            self._policy.executed(test_vector)
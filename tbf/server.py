@@ -0,0 +1,425 @@
+"""Server mode of tbf: a long-running process that runs tbf jobs sent over a Unix domain socket.
+
+Like the batch mode, the server runs jobs on a bounded pool of worker processes.
+Each worker imports tbf and its tools once and keeps its in-memory caches,
+e.g., the C parser, between jobs. All workers share the compile cache.
+A client sends one job per connection: the command-line arguments of tbf
+and the directory that relative paths in them refer to. The server answers
+with one JSON object per line: first that the job is accepted, then its result.
+"""
+
+import argparse
+import collections
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+from contextlib import redirect_stderr, redirect_stdout
+
+import tbf
+import tbf.batch as batch
+import tbf.utils as utils
+
+SOCKET_NAME = 'tbf.sock'
+JOB_DIR_PREFIX = 'job-'
+
+# Maximum size of a job description, in bytes
+MAX_REQUEST_SIZE = 1024 * 1024
+
+STATUS_ACCEPTED = 'accepted'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+
+def get_default_socket_path():
+    """Return the default path of the socket of the tbf server.
+
+    The socket is placed in `$XDG_RUNTIME_DIR` or, if that isn't set,
+    in a user-specific file in the temporary directory.
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, SOCKET_NAME)
+    return os.path.join(tempfile.gettempdir(), 'tbf-{}.sock'.format(os.getuid()))
+
+
+def run_job(argv, cwd, output_dir):
+    """Run tbf with the given command-line arguments and write all output to the given directory.
+
+    :param List[str] argv: the command-line arguments of tbf, as for a single run
+    :param str cwd: the directory that relative paths in the arguments refer to
+    :param str output_dir: directory for all output files of this job
+    :return dict: the result of the job. If the arguments are invalid, it only contains an entry 'error'.
+        Otherwise, it contains the entries of `batch.run_task` and
+        the entries 'statistics' and 'stdout' with the statistics and the console output of the run.
+    """
+    old_dir = os.path.abspath('.')
+    try:
+        os.chdir(cwd)
+        parser_output = io.StringIO()
+        try:
+            with redirect_stdout(parser_output), redirect_stderr(parser_output):
+                args = tbf._parse_cli_args(argv)
+        except SystemExit as e:
+            message = parser_output.getvalue().strip()
+            return {'error': message if message else str(e.code)}
+        except ValueError as e:
+            return {'error': str(e)}
+
+        result = batch.run_task(args, output_dir)
+        result['statistics'] = _read_file(os.path.join(output_dir, 'Statistics.txt'))
+        result['stdout'] = _read_file(os.path.join(output_dir, batch.TASK_OUTPUT_FILE))
+        return result
+    finally:
+        os.chdir(old_dir)
+
+
+def _read_file(path):
+    try:
+        with open(path, 'r') as inp:
+            return inp.read()
+    except OSError:
+        return ''
+
+
+def _work(task_queue, result_queue):
+    # Ctrl+C in the terminal reaches all processes of the group, but only the server should handle it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for job_number, argv, cwd, output_dir in iter(task_queue.get, None):
+        result = run_job(argv, cwd, output_dir)
+        result_queue.put((job_number, os.getpid(), result))
+
+
+class WorkerPool(object):
+    """A fixed number of worker processes that run the jobs of the server.
+
+    Each worker has its own task queue and gets a job only when it is idle,
+    so the pool always knows which worker runs which job.
+    Workers that terminate unexpectedly are replaced, and the job they were running fails.
+    """
+
+    def __init__(self, worker_number):
+        self.worker_number = worker_number
+        self._result_queue = multiprocessing.Queue()
+        # Map of worker pid to the worker and its task queue
+        self._workers = dict()
+        self._idle_workers = list()
+        # Jobs that wait for an idle worker
+        self._pending = collections.deque()
+        # Map of worker pid to the number of the job the worker runs
+        self._running = dict()
+        self._result_callbacks = dict()
+        self._lock = threading.Lock()
+        self._dispatcher = None
+        self._stopping = False
+
+    def start(self):
+        with self._lock:
+            for _ in range(self.worker_number):
+                self._start_worker()
+        self._dispatcher = threading.Thread(target=self._dispatch_results, name='result-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    def _start_worker(self):
+        task_queue = multiprocessing.Queue()
+        # Workers are no daemon processes because they may need to start processes themselves
+        worker = multiprocessing.Process(target=_work, args=(task_queue, self._result_queue))
+        worker.start()
+        self._workers[worker.pid] = (worker, task_queue)
+        self._idle_workers.append(worker.pid)
+
+    def _assign_jobs(self):
+        while self._pending and self._idle_workers and not self._stopping:
+            pid = self._idle_workers.pop()
+            job = self._pending.popleft()
+            # The job is recorded before the worker can get it, so it fails if the worker terminates
+            self._running[pid] = job[0]
+            self._workers[pid][1].put(job)
+
+    def submit(self, job_number, argv, cwd, output_dir, result_callback):
+        """Queue the given job. `result_callback` is called with the result of the job as soon as it is done."""
+        with self._lock:
+            self._result_callbacks[job_number] = result_callback
+            self._pending.append((job_number, argv, cwd, output_dir))
+            self._assign_jobs()
+
+    def _dispatch_results(self):
+        while True:
+            try:
+                message = self._result_queue.get(timeout=1)
+            except queue.Empty:
+                self._replace_dead_workers()
+                continue
+            if message is None:
+                return
+            job_number, pid, result = message
+            with self._lock:
+                if self._running.pop(pid, None) is not None and pid in self._workers:
+                    self._idle_workers.append(pid)
+                    self._assign_jobs()
+            self._call_back(job_number, result)
+
+    def _replace_dead_workers(self):
+        failed_jobs = list()
+        with self._lock:
+            if self._stopping:
+                return
+            for pid, (worker, _) in list(self._workers.items()):
+                if worker.is_alive():
+                    continue
+                logging.error("Worker %s terminated unexpectedly with exit code %s", pid, worker.exitcode)
+                del self._workers[pid]
+                if pid in self._idle_workers:
+                    self._idle_workers.remove(pid)
+                job_number = self._running.pop(pid, None)
+                if job_number is not None:
+                    failed_jobs.append(job_number)
+                self._start_worker()
+            self._assign_jobs()
+        for job_number in failed_jobs:
+            self._call_back(job_number, {'error': "Worker terminated unexpectedly"})
+
+    def _call_back(self, job_number, result):
+        with self._lock:
+            callback = self._result_callbacks.pop(job_number, None)
+        if callback:
+            callback(result)
+
+    def stop(self, timeout=5):
+        """Stop all workers after they finished their current job.
+
+        Jobs that no worker started yet fail.
+        Workers that don't finish within the given time, in seconds, are terminated.
+        """
+        with self._lock:
+            self._stopping = True
+            pending = [job[0] for job in self._pending]
+            self._pending.clear()
+            workers = [worker for worker, _ in self._workers.values()]
+            for _, task_queue in self._workers.values():
+                task_queue.put(None)
+        for job_number in pending:
+            self._call_back(job_number, {'error': "Server shut down before the job started"})
+        for worker in workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                logging.info("Worker %s didn't terminate within acceptable limit. Killing it.", worker.pid)
+                worker.terminate()
+                worker.join()
+        self._result_queue.put(None)
+        if self._dispatcher:
+            self._dispatcher.join()
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_SIZE).decode())
+            argv = request['argv']
+            cwd = request['cwd']
+            if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv) \
+                    or not isinstance(cwd, str):
+                raise ValueError("Invalid job description")
+        except (ValueError, KeyError, TypeError) as e:
+            self._send({'status': STATUS_ERROR, 'message': "Invalid request: " + str(e)})
+            return
+
+        result = queue.Queue()
+        job_number, output_dir = self.server.submit(argv, cwd, result.put)
+        self._send({'status': STATUS_ACCEPTED, 'job': job_number, 'output': output_dir})
+
+        result = result.get()
+        if 'error' in result:
+            self._send({'status': STATUS_ERROR, 'job': job_number, 'message': result['error']})
+        else:
+            result['status'] = STATUS_DONE
+            result['job'] = job_number
+            self._send(result)
+
+    def _send(self, message):
+        try:
+            self.wfile.write((json.dumps(message) + '\n').encode())
+            self.wfile.flush()
+        except OSError as e:
+            logging.warning("Couldn't send answer to client: %s", e)
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Accepts tbf jobs on a Unix domain socket and runs them on a `WorkerPool`."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, worker_pool, output_dir):
+        self.socket_path = socket_path
+        self.worker_pool = worker_pool
+        self.output_dir = output_dir
+        self._job_count = 0
+        self._job_lock = threading.Lock()
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _JobHandler)
+
+    def server_bind(self):
+        # Jobs run arbitrary programs, so only the user that started the server may submit them.
+        # The socket must be private from its creation on, so that no other user can connect before a chmod.
+        old_umask = os.umask(0o077)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+        os.chmod(self.socket_path, 0o600)
+
+    def submit(self, argv, cwd, result_callback):
+        """Run a job with the given arguments on the worker pool.
+
+        :return: the number of the job and its output directory
+        """
+        with self._job_lock:
+            job_number = self._job_count
+            self._job_count += 1
+        output_dir = os.path.join(self.output_dir, "{}{:05d}".format(JOB_DIR_PREFIX, job_number))
+        logging.info("Job %s: %s", job_number, ' '.join(argv))
+
+        def log_and_call_back(result):
+            logging.info("Job %s: %s", job_number, result.get('verdict', result.get('error')))
+            result_callback(result)
+
+        self.worker_pool.submit(job_number, argv, cwd, output_dir, log_and_call_back)
+        return job_number, output_dir
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.remove(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(socket_path):
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            # No server listens on the socket anymore
+            os.remove(socket_path)
+        else:
+            raise utils.ConfigError("A server already listens on " + socket_path)
+
+
+def submit_job(argv, cwd, socket_path, on_accepted=None):
+    """Send a job to the tbf server and wait for its result.
+
+    :param List[str] argv: the command-line arguments of tbf, as for a single run
+    :param str cwd: the directory that relative paths in the arguments refer to
+    :param str socket_path: the socket the server listens on
+    :param on_accepted: function that is called with the answer of the server as soon as the job is accepted
+    :return dict: the last answer of the server, with entry 'status'
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({'argv': argv, 'cwd': cwd}) + '\n').encode())
+        with sock.makefile('rb') as answers:
+            for line in answers:
+                answer = json.loads(line.decode())
+                if answer['status'] == STATUS_ACCEPTED:
+                    if on_accepted:
+                        on_accepted(answer)
+                else:
+                    return answer
+    return {'status': STATUS_ERROR, 'message': "Server closed the connection"}
+
+
+def _create_serve_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='tbf serve',
+        description='Run tbf as a server that runs the jobs it gets through a Unix domain socket')
+    parser.add_argument(
+        "--socket",
+        dest="socket_path",
+        action="store",
+        default=get_default_socket_path(),
+        help="path of the socket to listen on. Default: " + get_default_socket_path())
+    parser.add_argument(
+        "--jobs",
+        '-j',
+        dest="jobs",
+        action="store",
+        type=int,
+        default=os.cpu_count(),
+        help="number of jobs to run in parallel. Default: number of CPUs")
+    parser.add_argument(
+        '--verbose',
+        '-v',
+        dest="log_verbose",
+        action='store_true',
+        default=False,
+        help="print verbose information")
+    return parser
+
+
+def serve_main(argv):
+    parser = _create_serve_arg_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("Number of jobs must be at least 1")
+
+    if args.log_verbose:
+        logging.getLogger().setLevel(level=logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(level=logging.INFO)
+
+    worker_pool = WorkerPool(args.jobs)
+    try:
+        server = JobServer(args.socket_path, worker_pool, utils.OUTPUT_DIR)
+    except utils.ConfigError as e:
+        sys.exit(e.msg)
+
+    # Start the workers before any other thread, so that they don't inherit locks held by other threads
+    worker_pool.start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    logging.info("Listening on %s with %s job(s)", args.socket_path, args.jobs)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info("Shutting down")
+        server.server_close()
+        worker_pool.stop()
+
+
+def submit_main(argv):
+    """Run a job on the tbf server.
+
+    All arguments are tbf arguments for a single run, except for an optional
+    first argument `--socket PATH` that defines the socket of the server.
+    """
+    if argv[:1] == ['--socket']:
+        if len(argv) < 2:
+            sys.exit("Argument --socket requires a path")
+        socket_path = argv[1]
+        argv = argv[2:]
+    else:
+        socket_path = get_default_socket_path()
+    logging.getLogger().setLevel(level=logging.INFO)
+
+    try:
+        answer = submit_job(argv, os.path.abspath('.'), socket_path,
+                            on_accepted=lambda a: logging.info("Job %s accepted, output in %s", a['job'], a['output']))
+    except OSError as e:
+        sys.exit("Couldn't connect to tbf server at {}: {}".format(socket_path, e))
+
+    if answer['status'] != STATUS_DONE:
+        sys.exit(answer['message'])
+    sys.stdout.write(answer['stdout'])
+    return 0 if answer['verdict'] != utils.ERROR else 1
@@ -0,0 +1,14 @@
+"""Helpers shared by the tests of tbf."""
+
+import tbf.utils as utils
+
+
+def create_vector(name, *values):
+    """Return a test vector with the given name and values.
+
+    The name is also used as the origin file of the test vector.
+    """
+    test_vector = utils.TestVector(name, name)
+    for value in values:
+        test_vector.add(value)
+    return test_vector
@@ -0,0 +1,85 @@
+import argparse
+import csv
+import os
+import tempfile
+
+from nose.tools import assert_equal, assert_true
+
+import tbf
+import tbf.batch as batch
+import tbf.utils as utils
+
+
+def _write(path, content=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as outp:
+        outp.write(content)
+
+
+def test_read_task_list():
+    with tempfile.TemporaryDirectory() as directory:
+        for task in ('tasks/b.c', 'tasks/a.c', 'tasks/a.i', 'other.c'):
+            _write(os.path.join(directory, task))
+        task_list = os.path.join(directory, 'tasks.set')
+        _write(task_list, "# comment\n\ntasks/*.c\n  other.c  \nmissing/*.c\n")
+
+        tasks = batch.read_task_list(task_list)
+        assert_equal(tasks, [os.path.join(directory, t) for t in ('tasks/a.c', 'tasks/b.c', 'other.c')])
+
+
+def test_get_tasks():
+    with tempfile.TemporaryDirectory() as directory:
+        for task in ('a.c', 'b.c'):
+            _write(os.path.join(directory, task))
+        first_list = os.path.join(directory, 'first.txt')
+        _write(first_list, "b.c\n")
+        second_list = os.path.join(directory, 'second.txt')
+        _write(second_list, "*.c\n")
+
+        tasks = batch.get_tasks([first_list, second_list])
+        assert_equal(tasks, [os.path.join(directory, t) for t in ('b.c', 'a.c')])
+
+
+def test_run_task():
+    original_run = tbf.run
+    original_output_dir = utils.OUTPUT_DIR
+
+    def run(args, stop_event):
+        print("Running on " + args.file)
+        if args.file == 'broken.c':
+            raise utils.InputGenerationError("Broken")
+        return utils.FALSE
+
+    tbf.run = run
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for task_number, task, verdict in ((0, 'program.c', utils.FALSE), (1, 'broken.c', utils.ERROR)):
+                output_dir = batch.get_task_output_dir(directory, task_number, task)
+                assert_equal(os.path.basename(output_dir), "{:05d}-{}".format(task_number, task))
+
+                result = batch.run_task(argparse.Namespace(file=task, timelimit=None), output_dir)
+                assert_equal(result['task'], task)
+                assert_equal(result['verdict'], verdict)
+                assert_equal(result['output'], output_dir)
+                assert_true(result['walltime'] >= 0)
+                with open(os.path.join(output_dir, batch.TASK_OUTPUT_FILE)) as inp:
+                    assert_equal(inp.read(), "Running on " + task + "\n")
+    finally:
+        tbf.run = original_run
+        utils.set_output_dir(original_output_dir)
+
+
+def test_write_results():
+    results = [
+        {'task': 'a.c', 'verdict': utils.FALSE, 'walltime': 1.5, 'output': 'output/00000-a.c'},
+        {'task': 'b,c.c', 'verdict': utils.UNKNOWN, 'walltime': 2, 'output': 'output/00001-b,c.c'},
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        results_file = os.path.join(directory, batch.RESULTS_FILE)
+        batch.write_results(results, results_file)
+
+        with open(results_file, newline='') as inp:
+            rows = list(csv.reader(inp))
+    assert_equal(rows[0], ['task', 'verdict', 'walltime', 'output'])
+    assert_equal(rows[1:], [['a.c', utils.FALSE, '1.5', 'output/00000-a.c'],
+                            ['b,c.c', utils.UNKNOWN, '2', 'output/00001-b,c.c']])
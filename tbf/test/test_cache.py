@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+from nose.tools import assert_equal, assert_false, assert_is_none, assert_true
+
+import tbf.cache as cache
+import tbf.utils as utils
+
+PROGRAM = """extern int __VERIFIER_nondet_int(void);
+extern void __VERIFIER_error(void);
+int main() {
+  if (__VERIFIER_nondet_int()) {
+    __VERIFIER_error();
+  }
+}
+"""
+
+
+def test_values():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        file_cache = cache.FileCache(cache_dir)
+        key = file_cache.get_value_key('test', 1)
+        assert_equal(key, cache.FileCache.get_value_key('test', 1))
+        assert_true(key != cache.FileCache.get_value_key('test', 2))
+
+        assert_is_none(file_cache.get_value(key))
+        file_cache.put_value(key, {'a': [1, 2]})
+        assert_equal(file_cache.get_value(key), {'a': [1, 2]})
+
+
+def test_files():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        file_cache = cache.FileCache(cache_dir)
+        output_file = os.path.join(cache_dir, 'output')
+        key = file_cache.get_value_key('files')
+
+        assert_false(file_cache.get(key, [output_file]))
+        with open(output_file, 'w') as outp:
+            outp.write('content')
+        file_cache.put(key, [output_file])
+        os.remove(output_file)
+
+        assert_true(file_cache.get(key, [output_file]))
+        with open(output_file, 'r') as inp:
+            assert_equal(inp.read(), 'content')
+
+
+def test_undefined_functions():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        program_file = os.path.join(cache_dir, 'program.c')
+        with open(program_file, 'w') as outp:
+            outp.write(PROGRAM)
+        file_cache = cache.FileCache(cache_dir)
+
+        expected = [{'name': '__VERIFIER_nondet_int', 'type': 'int', 'params': ['void']}]
+        assert_equal(utils.find_nondet_methods(program_file, False, ['__VERIFIER_error'], file_cache), expected)
+
+        utils._undefined_functions_memo.clear()
+        functions = utils.find_nondet_methods(program_file, False, (), file_cache)
+        assert_equal([f['name'] for f in functions], ['__VERIFIER_nondet_int', '__VERIFIER_error'])
+
+
+def test_compile_key_includes_headers():
+    with tempfile.TemporaryDirectory() as directory:
+        header_file = os.path.join(directory, 'my header.h')
+        program_file = os.path.join(directory, 'program.c')
+        with open(header_file, 'w') as outp:
+            outp.write('#define VALUE 1\n')
+        with open(program_file, 'w') as outp:
+            outp.write('#include "my header.h"\nint main() { return VALUE; }\n')
+        command = utils.CompileCommand(['gcc', '-c', program_file, '-o', os.path.join(directory, 'program.o')],
+                                       inputs=[program_file], outputs=[os.path.join(directory, 'program.o')])
+        assert_true(header_file in cache.get_dependencies(command))
+
+        file_cache = cache.FileCache(directory)
+        key = file_cache.get_key(command)
+        with open(header_file, 'w') as outp:
+            outp.write('#define VALUE 2\n')
+        assert_true(file_cache.get_key(command) != key)
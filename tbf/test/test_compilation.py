@@ -0,0 +1,119 @@
+import os
+import subprocess
+import tempfile
+
+from nose.tools import assert_equal, assert_in, assert_not_in, assert_raises, assert_true
+
+import tbf.compilation as compilation
+import tbf.utils as utils
+
+PROGRAM = """extern int __VERIFIER_nondet_int(void);
+int main() {
+  return __VERIFIER_nondet_int();
+}
+"""
+# The harness of this program can only be compiled with the type definitions of the program
+PROGRAM_WITH_TYPES = """struct pair { int first; int second; };
+extern struct pair __VERIFIER_nondet_pair(void);
+int main() {
+  struct pair p = __VERIFIER_nondet_pair();
+  return p.first + p.second;
+}
+"""
+HARNESS = """int __VERIFIER_nondet_int(void) {
+  return VALUE;
+}
+"""
+HARNESS_WITH_TYPES = """struct pair __VERIFIER_nondet_pair(void) {
+  struct pair p = { 2, VALUE };
+  return p;
+}
+"""
+
+
+def _reset_memo():
+    compilation._program_objects.clear()
+    compilation._program_c_versions.clear()
+    compilation._combined_programs.clear()
+
+
+def _write(directory, filename, content):
+    path = os.path.join(directory, filename)
+    with open(path, 'w') as outp:
+        outp.write(content)
+    return path
+
+
+def _compile_and_run(work_dir, program_file, harness, value):
+    previous_dir = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        harness_file = _write(work_dir, 'harness.c', harness.replace('VALUE', str(value)))
+        program_object = compilation.compile_harness(program_file, harness_file, 'a.out', utils.MACHINE_MODEL_64)
+        returncode = subprocess.call([os.path.join(work_dir, 'a.out')])
+    finally:
+        os.chdir(previous_dir)
+    return program_object, returncode
+
+
+def test_compile_separately():
+    _reset_memo()
+    with tempfile.TemporaryDirectory() as directory:
+        program_file = _write(directory, 'program.c', PROGRAM)
+        first_dir = os.path.join(directory, 'first')
+        second_dir = os.path.join(directory, 'second')
+        os.mkdir(first_dir)
+        os.mkdir(second_dir)
+
+        program_object, returncode = _compile_and_run(first_dir, program_file, HARNESS, 3)
+        assert_equal(returncode, 3)
+        assert_equal(os.path.dirname(program_object), first_dir)
+        assert_true(os.path.basename(program_object).startswith('program.'))
+        assert_equal(list(compilation._program_objects.values()), [program_object])
+
+        # The memoized program object is reused from the work directory it was compiled in
+        modification_time = os.stat(program_object).st_mtime_ns
+        assert_equal(_compile_and_run(second_dir, program_file, HARNESS, 4), (program_object, 4))
+        assert_equal(os.stat(program_object).st_mtime_ns, modification_time)
+        assert_equal(sorted(os.listdir(second_dir)), ['a.out', 'harness.c', 'harness.o'])
+
+        # If the memoized program object is gone, the program is compiled again in the current work directory
+        os.remove(program_object)
+        program_object, returncode = _compile_and_run(second_dir, program_file, HARNESS, 5)
+        assert_equal(returncode, 5)
+        assert_equal(os.path.dirname(program_object), second_dir)
+        assert_equal(list(compilation._program_objects.values()), [program_object])
+    _reset_memo()
+
+
+def test_compile_together():
+    _reset_memo()
+    with tempfile.TemporaryDirectory() as directory:
+        program_file = _write(directory, 'program.c', PROGRAM_WITH_TYPES)
+        program_key = (compilation._get_file_hash(program_file), utils.MACHINE_MODEL_64.name)
+
+        program_object, returncode = _compile_and_run(directory, program_file, HARNESS_WITH_TYPES, 1)
+        assert_equal(returncode, 3)
+        assert_equal(program_object, os.path.join(directory, 'harness.o'))
+        assert_in(program_key, compilation._combined_programs)
+
+        # Later harnesses are compiled together with the program right away
+        compilation._program_objects.clear()
+        program_object, returncode = _compile_and_run(directory, program_file, HARNESS_WITH_TYPES, 2)
+        assert_equal(returncode, 4)
+        assert_equal(program_object, os.path.join(directory, 'harness.o'))
+        assert_equal(compilation._program_objects, dict())
+
+        # Harnesses that can't be compiled together with the program are reported
+        assert_raises(utils.CompileError, _compile_and_run, directory, program_file, HARNESS_WITH_TYPES, 'x')
+    _reset_memo()
+
+
+def test_compile_program_error():
+    _reset_memo()
+    with tempfile.TemporaryDirectory() as directory:
+        program_file = _write(directory, 'program.c', 'int main() { return }')
+        assert_raises(utils.CompileError, _compile_and_run, directory, program_file, HARNESS, 1)
+        program_key = (compilation._get_file_hash(program_file), utils.MACHINE_MODEL_64.name)
+        assert_not_in(program_key, compilation._program_c_versions)
+    _reset_memo()
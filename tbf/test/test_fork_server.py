@@ -0,0 +1,111 @@
+import os
+import subprocess
+import tempfile
+import threading
+
+from nose.tools import assert_equal, assert_raises, assert_true
+
+import tbf.harness_generation as harness_gen
+import tbf.utils as utils
+from tbf.fork_server import ForkServer
+
+PROGRAM = """extern int __VERIFIER_nondet_int(void);
+extern void abort(void);
+extern long write(int fd, const void *buf, unsigned long n);
+int main() {
+  int x = __VERIFIER_nondet_int();
+  if (x == 1) {
+    while (1);
+  } else if (x == 2) {
+    abort();
+  } else if (x == 4) {
+    write(2, "\\xc3\\xa4\\xc3\\xa4\\xc3\\xa4", 6);
+  }
+  return x;
+}
+"""
+NONDET_METHODS = [{'name': '__VERIFIER_nondet_int', 'type': 'int', 'params': ['void']}]
+# Declarations of the C library for 32-bit machines, as a program that includes unistd.h would see them
+DECLARATIONS_32 = """extern int read (int __fd, void *__buf, unsigned int __nbytes);
+extern int write (int __fd, const void *__buf, unsigned int __n);
+"""
+
+
+def _compile_harness(directory, machine_model, fork_server=True):
+    program_file = os.path.join(directory, 'program.c')
+    with open(program_file, 'w') as outp:
+        outp.write(PROGRAM)
+    harness_file = os.path.join(directory, 'harness.c')
+    with open(harness_file, 'wb') as outp:
+        outp.write(harness_gen.HarnessCreator().create_harness(NONDET_METHODS, None, fork_server=fork_server))
+    executable = os.path.join(directory, 'a.out')
+    subprocess.check_call(['gcc', machine_model.compile_parameter, '-include', program_file, '-o', executable,
+                           harness_file], stderr=subprocess.DEVNULL)
+    return executable
+
+
+def test_run():
+    with tempfile.TemporaryDirectory() as directory:
+        fork_server = ForkServer(_compile_harness(directory, utils.MACHINE_MODEL_64))
+        try:
+            result = fork_server.run('5\n')
+            assert_equal(result.returncode, 5)
+            assert_equal(harness_gen.get_inputs_read(result.stderr), 1)
+
+            # Each run gets its own input and error output
+            result = fork_server.run(b'7\n')
+            assert_equal(result.returncode, 7)
+            assert_equal(result.stderr.count(harness_gen.INPUTS_READ_MESSAGE), 1)
+        finally:
+            fork_server.close()
+
+
+def test_output_limit():
+    with tempfile.TemporaryDirectory() as directory:
+        fork_server = ForkServer(_compile_harness(directory, utils.MACHINE_MODEL_64))
+        try:
+            inputs_read = harness_gen.INPUTS_READ_MESSAGE + '1\n'
+            assert_equal(fork_server.run('4\n').stderr, 'äää' + inputs_read)
+            # The limit cuts the first character in two, of which the rest is dropped
+            result = fork_server.run('4\n', output_limit=len(inputs_read) + 5)
+            assert_equal(result.stderr, 'ää' + inputs_read)
+        finally:
+            fork_server.close()
+
+
+def test_timeout_crash_and_stop_flag():
+    with tempfile.TemporaryDirectory() as directory:
+        fork_server = ForkServer(_compile_harness(directory, utils.MACHINE_MODEL_64))
+        try:
+            stopwatch = utils.Stopwatch()
+            stopwatch.start()
+            result = fork_server.run('1\n', timelimit=0.2)
+            assert_equal(result.returncode, -9)
+
+            assert_equal(fork_server.run('2\n').returncode, -6)
+
+            stop_flag = utils.StopEvent()
+            threading.Timer(0.2, stop_flag.set).start()
+            assert_equal(fork_server.run('1\n', stop_flag=stop_flag).returncode, -9)
+            assert_true(stopwatch.curr_s() < 5)
+
+            # The fork server keeps working after killed and crashed runs
+            assert_equal(fork_server.run('3\n').returncode, 3)
+        finally:
+            fork_server.close()
+
+
+def test_no_fork_server():
+    with tempfile.TemporaryDirectory() as directory:
+        executable = _compile_harness(directory, utils.MACHINE_MODEL_64, fork_server=False)
+        # Without fork server, the harness runs the program on its empty input and terminates
+        assert_raises(utils.ForkServerError, ForkServer, executable)
+
+
+def test_declarations_32():
+    with tempfile.TemporaryDirectory() as directory:
+        harness_file = os.path.join(directory, 'harness.c')
+        with open(harness_file, 'wb') as outp:
+            outp.write(DECLARATIONS_32.encode() + harness_gen.HarnessCreator()._get_fork_server())
+        subprocess.check_call(['gcc', utils.MACHINE_MODEL_32.compile_parameter, '-c', '-o',
+                               os.path.join(directory, 'harness.o'), harness_file])
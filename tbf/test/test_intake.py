@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+from nose.tools import assert_equal
+
+from tbf.testcase_intake import InotifyWatcher, PollingWatcher, TailReader
+from tbf.tools.cpatiger import CpaTigerTestConverter
+
+
+def _check_watcher(watcher_type):
+    base_dir = tempfile.mkdtemp()
+    try:
+        tests_dir = os.path.join(base_dir, 'tests')
+        watcher = watcher_type([tests_dir])
+        try:
+            assert_equal(watcher.wait(0.01), [])
+
+            os.mkdir(tests_dir)
+            first_test = os.path.join(tests_dir, 'test1')
+            with open(first_test, 'w') as outp:
+                outp.write('1\n')
+            assert_equal(watcher.wait(1), [first_test])
+
+            second_test = os.path.join(tests_dir, 'test2')
+            with open(second_test, 'w') as outp:
+                outp.write('2\n')
+            assert_equal(watcher.wait(1), [second_test])
+            assert_equal(watcher.wait(0.01), [])
+
+            # Changes are also reported without waiting
+            third_test = os.path.join(tests_dir, 'test3')
+            with open(third_test, 'w') as outp:
+                outp.write('3\n')
+            assert_equal(watcher.wait(0), [third_test])
+        finally:
+            watcher.close()
+    finally:
+        shutil.rmtree(base_dir)
+
+
+def test_polling_watcher():
+    _check_watcher(PollingWatcher)
+
+
+def test_inotify_watcher():
+    _check_watcher(InotifyWatcher)
+
+
+def test_tail_reader():
+    base_dir = tempfile.mkdtemp()
+    try:
+        test_file = os.path.join(base_dir, 'testsuite.txt')
+        reader = TailReader()
+        assert_equal(reader.read_new_lines(test_file), ([], False))
+
+        with open(test_file, 'w') as outp:
+            outp.write('a\nb')
+        assert_equal(reader.read_new_lines(test_file), (['a'], False))
+        with open(test_file, 'a') as outp:
+            outp.write('c\nd\n')
+        assert_equal(reader.read_new_lines(test_file), (['bc', 'd'], False))
+        assert_equal(reader.read_new_lines(test_file), ([], False))
+
+        with open(test_file, 'w') as outp:
+            outp.write('e\n')
+        assert_equal(reader.read_new_lines(test_file), (['e'], True))
+
+        replacement = os.path.join(base_dir, 'replacement')
+        with open(replacement, 'w') as outp:
+            outp.write('f\ng\n')
+        os.rename(replacement, test_file)
+        assert_equal(reader.read_new_lines(test_file), (['f', 'g'], True))
+    finally:
+        shutil.rmtree(base_dir)
+
+
+def test_growing_test_suite():
+    base_dir = tempfile.mkdtemp()
+    try:
+        test_file = os.path.join(base_dir, 'testsuite.txt')
+        converter = CpaTigerTestConverter()
+        with open(test_file, 'w') as outp:
+            outp.write('[1, 2]\n[3')
+        vectors = converter.get_test_vectors(base_dir)
+        assert_equal([(v.name, [i['value'] for i in v.vector]) for v in vectors], [('0', ['1', '2'])])
+
+        with open(test_file, 'a') as outp:
+            outp.write(', 4]\n')
+        vectors = converter.get_test_vectors(base_dir, {'0'})
+        assert_equal([(v.name, [i['value'] for i in v.vector]) for v in vectors], [('1', ['3', '4'])])
+    finally:
+        shutil.rmtree(base_dir)
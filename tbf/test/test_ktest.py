@@ -0,0 +1,64 @@
+import struct
+
+from nose.tools import assert_equal, assert_raises
+
+import tbf.ktest as ktest
+import tbf.utils as utils
+from tbf.tools.klee import KleeTestConverter
+
+
+def _get_ktest_content():
+    # Created like KLEE does, with one argument and two objects
+    content = b'KTEST' + struct.pack('>ii', 3, 1) + struct.pack('>i', 7) + b'prog.bc'
+    content += struct.pack('>iii', 0, 0, 2)
+    content += struct.pack('>i', 27) + b'__sym___VERIFIER_nondet_int' + struct.pack('>i', 4) + b'\x01A\x00\x80'
+    content += struct.pack('>i', 28) + b'__sym___VERIFIER_nondet_char' + struct.pack('>i', 1) + b'\xff'
+    return content
+
+
+def test_read_and_write():
+    content = _get_ktest_content()
+    test = ktest.read_ktest(content)
+
+    assert_equal(test.version, 3)
+    assert_equal(test.args, ['prog.bc'])
+    assert_equal(test.objects, [(b'__sym___VERIFIER_nondet_int', b'\x01A\x00\x80'),
+                                (b'__sym___VERIFIER_nondet_char', b'\xff')])
+    assert_equal(ktest.write_ktest(test), content)
+
+
+def test_read_non_utf8_argument():
+    content = _get_ktest_content().replace(struct.pack('>i', 7) + b'prog.bc', struct.pack('>i', 8) + b'prog.bc\xff')
+    test = ktest.read_ktest(content)
+    assert_equal(len(test.args), 1)
+    assert_equal(ktest.write_ktest(test), content)
+
+    test_case = utils.TestCase('test000001', 'test000001.ktest', content)
+    vector = KleeTestConverter().get_test_vector(test_case)
+    assert_equal(len(vector.vector), 2)
+
+
+def test_read_invalid():
+    content = _get_ktest_content()
+    assert_raises(utils.ParseError, ktest.read_ktest, b'KTEXT' + content[5:])
+    assert_raises(utils.ParseError, ktest.read_ktest, content[:-3])
+
+
+def test_test_vector():
+    test_case = utils.TestCase('test000001', 'test000001.ktest', _get_ktest_content())
+    vector = KleeTestConverter().get_test_vector(test_case)
+
+    assert_equal(vector.vector, [{'value': '0x80004101', 'name': '__VERIFIER_nondet_int'},
+                                 {'value': '0xff', 'name': '__VERIFIER_nondet_char'}])
+
+    nondet_methods = [{'name': '__VERIFIER_nondet_int', 'type': 'int', 'params': []},
+                      {'name': '__VERIFIER_nondet_char', 'type': 'char', 'params': []}]
+    test = ktest.get_ktest(vector, nondet_methods, utils.MACHINE_MODEL_64)
+    assert_equal(test.objects, ktest.read_ktest(_get_ktest_content()).objects)
+
+
+def test_object_data():
+    assert_equal(ktest.get_object_data('-1', 'short', utils.MACHINE_MODEL_64), b'\xff\xff')
+    assert_equal(ktest.get_object_data('1.5', 'float', utils.MACHINE_MODEL_64), struct.pack('<f', 1.5))
+    assert_equal(ktest.get_object_data('-2.0', 'long double', utils.MACHINE_MODEL_64),
+                 b'\x00' * 7 + b'\x80' + b'\x00\xc0' + b'\x00' * 6)
@@ -0,0 +1,95 @@
+import os
+import tempfile
+
+from nose.tools import assert_equal
+
+import tbf.minimization as minimization
+import tbf.utils as utils
+from helpers import create_vector
+from tbf.testcase_processing import CoverageMeasuringExecutionRunner
+
+GCOV_CONTENT = """        -:    0:Source:simple.c
+        3:    4:int main() {
+        3:    5:  int x = __VERIFIER_nondet_int();
+        3:    6:  if (x > 0) {
+branch  0 taken 1 (fallthrough)
+branch  1 taken 0
+        1:    7:    return 1;
+        -:    8:  }
+    #####:    9:  return 0;
+"""
+
+
+def test_get_covered_branches():
+    assert_equal(minimization.get_covered_branches(GCOV_CONTENT), frozenset([(6, 0)]))
+
+
+def test_select_covering_tests():
+    a = create_vector('a', '1', '2')
+    b = create_vector('b', '1')
+    c = create_vector('c', '3')
+    d = create_vector('d', '4')
+    test_coverages = [(a, frozenset([(1, 0), (2, 0)])), (b, frozenset([(1, 0), (2, 0)])), (c, frozenset([(1, 0)])),
+                      (d, frozenset([(3, 1)]))]
+    selected = minimization.select_covering_tests(test_coverages)
+    assert_equal([t.name for t in selected], ['b', 'd'])
+
+
+PROGRAM = """extern int __VERIFIER_nondet_int(void);
+int main() {
+  int x = __VERIFIER_nondet_int();
+  if (x > 0) {
+    return 1;
+  }
+  return 0;
+}
+"""
+NONDET_METHODS = [{'name': '__VERIFIER_nondet_int', 'type': 'int', 'params': ['void']}]
+
+
+def test_minimize():
+    old_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        program_file = os.path.join(directory, 'program.c')
+        with open(program_file, 'w') as outp:
+            outp.write(PROGRAM)
+        positive = create_vector('positive', '1')
+        negative = create_vector('negative', '-1')
+        try:
+            # Validation measures coverage first, in a different directory.
+            # The minimizer reuses the object file of the program compiled there.
+            validation_dir = os.path.join(directory, 'validation')
+            os.mkdir(validation_dir)
+            os.chdir(validation_dir)
+            runner = CoverageMeasuringExecutionRunner(utils.MACHINE_MODEL_64, 'Test')
+            for test_vector in (positive, negative):
+                runner.run(program_file, test_vector, None, NONDET_METHODS)
+            runner.close()
+
+            minimization_dir = os.path.join(directory, 'minimization')
+            os.mkdir(minimization_dir)
+            os.chdir(minimization_dir)
+            minimizer = minimization.TestSuiteMinimizer(utils.MACHINE_MODEL_64)
+            selected = minimizer.minimize(program_file, [positive, negative], None, NONDET_METHODS)
+        finally:
+            os.chdir(old_dir)
+    assert_equal(sorted(t.name for t in selected), ['negative', 'positive'])
+    assert_equal(minimizer.counter_covered_branches.count, 2)
+
+
+def test_minimize_violation():
+    old_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        program_file = os.path.join(directory, 'program.c')
+        with open(program_file, 'w') as outp:
+            outp.write('extern void __VERIFIER_error();\n' + PROGRAM.replace('return 1;', '__VERIFIER_error();'))
+        violation = create_vector('violation', '1')
+        try:
+            os.chdir(directory)
+            minimizer = minimization.TestSuiteMinimizer(utils.MACHINE_MODEL_64)
+            # The coverage of an execution that reports a violation must be measured, too
+            selected = minimizer.minimize(program_file, [violation], '__VERIFIER_error', NONDET_METHODS)
+        finally:
+            os.chdir(old_dir)
+    assert_equal([t.name for t in selected], ['violation'])
+    assert_equal(minimizer.counter_covered_branches.count, 1)
@@ -0,0 +1,211 @@
+import os
+import tempfile
+import threading
+import time
+
+from nose.tools import assert_equal, assert_is_none, assert_true
+
+import tbf
+import tbf.orchestration as orchestration
+import tbf.utils as utils
+from tbf.input_generation import BaseInputGenerator
+from tbf.testcase_processing import ProcessingConfig, TestProcessor
+from tbf.tools.random_tester import RandomTestConverter
+from tbf.utils import FALSE, UNKNOWN
+
+
+class _Preprocessor(object):
+
+    def prepare(self, filecontent, nondet_methods, error_method=None):
+        return filecontent
+
+
+class _InputGenerator(BaseInputGenerator):
+    """Input generator that runs the given command, and records whether it runs its commands itself."""
+
+    def __init__(self, cmd):
+        super().__init__(utils.MACHINE_MODEL_64, False, None, _Preprocessor())
+        self.cmd = cmd
+        self.generate_input_called = False
+
+    def create_input_generation_cmds(self, filename, cli_options):
+        return [self.cmd]
+
+    def get_name(self):
+        return 'stub'
+
+    def get_run_env(self):
+        return None
+
+    def generate_input(self, filename, error_method, nondet_methods, stop_flag):
+        self.generate_input_called = True
+        return super().generate_input(filename, error_method, nondet_methods, stop_flag)
+
+
+class _BlockingGenerator(object):
+    """Input generator that isn't a BaseInputGenerator and runs until it is told to stop
+    or, if it ignores that, until the given time has passed."""
+
+    def __init__(self, ignore_stop=False, runtime=5):
+        self.ignore_stop = ignore_stop
+        self.runtime = runtime
+        self.stopped = False
+
+    def generate_input(self, filename, error_method, nondet_methods, stop_flag):
+        if self.ignore_stop:
+            time.sleep(self.runtime)
+        else:
+            self.stopped = stop_flag.wait(self.runtime)
+        return True, 'statistics'
+
+
+class _WaitingProcessor(object):
+    """Test processor that waits until the input generation is done or all work is told to stop."""
+
+    def __init__(self):
+        self.orchestrator = None
+
+    def process_inputs(self, program_file, error_method, nondet_methods, is_ready_func, stop_event,
+                       tests_directory=None):
+        orchestrator = self.orchestrator
+        return orchestrator.run_processing(orchestration.wait_for_any(
+            [orchestrator.generation_done, orchestrator.stop_requested], timeout=5)), is_ready_func()
+
+
+class _Validator(object):
+    """Validator that reports a violation for the test with value 0x1 and runs all other tests until they are
+    stopped."""
+
+    def __init__(self):
+        self.runs = list()
+        self.uncancelled_runs = list()
+        self._lock = threading.Lock()
+
+    def run(self, program_file, test_vector, error_method, nondet_methods, stop_flag=None):
+        with self._lock:
+            self.runs.append(test_vector.name)
+        if test_vector.vector[0]['value'] == '0x1':
+            return [FALSE]
+        if not stop_flag.wait(5):
+            with self._lock:
+                self.uncancelled_runs.append(test_vector.name)
+        return [UNKNOWN]
+
+
+class _ValidatingProcessor(TestProcessor):
+
+    def __init__(self, processing_config, extractor, validator):
+        super().__init__(processing_config, extractor)
+        self.validator = validator
+
+    def process_inputs(self, program_file, error_method, nondet_methods, is_ready_func, stop_event,
+                       tests_directory=None):
+        return self._perform_processing(program_file, self.validator, is_ready_func, stop_event, tests_directory,
+                                        error_method, nondet_methods), None
+
+
+def _run(input_generator, test_processor, stop_event=None, **kwargs):
+    if stop_event is None:
+        stop_event = utils.StopEvent()
+    stopwatch = utils.Stopwatch()
+    stopwatch.start()
+    result = orchestration.AsyncioOrchestrator().run(input_generator, test_processor, 'program.c', None, [],
+                                                     stop_event, **kwargs)
+    assert_true(stopwatch.curr_s() < 4)
+    assert_true(stop_event.is_set())
+    return result
+
+
+def test_stop_after_success_cancels_runs():
+    with tempfile.TemporaryDirectory() as directory:
+        # The error test is the shortest test, so it is validated first
+        for number, values in enumerate([['0x1'], ['0x2', '0x2'], ['0x3', '0x3'], ['0x4', '0x4']]):
+            with open(os.path.join(directory, 'vector{}.test'.format(number)), 'w') as outp:
+                outp.write(''.join('x: {}\n'.format(v) for v in values))
+        args = tbf._parse_cli_args(['-i', 'random', '--execution', '--validation-jobs', '2', '--test-order',
+                                    'shortest', '--no-test-deduplication', 'program.c'])
+        validator = _Validator()
+        processor = _ValidatingProcessor(ProcessingConfig(args), RandomTestConverter(), validator)
+
+        generation_result, (verdict, _) = _run(None, processor, tests_directory=directory)
+
+    assert_equal(generation_result, (True, None))
+    assert_equal(verdict.verdict, FALSE)
+    assert_equal(verdict.test_vector.name, 'vector0.test')
+    assert_equal(processor.final_test_vector_size.value, 1)
+    # At most one other test was started next to the error test, and it was killed
+    assert_true(len(validator.runs) <= 2)
+    assert_equal(validator.uncancelled_runs, [])
+
+
+def test_stop_requested():
+    stop_event = utils.StopEvent()
+    input_generator = _BlockingGenerator()
+    threading.Timer(0.2, stop_event.set).start()
+
+    generation_result, _ = _run(input_generator, _WaitingProcessor(), stop_event)
+
+    assert_equal(generation_result, (True, 'statistics'))
+    assert_true(input_generator.stopped)
+
+
+def test_generation_timelimit():
+    stop_event = utils.StopEvent()
+    input_generator = _BlockingGenerator()
+
+    generation_result, (_, generation_done) = _run(input_generator, _WaitingProcessor(), stop_event,
+                                                   generation_timelimit=0.2)
+
+    assert_equal(generation_result, (True, 'statistics'))
+    assert_true(input_generator.stopped)
+    assert_true(generation_done)
+
+
+def test_generation_shutdown_timeout():
+    shutdown_timeout = orchestration.GENERATION_SHUTDOWN_TIMEOUT
+    orchestration.GENERATION_SHUTDOWN_TIMEOUT = 0.1
+    try:
+        stop_event = utils.StopEvent()
+        threading.Timer(0.2, stop_event.set).start()
+        # The input generator ignores that it should stop, so its result is not waited for
+        generation_result, _ = _run(_BlockingGenerator(ignore_stop=True, runtime=1), _WaitingProcessor(),
+                                    stop_event)
+    finally:
+        orchestration.GENERATION_SHUTDOWN_TIMEOUT = shutdown_timeout
+
+    assert_is_none(generation_result)
+
+
+def _check_generation_commands(supports_subprocesses):
+    old_dir = os.path.abspath('.')
+    original_support = orchestration._supports_subprocesses
+    orchestration._supports_subprocesses = lambda: supports_subprocesses
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            with open('program.c', 'w') as outp:
+                outp.write('int main() { return 0; }\n')
+            input_generator = _InputGenerator(['sleep', '10'])
+
+            generation_result, (_, generation_done) = _run(input_generator, _WaitingProcessor(),
+                                                           generation_timelimit=0.2)
+    finally:
+        os.chdir(old_dir)
+        orchestration._supports_subprocesses = original_support
+
+    # The command was killed by the time limit, which is no failure of the input generation
+    assert_equal(generation_result, (True, input_generator.statistics))
+    assert_true(generation_done)
+    assert_true(not input_generator.timer_input_gen.is_running())
+    return input_generator
+
+
+def test_generation_subprocess():
+    input_generator = _check_generation_commands(True)
+    assert_true(not input_generator.generate_input_called)
+
+
+def test_generation_fallback():
+    # Before Python 3.8, the input generator runs its commands itself in an executor thread
+    input_generator = _check_generation_commands(False)
+    assert_true(input_generator.generate_input_called)
@@ -0,0 +1,87 @@
+import os
+import tempfile
+
+from nose.tools import assert_equal, assert_true
+
+import tbf.portfolio as portfolio
+import tbf.tools.afl as afl
+import tbf.tools.random_tester as random_tester
+import tbf.utils as utils
+
+
+class _InputGenerator(object):
+    """Input generator that writes a single test to its work directory."""
+
+    def __init__(self, name, success):
+        self._name = name
+        self._success = success
+
+    def get_name(self):
+        return self._name
+
+    def generate_input(self, filename, error_method, nondet_methods, stop_flag):
+        with open('vector0.test', 'w') as outp:
+            outp.write('x: 0x01\n')
+        statistics = utils.Statistics(self._name)
+        statistics.add_value('Work directory', utils.Constant(os.path.basename(os.getcwd())))
+        return self._success, statistics
+
+
+def _write_test(directory, name, value):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    test_file = os.path.join(directory, name)
+    with open(test_file, 'w') as outp:
+        outp.write('x: ' + value + '\n')
+    return test_file
+
+
+def test_input_generator():
+    old_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            os.chdir(directory)
+            generator = portfolio.PortfolioInputGenerator([('a', _InputGenerator('A', False)),
+                                                           ('b', _InputGenerator('B', True))])
+            success, statistics = generator.generate_input('program.c', None, [], utils.StopEvent())
+        finally:
+            os.chdir(old_dir)
+        assert_true(os.path.exists(os.path.join(directory, 'a', 'vector0.test')))
+        assert_true(os.path.exists(os.path.join(directory, 'b', 'vector0.test')))
+    assert_equal(generator.get_name(), 'A+B')
+    assert_true(success)
+    assert_true('Work directory: a' in str(statistics))
+    assert_true('Work directory: b' in str(statistics))
+
+
+def test_test_converter():
+    old_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            os.chdir(directory)
+            test_a = _write_test('a', 'vector0.test', '0x01')
+            _write_test('b', 'vector0.test', '0x02')
+            test_b = _write_test('b', 'vector1.test', '0x03')
+            converter = portfolio.PortfolioTestConverter([('a', random_tester.RandomTestConverter(), '.'),
+                                                          ('b', random_tester.RandomTestConverter(), '.')])
+
+            assert_equal(converter.get_test_directories(), [os.path.join('.', 'a', '.'), os.path.join('.', 'b', '.')])
+
+            vectors = converter.get_test_vectors(None, exclude=['b.vector0.test', 'vector1.test'])
+            assert_equal(sorted((v.name, v.vector[0]['value']) for v in vectors),
+                         [('a.vector0.test', '0x01'), ('b.vector1.test', '0x03')])
+
+            assert_true(converter.is_test_file(test_b))
+            assert_true(not converter.is_test_file(_write_test('.', 'vector2.test', '0x04')))
+            vectors = converter.get_test_vectors_from_files([test_a, test_b], exclude=['a.vector0.test'])
+            assert_equal([v.name for v in vectors], ['b.vector1.test'])
+        finally:
+            os.chdir(old_dir)
+
+
+def test_priority_hint():
+    converter = portfolio.PortfolioTestConverter([('afl-fuzz', afl.AflTestConverter(), afl.tests_dir),
+                                                  ('prtest', random_tester.RandomTestConverter(), '.')])
+    assert_equal(converter.get_priority_hint(utils.TestVector('afl-fuzz.id:000001,+cov', 'id:000001,+cov')), 1)
+    assert_equal(converter.get_priority_hint(utils.TestVector('afl-fuzz.id:000002', 'id:000002')), 0)
+    assert_equal(converter.get_priority_hint(utils.TestVector('prtest.vector0.test', 'vector0.test')), 0)
@@ -0,0 +1,47 @@
+import threading
+from multiprocessing.dummy import Pool
+
+from nose.tools import assert_equal, assert_true
+
+import tbf
+import tbf.utils as utils
+from tbf.testcase_processing import ProcessingConfig, TestProcessor
+from tbf.utils import FALSE, UNKNOWN
+
+
+class _Validator(object):
+    """Validator that reports a violation for test 'error' and runs all other tests until they are stopped."""
+
+    def __init__(self):
+        self.runs = list()
+        self.uncancelled_runs = list()
+        self._lock = threading.Lock()
+
+    def run(self, program_file, test_vector, error_method, nondet_methods, stop_flag=None):
+        with self._lock:
+            self.runs.append(test_vector.name)
+        if test_vector.name == 'error':
+            return [FALSE]
+        if not stop_flag.wait(5):
+            with self._lock:
+                self.uncancelled_runs.append(test_vector.name)
+        return [UNKNOWN]
+
+
+def test_parallel_validation_cancels_runs():
+    args = tbf._parse_cli_args(['-i', 'afl', '--execution', '--validation-jobs', '2', '--no-test-deduplication',
+                                'program.c'])
+    processor = TestProcessor(ProcessingConfig(args), None)
+    test_vectors = [utils.TestVector(name, name) for name in ('slow', 'error', 'other0', 'other1', 'other2')]
+    validator = _Validator()
+    pool = Pool(2)
+    try:
+        results = processor._k(None, validator, test_vectors, None, [], pool)
+    finally:
+        pool.close()
+        pool.join()
+
+    assert_equal([r.verdict for r in results], [FALSE])
+    assert_true('other2' not in validator.runs)
+    assert_equal(validator.uncancelled_runs, [])
+    assert_equal(processor.final_test_vector_size.value, 0)
@@ -0,0 +1,55 @@
+import os
+import tempfile
+
+from nose.tools import assert_equal
+
+import tbf.scheduling as scheduling
+import tbf.utils as utils
+from helpers import create_vector
+
+
+def _get_order(policy_name, test_vectors, converter=None, count=1):
+    scheduler = scheduling.TestScheduler(scheduling.create_policy(policy_name, converter))
+    scheduler.push(test_vectors)
+    order = list()
+    while scheduler:
+        next_vectors = scheduler.pop(count)
+        scheduler.executed(next_vectors)
+        order += [t.name for t in next_vectors]
+    return order
+
+
+def test_static_policies():
+    test_vectors = [create_vector('a', '1', '2'), create_vector('b', '1'), create_vector('c', '3')]
+    assert_equal(_get_order('fifo', test_vectors), ['a', 'b', 'c'])
+    assert_equal(_get_order('newest', test_vectors), ['c', 'b', 'a'])
+    assert_equal(_get_order('shortest', test_vectors), ['b', 'c', 'a'])
+
+
+def test_newest_by_creation_time():
+    with tempfile.TemporaryDirectory() as directory:
+        test_vectors = list()
+        # One intake batch, in an order that differs from the creation order
+        for name, creation_time in (('b', 2), ('c', 3), ('a', 1)):
+            test_file = os.path.join(directory, name)
+            open(test_file, 'w').close()
+            os.utime(test_file, (creation_time, creation_time))
+            test_vectors.append(utils.TestVector(name, test_file))
+        assert_equal(_get_order('newest', test_vectors), ['c', 'b', 'a'])
+
+
+def test_hints():
+
+    class Converter(object):
+
+        def get_priority_hint(self, test_vector):
+            return 1 if '+cov' in test_vector.name else 0
+
+    test_vectors = [create_vector('id:1'), create_vector('id:2,+cov'), create_vector('id:3')]
+    assert_equal(_get_order('hints', test_vectors, Converter(), count=3), ['id:2,+cov', 'id:1', 'id:3'])
+
+
+def test_novelty():
+    test_vectors = [create_vector('a', '1', '2'), create_vector('b', '1', '3'),
+                    create_vector('c', '4', '2'), create_vector('d', '1', '2', '5')]
+    assert_equal(_get_order('novelty', test_vectors), ['a', 'c', 'b', 'd'])
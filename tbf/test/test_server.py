@@ -0,0 +1,73 @@
+import os
+import queue
+import signal
+import stat
+import tempfile
+import threading
+
+from nose.tools import assert_equal, assert_in
+
+import tbf.server as server
+
+
+def test_submit_invalid_job():
+    with tempfile.TemporaryDirectory() as tmp:
+        worker_pool = server.WorkerPool(1)
+        job_server = server.JobServer(os.path.join(tmp, 'tbf.sock'), worker_pool, tmp)
+        worker_pool.start()
+        serving = threading.Thread(target=job_server.serve_forever)
+        serving.start()
+        try:
+            accepted = list()
+            answer = server.submit_job(['-i', 'unknown', 'program.c'], tmp, job_server.socket_path,
+                                       on_accepted=accepted.append)
+        finally:
+            job_server.shutdown()
+            serving.join()
+            job_server.server_close()
+            worker_pool.stop()
+
+        assert_equal(len(accepted), 1)
+        assert_equal(answer['status'], server.STATUS_ERROR)
+        assert_in('Unknown input generator: unknown', answer['message'])
+        assert_equal(answer['job'], accepted[0]['job'])
+        assert not os.path.exists(job_server.socket_path)
+
+
+def test_killed_worker():
+    with tempfile.TemporaryDirectory() as tmp:
+        worker_pool = server.WorkerPool(1)
+        worker_pool.start()
+        try:
+            worker, _ = list(worker_pool._workers.values())[0]
+            # The worker terminates before it gets its job
+            os.kill(worker.pid, signal.SIGKILL)
+            worker.join()
+            results = queue.Queue()
+            worker_pool.submit(0, ['-i', 'unknown', 'program.c'], tmp, tmp, results.put)
+            assert_equal(results.get(timeout=10), {'error': "Worker terminated unexpectedly"})
+
+            # The worker is replaced
+            worker_pool.submit(1, ['-i', 'unknown', 'program.c'], tmp, tmp, results.put)
+            assert_in('Unknown input generator: unknown', results.get(timeout=10)['error'])
+        finally:
+            worker_pool.stop()
+
+
+def test_socket_permissions():
+    old_umask = os.umask(0)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            job_server = server.JobServer(os.path.join(tmp, 'tbf.sock'), server.WorkerPool(1), tmp)
+            try:
+                assert_equal(stat.S_IMODE(os.stat(job_server.socket_path).st_mode), 0o600)
+            finally:
+                job_server.server_close()
+    finally:
+        assert_equal(os.umask(old_umask), 0)
+
+
+def test_run_job_invalid_output_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        result = server.run_job(['-i', 'afl', '--test-output-limit', '1', 'program.c'], tmp, tmp)
+    assert_in('Test output limit must be at least', result['error'])
@@ -0,0 +1,210 @@
+import os
+import re
+import signal
+import subprocess
+import tempfile
+import time
+
+from nose.tools import assert_equal, assert_false, assert_raises, assert_true
+
+import tbf.tools as tools
+import tbf.tools.klee as klee
+
+
+def test_registry():
+    assert_equal(tools.get_generator_names()[:len(tools.BUILTIN_GENERATOR_NAMES)], tools.BUILTIN_GENERATOR_NAMES)
+    assert_true(tools.is_generator('klee'))
+    assert_false(tools.is_generator('unknown'))
+
+    assert_true(tools.get_generator('klee') is klee)
+    assert_equal(tools.get_generator('random').tests_dir, '.')
+    assert_true(isinstance(tools.get_generator('klee').create_test_converter(None, []), klee.KleeTestConverter))
+    assert_raises(KeyError, tools.get_generator, 'unknown')
+
+
+def test_afl_instances():
+    import tbf.tools.afl as afl
+
+    with tempfile.TemporaryDirectory() as directory:
+        for queue_dir in afl.get_queue_dirs(directory, 2):
+            os.makedirs(queue_dir)
+            with open(os.path.join(queue_dir, 'id:000000,orig:0.afl-test'), 'w') as outp:
+                outp.write('0\n')
+        synced_test = os.path.join(afl.get_queue_dirs(directory, 2)[1], 'id:000001,sync:fuzzer00,src:000001')
+        with open(synced_test, 'w') as outp:
+            outp.write('1\n')
+
+        converter = afl.AflTestConverter(2)
+        assert_false(converter.is_test_file(synced_test))
+        names = sorted(v.name for v in converter.get_test_vectors(directory, exclude=()))
+        assert_equal(names, ['fuzzer00_id:000000,orig:0.afl-test', 'fuzzer01_id:000000,orig:0.afl-test'])
+
+
+def test_afl_persistent_preprocessing():
+    import tbf.tools.afl as afl
+    import tbf.utils as utils
+
+    program = """extern int __VERIFIER_nondet_int(void);
+int counter = 0;
+const int limit = 10;
+int main() {
+  counter += __VERIFIER_nondet_int();
+  return counter < limit;
+}
+"""
+    nondet_methods = [{'name': '__VERIFIER_nondet_int', 'type': 'int', 'params': ['void']}]
+    preprocessor = afl.Preprocessor(utils.MACHINE_MODEL_64, persistent=True)
+
+    content = preprocessor.prepare(program, nondet_methods)
+    assert_true('int ' + afl.PROGRAM_MAIN + '()' in content)
+    assert_true('__AFL_LOOP' in content)
+    assert_true('memcpy(&counter, __tbf_initial_counter, sizeof(counter));' in content)
+    assert_false('__tbf_initial_limit' in content)
+
+    # Static local variables can't be reset, so the program is prepared for normal mode
+    content = preprocessor.prepare(program.replace('int main() {', 'int main() {\n  static int calls;'),
+                                   nondet_methods)
+    assert_false('__AFL_LOOP' in content)
+    assert_true('int main()' in content)
+
+
+def test_afl_seeds():
+    import tbf.tools.afl as afl
+    import tbf.utils as utils
+
+    program = """extern int __VERIFIER_nondet_int(void);
+extern unsigned char __VERIFIER_nondet_uchar(void);
+int main() {
+  if (__VERIFIER_nondet_int() == -42) {
+    switch (__VERIFIER_nondet_uchar()) {
+      case 'a': return 1;
+    }
+  }
+  return 0;
+}
+"""
+    nondet_methods = [{'name': '__VERIFIER_nondet_int', 'type': 'int', 'params': ['void']},
+                      {'name': '__VERIFIER_nondet_uchar', 'type': 'unsigned char', 'params': ['void']}]
+    values = afl.get_seed_values(program, nondet_methods, utils.MACHINE_MODEL_64)
+    assert_equal(values[:2], [-42, 97])
+    for value in (-43, -41, 96, 98, 1, -1, 2**31 - 1, -2**31, 255, 128):
+        assert_true(value in values)
+    assert_false(0 in values)
+
+    with tempfile.TemporaryDirectory() as directory:
+        seed_dir = os.path.join(directory, 'seeds')
+        afl.write_seeds(values, seed_dir)
+        assert_equal(len(os.listdir(seed_dir)), len(values) + 2)
+        with open(os.path.join(seed_dir, 'seed000.afl-test')) as inp:
+            assert_equal(inp.read(), afl.SEED_LINES * '-42\n')
+
+
+def test_prtest_workers():
+    import tbf.tools.random_tester as random_tester
+    import tbf.utils as utils
+
+    input_generator = random_tester.InputGenerator(utils.MACHINE_MODEL_64, False, None, workers=4)
+    compile_cmd, generation_cmd = input_generator.create_input_generation_cmds('/tmp/program.c', None)
+    assert_true('-DWORKERS=4' in compile_cmd)
+    assert_equal(generation_cmd, ['./program'])
+
+
+# Calls the coverage hooks like code compiled with -fsanitize-coverage=trace-pc-guard, so that
+# the random tester can be built with gcc. Each of the 16 guards is covered by one value of the first input.
+RANDOM_TESTER_PROGRAM = """#include <stdint.h>
+#include <stdlib.h>
+extern void input(void *var, size_t var_size, const char *var_name);
+extern void __sanitizer_cov_trace_pc_guard_init(uint32_t *start, uint32_t *stop);
+extern void __sanitizer_cov_trace_pc_guard(uint32_t *guard);
+
+static uint32_t guards[16];
+
+__attribute__((constructor)) static void init_guards(void) {
+  __sanitizer_cov_trace_pc_guard_init(guards, guards + 16);
+}
+
+int __main(void) {
+  unsigned char x, y;
+  input(&x, 1, "x");
+  input(&y, 1, "y");
+  __sanitizer_cov_trace_pc_guard(&guards[x % 16]);
+#ifndef NO_ERROR
+  if (x == 255 && y == 255) {
+    exit(SUCCESS_STATUS);
+  }
+#endif
+  return 0;
+}
+"""
+
+
+def _compile_random_tester(directory, workers, *flags):
+    import tbf.tools.random_tester as random_tester
+    import tbf.utils as utils
+
+    program_file = os.path.join(directory, 'program.c')
+    with open(program_file, 'w') as outp:
+        outp.write(RANDOM_TESTER_PROGRAM)
+    # Empty replacement of the header of clang's coverage instrumentation
+    os.makedirs(os.path.join(directory, 'sanitizer'))
+    open(os.path.join(directory, 'sanitizer', 'coverage_interface.h'), 'w').close()
+
+    input_generator = random_tester.InputGenerator(utils.MACHINE_MODEL_64, False, None, workers=workers)
+    compile_cmd, generation_cmd = input_generator.create_input_generation_cmds(program_file, None)
+    compile_cmd = ['gcc', '-I', directory] + list(flags) + [a for a in compile_cmd[1:] if 'sanitize' not in a]
+    subprocess.check_call(compile_cmd, cwd=directory)
+    return [os.path.join(directory, generation_cmd[0])]
+
+
+def test_prtest_workers_run():
+    with tempfile.TemporaryDirectory() as directory:
+        generation_cmd = _compile_random_tester(directory, 4)
+        output = subprocess.check_output(generation_cmd, cwd=directory, timeout=60).decode()
+
+        created_tests = int(re.search(r'Number of created tests: (\d+)', output).group(1))
+        test_files = sorted(f for f in os.listdir(directory) if f.startswith('vector'))
+        # Tests are numbered across workers, so no worker overwrites the test of another
+        assert_equal(test_files, sorted('vector{}.test'.format(i) for i in range(created_tests)))
+        assert_false([f for f in os.listdir(directory) if f.startswith('tmp_vector')])
+
+        test_contents = list()
+        for test_file in test_files:
+            with open(os.path.join(directory, test_file)) as inp:
+                test_contents.append(inp.read())
+        # Each of the 16 guards is covered once, by any of the workers, and the error is reached once
+        assert_equal(test_contents.count('x: 0xff\ny: 0xff\n'), 1)
+        assert_true(len(test_files) <= 16 + 1)
+
+
+def test_prtest_workers_parent_killed():
+    with tempfile.TemporaryDirectory() as directory:
+        generation_cmd = _compile_random_tester(directory, 4, '-DNO_ERROR')
+        parent = subprocess.Popen(generation_cmd, cwd=directory, stdout=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 10
+            workers = list()
+            while len(workers) < 4 and time.monotonic() < deadline:
+                time.sleep(0.05)
+                with open('/proc/{0}/task/{0}/children'.format(parent.pid)) as inp:
+                    workers = [int(pid) for pid in inp.read().split()]
+            assert_equal(len(workers), 4)
+        finally:
+            parent.kill()
+            parent.wait()
+
+        # Without their parent, the workers stop themselves
+        while workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+            workers = [pid for pid in workers if _get_process_state(pid) != 'Z']
+        for pid in workers:
+            os.kill(pid, signal.SIGKILL)
+        assert_equal(workers, [])
+
+
+def _get_process_state(pid):
+    """Return the state of the given process, or 'Z' if it terminated."""
+    try:
+        with open('/proc/{}/stat'.format(pid)) as inp:
+            return inp.read().rsplit(')', 1)[1].split()[0]
+    except OSError:
+        return 'Z'
@@ -0,0 +1,198 @@
+import itertools
+import math
+import struct
+import threading
+import time
+import types
+
+from nose.tools import assert_equal, assert_false, assert_is_none, assert_true
+
+import tbf.harness_generation as harness_gen
+import tbf.utils as utils
+from helpers import create_vector
+from tbf.testcase_processing import ExecutedTestVectors
+
+
+def test_parse_c_value_integers():
+    assert_equal(utils.parse_c_value(''), 0)
+    assert_equal(utils.parse_c_value('12'), 12)
+    assert_equal(utils.parse_c_value(b' 12'), 12)
+    assert_equal(utils.parse_c_value('0x1f'), 31)
+    assert_equal(utils.parse_c_value('017'), 15)
+    assert_equal(utils.parse_c_value('-1'), 2**64 - 1)
+    assert_equal(utils.parse_c_value('18446744073709551616'), 2**64 - 1)
+
+
+def test_parse_c_value_floats():
+    assert_equal(utils.parse_c_value('08'), 8.0)
+    assert_equal(utils.parse_c_value('-2e3'), -2000.0)
+    assert_equal(utils.parse_c_value('.5'), 0.5)
+    assert_equal(utils.parse_c_value('0x1.8p1'), 3.0)
+    assert_equal(utils.parse_c_value('-INFINITY'), -math.inf)
+    assert_true(math.isnan(utils.parse_c_value('nan(1)')))
+
+
+def test_parse_c_value_invalid():
+    assert_is_none(utils.parse_c_value('abc'))
+    assert_is_none(utils.parse_c_value(' '))
+    assert_is_none(utils.parse_c_value('1 '))
+    assert_is_none(utils.parse_c_value('0x'))
+
+
+def test_binary_input():
+    test_vector = create_vector('test', '-1', '1.5', 'x')
+    binary_input = harness_gen.get_binary_input(test_vector)
+
+    assert_equal(len(binary_input), 4 + 3 * 9)
+    assert_equal(struct.unpack_from('=I', binary_input)[0], 3)
+    assert_equal(struct.unpack_from('=cq', binary_input, 4), (harness_gen.BINARY_INTEGER_TAG, -1))
+    assert_equal(struct.unpack_from('=cd', binary_input, 13), (harness_gen.BINARY_FLOAT_TAG, 1.5))
+    assert_equal(binary_input[22:23], harness_gen.BINARY_INVALID_TAG)
+
+
+def test_rewrite_cproblems():
+    assert_equal(utils._rewrite_cproblems('int x; /* a\n b */ int y;'), 'int x; \n int y;\n')
+    assert_equal(
+        utils._rewrite_cproblems('void f(void) __attribute__ ((noreturn));\n'
+                                 'int g(void) __attribute__ ((__format__ (__printf__, 1,\n 2)));'),
+        'void f(void) ;\nint g(void) \n;\n')
+    assert_equal(
+        utils._rewrite_cproblems('extern int * __restrict p;\n__extension__ typedef long long ll;\n'
+                                 'static __inline__ int h(__const char *s);'),
+        'extern int *  p;\n typedef long long ll;\nstatic  int h(const char *s);\n')
+    assert_equal(utils._rewrite_cproblems('struct empty {\n\n};'), 'struct empty {\n\nint __dummy; };\n')
+    assert_equal(utils._rewrite_cproblems('__asm__ volatile ("nop"\n  "nop");\nint z;'), '\n\nint z;\n')
+    assert_equal(utils._rewrite_cproblems('extern int foo(void) __asm__ ("" "bar");'), 'extern int foo(void) ;\n')
+
+
+def test_canonical_values():
+    assert_equal(create_vector('test', '1', '0x1', ' 01', '-1').get_canonical_values(),
+                 [('int', 1)] * 3 + [('int', 2**64 - 1)])
+    assert_equal(create_vector('test', '1.50', '015e-1').get_canonical_values(),
+                 create_vector('test', '1.5', '1.5').get_canonical_values())
+    assert_true(
+        create_vector('test', '0.0').get_canonical_values() != create_vector('test', '-0.0').get_canonical_values())
+    assert_equal(create_vector('test', 'x', '1').get_canonical_values(), [('invalid',)])
+    assert_equal(create_vector('test', '1\n2').get_canonical_values(), [('raw', '1\n2')])
+
+
+def test_executed_test_vectors():
+    executed = ExecutedTestVectors()
+    first = create_vector('test', '1', '2', '3')
+    executed.add(first)
+    assert_true(executed.contains(create_vector('test', '0x1', '2', '03')))
+    assert_false(executed.contains(create_vector('test', '1', '2', '4')))
+
+    first.inputs_read = 2
+    executed.add_inputs_read(first)
+    assert_true(executed.contains(create_vector('test', '1', '2', '4', '5')))
+    assert_false(executed.contains(create_vector('test', '1')))
+
+
+def test_inputs_read():
+    assert_equal(harness_gen.get_inputs_read('output\n' + harness_gen.INPUTS_READ_MESSAGE + '3\n'), 3)
+    assert_is_none(harness_gen.get_inputs_read(b'Error found.\n'))
+
+
+def test_execute_stop_on_output():
+    stopwatch = utils.Stopwatch()
+    stopwatch.start()
+    result = utils.execute(['sh', '-c', 'echo "Error found." >&2; echo "not kept" >&2; sleep 10'],
+                           quiet=True, err_to_output=False, stop_on_output=utils.ERROR_STRING)
+    assert_true(stopwatch.curr_s() < 5)
+    assert_true(utils.found_err(result))
+    assert_equal(result.stderr, utils.ERROR_STRING + '\n')
+
+
+def test_execute_output_limit():
+    result = utils.execute(['sh', '-c', 'for i in 1 2 3 4 5; do echo $i; echo e$i >&2; done'],
+                           quiet=True, err_to_output=False, input_str='ignored', output_limit=4)
+    assert_equal(result.returncode, 0)
+    assert_equal(result.stdout, '4\n5\n')
+    assert_equal(result.stderr, '\ne5\n')
+
+
+def test_execute_output_limit_multibyte():
+    # The limit cuts the first character in two, of which the rest is dropped
+    result = utils.execute(['sh', '-c', 'printf "\\303\\244\\303\\244\\303\\244" >&2'],
+                           quiet=True, err_to_output=False, output_limit=5)
+    assert_equal(result.stderr, 'ää')
+    assert_false(utils.found_err(result))
+
+    assert_false(utils.found_err(utils.ExecutionResult(0, '', b'\xff')))
+    assert_true(utils.found_err(utils.ExecutionResult(0, '', b'\xff' + utils.ERROR_STRING.encode())))
+
+
+def test_execute_supervision():
+    stopwatch = utils.Stopwatch()
+    stopwatch.start()
+    result = utils.execute(['sleep', '10'], quiet=True, timelimit=0.2)
+    assert_true(result.returncode < 0)
+
+    for stop_flag in [threading.Event(), utils.StopEvent()]:
+        threading.Timer(0.2, stop_flag.set).start()
+        result = utils.execute(['sleep', '10'], quiet=True, stop_flag=stop_flag)
+        assert_true(result.returncode < 0)
+    assert_true(stopwatch.curr_s() < 5)
+
+    result = utils.execute(['true'], quiet=True, timelimit=5, stop_flag=threading.Event())
+    assert_equal(result.returncode, 0)
+
+
+def test_stop_event():
+    parent = utils.StopEvent()
+    child = utils.StopEvent(parent)
+    called = list()
+    child.add_callback(lambda: called.append(True))
+    assert_false(child.is_set())
+    assert_false(child.wait(0.01))
+
+    parent.set()
+    assert_true(child.is_set())
+    assert_true(child.wait())
+    assert_equal(called, [True])
+    child.add_callback(lambda: called.append(True))
+    assert_equal(called, [True, True])
+
+
+def test_execute_parallel():
+    stopwatch = utils.Stopwatch()
+    stopwatch.start()
+    result = utils.execute_parallel(utils.ParallelCommands([['sleep', '10'], ['sh', '-c', 'exit 3']], cpus=[0, 0]),
+                                    quiet=True)
+    assert_equal(result.returncode, 3)
+
+    # If a command can't be executed, the others are stopped, too
+    try:
+        utils.execute_parallel(utils.ParallelCommands([['sleep', '10'], ['tbf-nonexistent-command']]), quiet=True)
+        raise AssertionError("Expected FileNotFoundError")
+    except FileNotFoundError:
+        pass
+    assert_true(stopwatch.curr_s() < 5)
+
+
+def test_process_supervisor_start():
+    supervisor = utils._ProcessSupervisor()
+    process_ids = list()
+
+    def add():
+        process_ids.append(supervisor.add(None, timelimit=10))
+
+    def count_slowly():
+        # Widen the window in which other threads may start the supervisor, too
+        time.sleep(0.05)
+        return itertools.count()
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    utils.itertools = types.SimpleNamespace(count=count_slowly)
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        utils.itertools = itertools
+    # All processes are supervised by the same thread
+    assert_equal(sorted(process_ids), list(range(8)))
+    for process_id in process_ids:
+        supervisor.remove(process_id)
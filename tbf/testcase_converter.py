@@ -1,6 +1,5 @@
 from abc import ABCMeta, abstractmethod
 
-import lib.py.tfbuilder as tfbuilder
 import datetime
 
 import os
@@ -56,6 +55,60 @@ class TestConverter:
             vectors.append(self.get_test_vector(test))
         return vectors
 
+    def get_test_directories(self, directory=None):
+        """Return the directories that new test-case files appear in.
+
+        :param str directory: path to the test directory. If none, the tester's default directory is used
+        :return Iterable[str]: the directories that test-case files are created in.
+            The directories do not have to exist yet.
+        """
+        return []
+
+    def is_test_file(self, test_file):
+        """Return whether the given file contains one or more test cases.
+
+        :param str test_file: path to the file.
+        """
+        return False
+
+    def get_priority_hint(self, test_vector):
+        """Return how interesting the test-case generator considers the given test vector.
+
+        Test vectors with higher values are validated first if tests are ordered by hints.
+
+        :param utils.TestVector test_vector: the test vector
+        :return int: the interest in the test vector. 0 is the default interest.
+        """
+        return 0
+
+    def is_growing_test_file(self, test_file):
+        """Return whether new test cases are appended to the given test file while it is open.
+
+        For such files, each modification is of interest, not only the final close.
+
+        :param str test_file: path to the file.
+        """
+        return False
+
+    def get_test_vectors_from_files(self, test_files, exclude=None):
+        """Return the test vectors for all test cases in the given files.
+
+        :param Iterable[str] test_files: paths to files that were newly created or changed.
+            Files that are no test files are ignored.
+        :param Iterable[str] exclude: set of tests to exclude, identified by their unique names.
+        :return Iterable[utils.TestVector]: set of TestVector objects representing all test cases in the given files,
+            except for the test cases named in argument `exclude`.
+        """
+        if exclude is None:
+            exclude = ()
+        vectors = list()
+        for test_file in test_files:
+            if self.is_test_file(test_file) and os.path.exists(test_file):
+                test = self._get_test_case_from_file(test_file)
+                if test.name not in exclude:
+                    vectors.append(self.get_test_vector(test))
+        return vectors
+
 
 class XmlWritingTestConverter:
     """A test converter that writes testcase XML files for each retrieved test vector."""
@@ -86,6 +139,24 @@ class XmlWritingTestConverter:
             write_testvector(v, self.output_directory, force_write=True)
         return vectors
 
+    def get_test_directories(self, directory=None):
+        return self.delegate.get_test_directories(directory)
+
+    def is_test_file(self, test_file):
+        return self.delegate.is_test_file(test_file)
+
+    def get_priority_hint(self, test_vector):
+        return self.delegate.get_priority_hint(test_vector)
+
+    def is_growing_test_file(self, test_file):
+        return self.delegate.is_growing_test_file(test_file)
+
+    def get_test_vectors_from_files(self, test_files, exclude=None):
+        vectors = self.delegate.get_test_vectors_from_files(test_files, exclude)
+        for v in vectors:
+            write_testvector(v, self.output_directory, force_write=True)
+        return vectors
+
 
 def write_metadata(program, producer, specification, architecture, start_time=None, directory='.'):
     """Writes a metadata XML file for a test suite with the given information.
@@ -99,6 +170,8 @@ def write_metadata(program, producer, specification, architecture, start_time=No
         Example: Linux 32bit.
     :param datetime.datetime start_time: the creation time of the test suite.
     """
+    import lib.py.tfbuilder as tfbuilder
+
     if start_time is None:
         start_time = datetime.datetime.now()
     metadata_xml = tfbuilder.MetadataBuilder(
@@ -126,6 +199,8 @@ def write_testvector(test_vector, directory='.', force_write=False):
     :param bool force_write: whether to overwrite an existing file.
     :raises ValueError: if force_write=False and the filename of the resulting XML already exists.
     """
+    import lib.py.tfbuilder as tfbuilder
+
     builder = tfbuilder.TestcaseBuilder().test_case_start()
     for element in test_vector.vector:
         builder.input_val(element['value'])
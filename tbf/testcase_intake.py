@@ -0,0 +1,334 @@
+"""Intake of newly created test-case files.
+
+Instead of looking at all files of the test directories again and again,
+the intake watches the test directories and only hands new or changed files
+to the test converter.
+On Linux, directories are watched with inotify.
+On other systems, or if inotify is not available, the directories are polled
+with exponential backoff.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+
+# Constants from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_DELETE_SELF | _IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct('iIII')
+
+MIN_POLL_INTERVAL = 0.001
+MAX_POLL_INTERVAL = 0.5
+
+
+def _list_files(directory):
+    try:
+        return [e.path for e in os.scandir(directory) if e.is_file()]
+    except FileNotFoundError:
+        return []
+
+
+class PollingWatcher(object):
+    """Watches directories for new and changed files by polling them.
+
+    The polling interval is doubled whenever nothing changed, up to MAX_POLL_INTERVAL,
+    and reset to MIN_POLL_INTERVAL when a change is found.
+    """
+
+    def __init__(self, directories, modification_filter=None):
+        """Create a new watcher.
+
+        :param Iterable[str] directories: the directories to watch. They do not have to exist yet.
+        :param modification_filter: function that tells for a file path whether changes to an existing
+            file should be reported. If none, only new files are reported.
+        """
+        self._directories = [os.path.abspath(d) for d in directories]
+        self._modification_filter = modification_filter
+        self._known_files = dict()
+        self._interval = MIN_POLL_INTERVAL
+
+    def _scan(self):
+        changed = list()
+        for directory in self._directories:
+            for test_file in _list_files(directory):
+                try:
+                    stat = os.stat(test_file)
+                except FileNotFoundError:
+                    continue
+                state = (stat.st_mtime, stat.st_size)
+                if test_file not in self._known_files:
+                    changed.append(test_file)
+                elif self._known_files[test_file] != state \
+                        and self._modification_filter and self._modification_filter(test_file):
+                    changed.append(test_file)
+                self._known_files[test_file] = state
+        return changed
+
+    def wait(self, timeout):
+        """Wait for new or changed files.
+
+        :param float timeout: maximum time to wait, in seconds
+        :return List[str]: the new or changed files. Empty if the timeout was reached.
+        """
+        end_time = time.monotonic() + timeout
+        while True:
+            changed = self._scan()
+            if changed:
+                self._interval = MIN_POLL_INTERVAL
+                return changed
+            remaining = end_time - time.monotonic()
+            if remaining > 0:
+                time.sleep(min(self._interval, remaining))
+            self._interval = min(self._interval * 2, MAX_POLL_INTERVAL)
+            if remaining <= 0:
+                return []
+
+    def fileno(self):
+        """Return None, because changes can only be found by polling."""
+        return None
+
+    def get_poll_interval(self):
+        """Return the time after which `wait` should be called again to look for changes."""
+        return self._interval
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Watches directories for new and changed files with Linux' inotify.
+
+    Directories that do not exist yet are checked for existence with exponential backoff.
+    As soon as a directory exists, it is watched and all files already in it are reported.
+    """
+
+    def __init__(self, directories, modification_filter=None):
+        """Create a new watcher.
+
+        :param Iterable[str] directories: the directories to watch. They do not have to exist yet.
+        :param modification_filter: function that tells for a file path whether modifications
+            to it should be reported, not only its creation or final close.
+        :raises OSError: if inotify is not available
+        """
+        self._libc = _get_libc()
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._modification_filter = modification_filter
+        self._watches = dict()
+        self._pending_directories = set(os.path.abspath(d) for d in directories)
+        self._interval = MIN_POLL_INTERVAL
+
+    def _add_pending_watches(self):
+        new_files = list()
+        for directory in list(self._pending_directories):
+            if not os.path.isdir(directory):
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOENT:
+                    continue
+                raise OSError(err, os.strerror(err), directory)
+            self._watches[wd] = directory
+            self._pending_directories.remove(directory)
+            # Files may have been created before the watch was added
+            new_files += _list_files(directory)
+        return new_files
+
+    def _read_events(self):
+        changed = list()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + name_length].rstrip(b'\0')
+            offset += name_length
+
+            if mask & _IN_Q_OVERFLOW:
+                logging.debug("Inotify event queue overflowed, looking at all files")
+                for directory in self._watches.values():
+                    changed += _list_files(directory)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                del self._watches[wd]
+                self._pending_directories.add(directory)
+            elif name and not mask & _IN_ISDIR:
+                changed_file = os.path.join(directory, os.fsdecode(name))
+                if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                    changed.append(changed_file)
+                elif self._modification_filter and self._modification_filter(changed_file):
+                    changed.append(changed_file)
+        return changed
+
+    def wait(self, timeout):
+        """Wait for new or changed files.
+
+        :param float timeout: maximum time to wait, in seconds
+        :return List[str]: the new or changed files. Empty if the timeout was reached.
+        """
+        end_time = time.monotonic() + timeout
+        while True:
+            changed = self._add_pending_watches()
+            if changed:
+                return changed
+            remaining = max(end_time - time.monotonic(), 0)
+            if self._pending_directories:
+                wait_time = min(self._interval, remaining)
+                self._interval = min(self._interval * 2, MAX_POLL_INTERVAL)
+            else:
+                wait_time = remaining
+            readable, _, _ = select.select([self._fd], [], [], wait_time)
+            if readable:
+                changed = self._read_events()
+                if changed:
+                    # Remove duplicates, but keep order of events
+                    return list(dict((c, None) for c in changed).keys())
+            if time.monotonic() >= end_time:
+                return []
+
+    def fileno(self):
+        """Return the file descriptor that becomes readable when watched files change."""
+        return self._fd
+
+    def get_poll_interval(self):
+        """Return the time after which `wait` should be called again to look for changes
+        that the file descriptor doesn't report, or None if there are none.
+        """
+        return self._interval if self._pending_directories else None
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc = libc
+    return _libc
+
+
+def create_watcher(directories, modification_filter=None):
+    """Return a watcher for the given directories.
+
+    An InotifyWatcher is returned if inotify is available, and a PollingWatcher otherwise.
+    """
+    try:
+        return InotifyWatcher(directories, modification_filter)
+    except (OSError, AttributeError) as e:
+        logging.debug("Inotify not available, polling test directories: %s", e)
+        return PollingWatcher(directories, modification_filter)
+
+
+class TestIntake(object):
+    """Hands new test-case files to a test converter as soon as they are created."""
+
+    def __init__(self, converter, directory=None, watcher_factory=create_watcher):
+        """Create a new test intake.
+
+        :param TestConverter converter: the test converter to get test vectors from.
+        :param str directory: the test directory. If none, the converter's default directory is used.
+        """
+        self._converter = converter
+        self._watcher = watcher_factory(
+            converter.get_test_directories(directory), converter.is_growing_test_file)
+
+    def get_test_vectors(self, exclude=None, timeout=0.1):
+        """Wait for new test cases and return their test vectors.
+
+        :param Iterable[str] exclude: set of tests to exclude, identified by their unique names.
+        :param float timeout: maximum time to wait for new test cases, in seconds
+        :return Iterable[utils.TestVector]: the test vectors of all new test cases.
+            Empty if no new test case was created before the timeout.
+        """
+        new_files = self._watcher.wait(timeout)
+        if not new_files:
+            return []
+        return self._converter.get_test_vectors_from_files(new_files, exclude)
+
+    def fileno(self):
+        """Return a file descriptor that becomes readable when new test cases are created,
+        or None if new test cases can only be found by polling.
+        """
+        return self._watcher.fileno()
+
+    def get_poll_interval(self):
+        """Return the time after which to look for new test cases that `fileno` doesn't report,
+        or None if `fileno` reports all new test cases.
+        """
+        return self._watcher.get_poll_interval()
+
+    def close(self):
+        self._watcher.close()
+
+
+class TailReader(object):
+    """Reads the lines that were appended to growing files since the last read.
+
+    For each file, the reader remembers the position up to which the file was read.
+    Incomplete last lines are only returned once they are complete.
+    If a file is truncated or replaced, it is read again from its start.
+    """
+
+    def __init__(self):
+        # Maps file names to (device, inode, offset, incomplete last line)
+        self._positions = dict()
+
+    def read_new_lines(self, filename):
+        """Return all complete lines that were appended to the given file since the last call.
+
+        :param str filename: the file to read
+        :return (list, bool): the new lines, without line endings, and whether the file
+            was truncated or replaced since the last call. If it was, the returned lines
+            start at the beginning of the file.
+        """
+        try:
+            inp = open(filename, 'rb')
+        except FileNotFoundError:
+            return [], self._positions.pop(filename, None) is not None
+        with inp:
+            stat = os.fstat(inp.fileno())
+            device, inode, offset, incomplete_line = self._positions.get(filename, (None, None, 0, b''))
+            restarted = False
+            if (device, inode) != (stat.st_dev, stat.st_ino) or stat.st_size < offset:
+                restarted = device is not None
+                offset, incomplete_line = 0, b''
+            inp.seek(offset)
+            content = inp.read()
+        offset += len(content)
+
+        lines = (incomplete_line + content).split(b'\n')
+        self._positions[filename] = (stat.st_dev, stat.st_ino, offset, lines.pop())
+        return [l.decode(errors='replace').rstrip('\r') for l in lines], restarted
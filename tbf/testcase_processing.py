@@ -1,14 +1,27 @@
+import functools
+import hashlib
 import logging
 import os
 import re
-from time import sleep
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.dummy import Pool
 from typing import List, Iterable, Any
 
+import tbf.cache as cache
+import tbf.compilation as compilation
 import tbf.harness_generation as harness_gen
+from tbf.fork_server import ForkServer
+import tbf.scheduling as scheduling
+from tbf.scheduling import TestScheduler
 import tbf.utils as utils
 from tbf.testcase_converter import TestConverter
+from tbf.testcase_intake import TestIntake
 from tbf.utils import FALSE, UNKNOWN, ERROR
 
+# Default for the maximum number of bytes kept of the output of each test execution
+DEFAULT_OUTPUT_LIMIT = 1024 * 1024
+
 
 class ProcessingConfig(object):
 
@@ -38,10 +51,68 @@ class ProcessingConfig(object):
 
         self.naive_verification = args.naive_verification
         self.stop_after_success = args.stop_after_success
+        self.validation_jobs = args.validation_jobs
+        self.use_fork_server = args.fork_server
+        self.use_binary_input = args.binary_input
+        self.compile_cache = cache.FileCache() if args.use_compile_cache else None
+        self.deduplicate_tests = args.deduplicate_tests
+        self.test_order = args.test_order
+        self.test_output_limit = args.test_output_limit
 
         self.measure_coverage = args.report_coverage
 
 
+class ExecutedTestVectors(object):
+    """Hashes of the canonical values of all executed test vectors.
+
+    A test vector doesn't have to be executed if a test vector with the same canonical values
+    was already executed. If it is known how many inputs the program read in the execution of a test vector,
+    all test vectors that start with the same inputs don't have to be executed, either.
+    """
+
+    def __init__(self):
+        self._vectors = set()
+        self._prefixes = set()
+        self._prefix_lengths = set()
+
+    @staticmethod
+    def _get_hashes(test_vector):
+        """Return the hashes of all prefixes of the canonical values of the given test vector, shortest first."""
+        hash_obj = hashlib.sha256()
+        hashes = [hash_obj.digest()]
+        for value in test_vector.get_canonical_values():
+            hash_obj.update(repr(value).encode() + b'\n')
+            hashes.append(hash_obj.digest())
+        return hashes
+
+    def contains(self, test_vector):
+        """Return whether the given test vector behaves like an already executed one."""
+        hashes = self._get_hashes(test_vector)
+        if hashes[-1] in self._vectors:
+            return True
+        return any(hashes[length] in self._prefixes for length in self._prefix_lengths if length < len(hashes))
+
+    def add(self, test_vector):
+        """Add the given test vector as executed.
+
+        If the number of inputs read in the execution is already known, it is considered, too.
+        Otherwise, call `add_inputs_read` after the execution.
+        """
+        self._vectors.add(self._get_hashes(test_vector)[-1])
+        self.add_inputs_read(test_vector)
+
+    def add_inputs_read(self, test_vector):
+        """Add the inputs that the program read in the execution of the given test vector."""
+        inputs_read = test_vector.inputs_read
+        if inputs_read is None or inputs_read > len(test_vector):
+            # The program tried to read more inputs than the test vector has
+            return
+        hashes = self._get_hashes(test_vector)
+        if inputs_read < len(hashes):
+            self._prefixes.add(hashes[inputs_read])
+            self._prefix_lengths.add(inputs_read)
+
+
 class TestProcessor(object):
 
     def __init__(self, processing_config, extractor: TestConverter):
@@ -72,6 +143,13 @@ class TestProcessor(object):
         self.counter_handled_test_cases = utils.Counter()
         self.statistics.add_value('Number of looked-at test cases',
                                   self.counter_handled_test_cases)
+        self.counter_duplicate_test_cases = utils.Counter()
+        self.statistics.add_value('Number of skipped duplicate test cases',
+                                  self.counter_duplicate_test_cases)
+        # Only set while test vectors are executed with deduplication
+        self._executed_tests = None
+        # If set, the processing loop runs on the event loop of this AsyncioOrchestrator
+        self.orchestrator = None
 
         self.final_test_vector_size = utils.Constant()
         self.statistics.add_value("Size of successful test vector",
@@ -93,6 +171,14 @@ class TestProcessor(object):
     def get_name(self):
         return "Test Validator"
 
+    def get_all_test_vectors(self, tests_directory=None):
+        """Return the test vectors of all tests in the given directory.
+
+        :param str tests_directory: the directory of the tests. If None, the default directory of the test converter
+            is used
+        """
+        return self._extractor.get_test_vectors(tests_directory, exclude=())
+
     @staticmethod
     def _decide_single_verdict(result, test_origin, test_vector=None):
         if any(r == FALSE for r in result):
@@ -138,29 +224,63 @@ class TestProcessor(object):
     def _perform_processing(self, program_file, validator,
                             is_ready_func, stop_event, tests_directory, error_method, nondet_methods):
         # validator may be None
+        if self.orchestrator:
+            return self.orchestrator.run_processing(self._perform_processing_async(
+                program_file, validator, tests_directory, error_method, nondet_methods))
         visited_tests = set()
         verdicts = list()
-        while not is_ready_func() and not stop_event.is_set():
-            new_test_vectors = self._extractor.get_test_vectors(tests_directory, visited_tests)
-            if validator:
-                next_verdict_list = self._k(program_file, validator, new_test_vectors, error_method, nondet_methods)
-                verdicts += next_verdict_list
-                if self.config.stop_after_success and any(r.is_positive() for r in next_verdict_list):
-                    return self.decide_final_verdict(verdicts)
-            new_test_names = [t.name for t in new_test_vectors]
-            visited_tests = visited_tests.union(new_test_names)
-            sleep(0.001)  # Sleep for 1 millisecond
-
-        if not stop_event.is_set():
-            new_test_vectors = self._extractor.get_test_vectors(tests_directory, visited_tests)
-            if validator:
-                next_verdict_list = self._k(program_file, validator, new_test_vectors, error_method, nondet_methods)
-                verdicts += next_verdict_list
-        return self.decide_final_verdict(verdicts)
+        intake = TestIntake(self._extractor, tests_directory)
+        scheduler = TestScheduler(scheduling.create_policy(self.config.test_order, self._extractor))
+        if self.config.test_order == scheduling.DEFAULT_POLICY:
+            # The order doesn't change, so we don't have to look for new tests between runs
+            batch_size = None
+        else:
+            batch_size = self.config.validation_jobs
+        if validator and self.config.validation_jobs > 1:
+            pool = Pool(self.config.validation_jobs)
+        else:
+            pool = None
+
+        def validate_pending(count=None):
+            test_vectors = scheduler.pop(count if count else len(scheduler))
+            verdict_list = self._k(program_file, validator, test_vectors, error_method, nondet_methods, pool)
+            scheduler.executed(test_vectors)
+            return verdict_list
+
+        try:
+            while not is_ready_func() and not stop_event.is_set():
+                # Blocks until new tests are created or a short timeout is reached.
+                # If tests are pending, we only look for new tests that are already there.
+                new_test_vectors = intake.get_test_vectors(visited_tests, timeout=0 if scheduler else 0.1)
+                visited_tests.update(t.name for t in new_test_vectors)
+                if validator:
+                    scheduler.push(new_test_vectors)
+                    next_verdict_list = validate_pending(batch_size)
+                    verdicts += next_verdict_list
+                    if self.config.stop_after_success and any(r.is_positive() for r in next_verdict_list):
+                        return self.decide_final_verdict(verdicts)
+
+            if not stop_event.is_set():
+                # Look at all tests once more, in case a test was missed by the intake
+                new_test_vectors = self._extractor.get_test_vectors(tests_directory, visited_tests)
+                if validator:
+                    scheduler.push(new_test_vectors)
+                    while scheduler and not stop_event.is_set():
+                        next_verdict_list = validate_pending(batch_size)
+                        verdicts += next_verdict_list
+                        if self.config.stop_after_success and any(r.is_positive() for r in next_verdict_list):
+                            break
+            return self.decide_final_verdict(verdicts)
+        finally:
+            intake.close()
+            if pool:
+                pool.close()
+                pool.join()
 
     def perform_klee_replay_validation(self, program_file, is_ready_func,
                                        stop_event, tests_directory, error_method, nondet_methods):
-        validator = KleeReplayRunner(self.config.machine_model)
+        validator = KleeReplayRunner(self.config.machine_model, self.config.compile_cache,
+                                     self.config.test_output_limit)
         return self._perform_processing(program_file, validator,
                                         is_ready_func, stop_event,
                                         tests_directory, error_method, nondet_methods)
@@ -170,16 +290,23 @@ class TestProcessor(object):
 
         if self.config.measure_coverage:
             validator = CoverageMeasuringExecutionRunner(
-                self.config.machine_model, self.get_name())
+                self.config.machine_model, self.get_name(), self.config.use_fork_server,
+                self.config.use_binary_input, self.config.compile_cache, self.config.test_output_limit)
         else:
             validator = ExecutionRunner(self.config.machine_model,
-                                        self.get_name())
+                                        self.get_name(), self.config.use_fork_server,
+                                        self.config.use_binary_input, self.config.compile_cache,
+                                        self.config.test_output_limit)
 
+        if self.config.deduplicate_tests:
+            self._executed_tests = ExecutedTestVectors()
         try:
             return self._perform_processing(program_file, validator,
                                             is_ready_func, stop_event,
                                             tests_directory, error_method, nondet_methods)
         finally:
+            self._executed_tests = None
+            validator.close()
             if type(validator) is CoverageMeasuringExecutionRunner:
                 lines_ex, branch_ex, branch_taken = validator.get_coverage(
                     program_file)
@@ -191,6 +318,120 @@ class TestProcessor(object):
                 if branch_taken:
                     self.statistics.add_value("Branches covered", branch_taken)
 
+    async def _perform_processing_async(self, program_file, validator, tests_directory, error_method,
+                                        nondet_methods):
+        """Process tests like `_perform_processing`, but as tasks on the event loop of the orchestrator.
+
+        New tests are taken in as soon as the test intake reports them, and up to `validation_jobs`
+        workers validate pending tests as soon as they are scheduled.
+        """
+        import asyncio
+        import tbf.orchestration as orchestration
+
+        orchestrator = self.orchestrator
+        loop = orchestrator.loop
+        visited_tests = set()
+        verdicts = list()
+        intake = TestIntake(self._extractor, tests_directory)
+        scheduler = TestScheduler(scheduling.create_policy(self.config.test_order, self._extractor))
+        executor = ThreadPoolExecutor(self.config.validation_jobs)
+        intake_changed = asyncio.Event()
+        tests_available = asyncio.Event()
+        finished = asyncio.Event()
+        # Set as soon as the processing ends, to kill all runs
+        cancel_event = utils.StopEvent()
+        intake_done = False
+        running = 0
+
+        def add_tests(test_vectors):
+            visited_tests.update(t.name for t in test_vectors)
+            if validator and test_vectors:
+                scheduler.push(test_vectors)
+                tests_available.set()
+
+        async def take_in():
+            nonlocal intake_done
+            fd = intake.fileno()
+            if fd is not None:
+                loop.add_reader(fd, intake_changed.set)
+            try:
+                while not orchestrator.generation_done.is_set():
+                    intake_changed.clear()
+                    add_tests(intake.get_test_vectors(visited_tests, timeout=0))
+                    await orchestration.wait_for_any([intake_changed, orchestrator.generation_done],
+                                                     timeout=intake.get_poll_interval())
+            finally:
+                if fd is not None:
+                    loop.remove_reader(fd)
+            # Look at all tests once more, in case a test was missed by the intake
+            add_tests(self._extractor.get_test_vectors(tests_directory, visited_tests))
+            intake_done = True
+            tests_available.set()
+
+        async def validate():
+            nonlocal running
+            while not finished.is_set():
+                if not scheduler:
+                    if intake_done:
+                        return
+                    tests_available.clear()
+                    await orchestration.wait_for_any([tests_available, finished])
+                    continue
+                test_vectors = scheduler.pop(1)
+                if not self._skip_duplicates(test_vectors):
+                    scheduler.executed(test_vectors)
+                    continue
+                test = test_vectors[0]
+
+                # Runs overlap, so we measure the time in which any test runs
+                if running == 0:
+                    self.timer_execution_validation.start()
+                    self.timer_validation.start()
+                running += 1
+                try:
+                    next_result = await loop.run_in_executor(executor, functools.partial(
+                        validator.run, program_file, test, error_method, nondet_methods, stop_flag=cancel_event))
+                finally:
+                    running -= 1
+                    if running == 0:
+                        self.timer_execution_validation.stop()
+                        self.timer_validation.stop()
+                    scheduler.executed(test_vectors)
+                if cancel_event.is_set():
+                    # The run was killed because the processing ended
+                    return
+                verdicts.append(self._decide_single_verdict(next_result, test.origin, test))
+                self.counter_handled_test_cases.inc()
+                if self._executed_tests:
+                    self._executed_tests.add_inputs_read(test)
+
+                logging.debug('Result for %s: %s', test.origin, str(next_result))
+                if self.config.stop_after_success and verdicts[-1].is_positive():
+                    self.final_test_vector_size.value = len(test)
+                    finished.set()
+
+        intake_task = asyncio.ensure_future(take_in())
+        workers = [asyncio.ensure_future(validate()) for _ in range(self.config.validation_jobs)] if validator else []
+        stopped = [finished, orchestrator.stop_requested]
+        try:
+            await orchestration.wait_for_any(stopped, [intake_task])
+            if intake_task.done():
+                intake_task.result()
+            if workers and not any(e.is_set() for e in stopped):
+                all_workers = asyncio.gather(*workers)
+                await orchestration.wait_for_any(stopped, [all_workers])
+                if all_workers.done():
+                    all_workers.result()
+            return self.decide_final_verdict(verdicts)
+        finally:
+            finished.set()
+            cancel_event.set()
+            intake_task.cancel()
+            # Wait for all runs, so that the validator isn't used anymore when we return
+            await asyncio.wait([intake_task] + workers)
+            executor.shutdown()
+            intake.close()
+
     def get_testvectors_continuously(self, program_file, is_ready_func, stop_event, tests_directory, error_method,
                                      nondet_methods):
         """Get testvectors and don't do anything with them, continuously.
@@ -203,7 +444,7 @@ class TestProcessor(object):
                                  nondet_methods)
 
     def _k(self, program_file: str, validator: Any, test_vectors: Iterable[utils.TestVector], error_method: str,
-           nondet_methods: List[str]) -> Iterable[utils.Verdict]:
+           nondet_methods: List[str], pool: Any = None) -> Iterable[utils.Verdict]:
         """
         Return the verdicts for the given test vectors.
 
@@ -212,27 +453,91 @@ class TestProcessor(object):
         :param test_cases: the sequence of test cases to check
         :param error_method: the error method to check for
         :param nondet_methods: the non-deterministic methods that should be stubbed
+        :param pool: the worker pool to run the test cases on. If None, test cases are run one after another.
         :return: The sequence of verdicts, corresponding to the given test cases.
                  A verdict is 'false' if the test case reaches the error method. It is 'unknown', otherwise.
         """
+        if pool:
+            test_vectors = self._skip_duplicates(test_vectors)
+            return self._k_parallel(program_file, validator, test_vectors, error_method, nondet_methods, pool)
+
         results = list()
         for test in test_vectors:
+            if not self._skip_duplicates([test]):
+                continue
             self.timer_execution_validation.start()
             self.timer_validation.start()
             try:
                 next_result = validator.run(program_file, test, error_method, nondet_methods)
                 results.append(self._decide_single_verdict(next_result, test.origin, test))
+                if self._executed_tests:
+                    self._executed_tests.add_inputs_read(test)
             finally:
                 self.timer_execution_validation.stop()
                 self.timer_validation.stop()
             self.counter_handled_test_cases.inc()
 
             logging.debug('Result for %s: %s', test.origin, str(next_result))
-            if self.config.stop_after_success and next_result == FALSE:
-                self.final_test_vector_size = len(test)
+            if self.config.stop_after_success and results[-1].is_positive():
+                self.final_test_vector_size.value = len(test)
                 return results
         return results
 
+    def _skip_duplicates(self, test_vectors):
+        """Return the given test vectors without those that behave like already executed test vectors.
+
+        All returned test vectors are considered as executed.
+        """
+        if self._executed_tests is None:
+            return test_vectors
+        new_test_vectors = list()
+        for test in test_vectors:
+            if self._executed_tests.contains(test):
+                logging.debug('Skipping test %s, it is a duplicate of an executed test', test.origin)
+                self.counter_duplicate_test_cases.inc()
+            else:
+                self._executed_tests.add(test)
+                new_test_vectors.append(test)
+        return new_test_vectors
+
+    def _k_parallel(self, program_file, validator, test_vectors, error_method, nondet_methods, pool):
+        test_vectors = list(test_vectors)
+        if not test_vectors:
+            return []
+
+        # Set as soon as a test reaches the error method, to cancel all other runs
+        cancel_event = utils.StopEvent()
+
+        def run_single(test):
+            if cancel_event.is_set():
+                return test, None
+            return test, validator.run(program_file, test, error_method, nondet_methods, stop_flag=cancel_event)
+
+        results = list()
+        # Runs overlap, so we measure the time for the whole batch of test vectors
+        self.timer_execution_validation.start()
+        self.timer_validation.start()
+        try:
+            # We always consume all results so that no run is left when we return
+            for test, next_result in pool.imap_unordered(run_single, test_vectors):
+                if next_result is None or cancel_event.is_set():
+                    # The run was skipped or killed because another test already reached the error method
+                    continue
+                results.append(self._decide_single_verdict(next_result, test.origin, test))
+                self.counter_handled_test_cases.inc()
+                if self._executed_tests:
+                    self._executed_tests.add_inputs_read(test)
+
+                logging.debug('Result for %s: %s', test.origin, str(next_result))
+                if self.config.stop_after_success and results[-1].is_positive():
+                    self.final_test_vector_size.value = len(test)
+                    cancel_event.set()
+        finally:
+            cancel_event.set()
+            self.timer_execution_validation.stop()
+            self.timer_validation.stop()
+        return results
+
     def process_inputs(self,
                        program_file,
                        error_method,
@@ -278,74 +583,110 @@ class TestProcessor(object):
 
 class ExecutionRunner(object):
 
-    def __init__(self, machine_model, producer_name):
+    # Whether a test execution is killed as soon as it reports a specification violation
+    stop_on_violation = True
+
+    def __init__(self, machine_model, producer_name, use_fork_server=False, use_binary_input=False,
+                 compile_cache=None, output_limit=None):
         self.machine_model = machine_model
+        self.compile_cache = compile_cache
+        # Maximum number of bytes kept of the output of each test execution
+        self.output_limit = output_limit
         self.harness = None
         self.producer = producer_name
         self.harness_generator = harness_gen.HarnessCreator()
         self.harness_file = 'harness.c'
-
-    def _get_compile_cmd(self,
-                         program_file,
-                         harness_file,
-                         output_file,
-                         c_version='gnu11'):
-        mm_arg = self.machine_model.compile_parameter
-        cmd = ['gcc']
-        cmd += [
-            '-std={}'.format(c_version), mm_arg, '-D__alias__(x)=', '-o',
-            output_file, '-include', program_file, harness_file, '-lm'
-        ]
-
-        return cmd
+        # Object file that contains the code of the program under test, after compilation
+        self._program_object = None
+        # The harness is created lazily and runs may happen in parallel
+        self._harness_lock = threading.Lock()
+
+        self._use_binary_input = use_binary_input
+        self._use_fork_server = use_fork_server
+        # Each thread that runs tests gets its own fork server
+        self._thread_data = threading.local()
+        self._fork_servers = list()
+        self._fork_servers_lock = threading.Lock()
+
+    @property
+    def program_object(self):
+        """The object file that contains the code of the program under test, or None if it isn't compiled yet."""
+        return self._program_object
+
+    def _get_compile_flags(self):
+        return []
 
     def compile(self, program_file, harness_file, output_file):
-        compile_cmd = self._get_compile_cmd(program_file, harness_file,
-                                            output_file)
-        compile_result = utils.execute(compile_cmd, quiet=False)
-
-        if compile_result.returncode != 0:
-            compile_cmd = self._get_compile_cmd(program_file, harness_file,
-                                                output_file, 'gnu90')
-            compile_result = utils.execute(
-                compile_cmd, quiet=False, err_to_output=True)
-
-            if compile_result.returncode != 0:
-                raise utils.CompileError(
-                    "Compilation failed for harness {}".format(harness_file))
-
+        self._program_object = compilation.compile_harness(program_file, harness_file, output_file,
+                                                           self.machine_model, self._get_compile_flags(),
+                                                           self.compile_cache)
         return output_file
 
     def _get_run_cmd(self, executable):
         return [executable]
 
     def get_executable_harness(self, program_file, error_method, nondet_methods):
-        if not self.harness:
-            self.harness = os.path.abspath(
-                self._create_executable_harness(program_file, error_method, nondet_methods))
+        with self._harness_lock:
+            if not self.harness:
+                self.harness = os.path.abspath(
+                    self._create_executable_harness(program_file, error_method, nondet_methods))
         return self.harness
 
     def _create_executable_harness(self, program_file, error_method, nondet_methods):
+        output_file = 'a.out'
+        if self._use_fork_server:
+            try:
+                return self._compile_harness(program_file, error_method, nondet_methods, output_file, True)
+            except utils.CompileError:
+                logging.warning("Compilation of fork-server harness failed, using normal execution")
+                self._use_fork_server = False
+        return self._compile_harness(program_file, error_method, nondet_methods, output_file, False)
+
+    def _compile_harness(self, program_file, error_method, nondet_methods, output_file, fork_server):
         harness_content = self.harness_generator.create_harness(
-            nondet_methods, error_method)
+            nondet_methods, error_method, fork_server=fork_server, binary_input=self._use_binary_input)
         with open(self.harness_file, 'wb+') as outp:
             outp.write(harness_content)
-        output_file = 'a.out'
         return self.compile(program_file, self.harness_file, output_file)
 
-    def run(self, program_file, test_vector, error_method, nondet_methods):
+    def _run_on_fork_server(self, executable, input_vector, stop_flag):
+        fork_server = getattr(self._thread_data, 'fork_server', None)
+        try:
+            if fork_server is None:
+                fork_server = ForkServer(executable)
+                self._thread_data.fork_server = fork_server
+                with self._fork_servers_lock:
+                    self._fork_servers.append(fork_server)
+            return fork_server.run(input_vector, timelimit=5, stop_flag=stop_flag, output_limit=self.output_limit)
+        except utils.ForkServerError as e:
+            logging.warning("Fork server failed, using normal execution: %s", e.msg)
+            self._use_fork_server = False
+            return None
+
+    def run(self, program_file, test_vector, error_method, nondet_methods, stop_flag=None):
         executable = self.get_executable_harness(program_file, error_method, nondet_methods)
-        input_vector = self._get_input_vector(test_vector)
+        if self._use_binary_input:
+            input_vector = harness_gen.get_binary_input(test_vector)
+        else:
+            input_vector = self._get_input_vector(test_vector)
 
         if executable and os.path.exists(executable):
-            run_cmd = self._get_run_cmd(executable)
-            run_result = utils.execute(
-                run_cmd,
-                quiet=True,
-                err_to_output=False,
-                input_str=input_vector,
-                timelimit=5)
-
+            run_result = None
+            if self._use_fork_server:
+                run_result = self._run_on_fork_server(executable, input_vector, stop_flag)
+            if run_result is None:
+                run_cmd = self._get_run_cmd(executable)
+                run_result = utils.execute(
+                    run_cmd,
+                    quiet=True,
+                    err_to_output=False,
+                    input_str=input_vector,
+                    stop_flag=stop_flag,
+                    timelimit=5,
+                    stop_on_output=utils.ERROR_STRING if self.stop_on_violation else None,
+                    output_limit=self.output_limit)
+
+            test_vector.inputs_read = harness_gen.get_inputs_read(run_result.stderr)
             if utils.found_err(run_result):
                 return [FALSE]
             else:
@@ -353,6 +694,14 @@ class ExecutionRunner(object):
         else:
             return [ERROR]
 
+    def close(self):
+        """Stop all fork servers of this runner."""
+        with self._fork_servers_lock:
+            for fork_server in self._fork_servers:
+                fork_server.close()
+            self._fork_servers = list()
+        self._thread_data = threading.local()
+
     def _get_input_vector(self, test_vector, escape_newline=False):
         input_vector = ''
         if escape_newline:
@@ -372,16 +721,33 @@ class ExecutionRunner(object):
 
 class CoverageMeasuringExecutionRunner(ExecutionRunner):
 
-    def _get_compile_cmd(self,
-                         program_file,
-                         harness_file,
-                         output_file,
-                         c_version='gnu11'):
-        cmd = super()._get_compile_cmd(program_file, harness_file, output_file,
-                                       c_version)
-        cmd += ['-fprofile-arcs', '-ftest-coverage']
+    # A killed execution doesn't write its coverage data
+    stop_on_violation = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Object file of the harness, after compilation
+        self._harness_object = None
+
+    def _get_compile_flags(self):
+        return ['-fprofile-arcs', '-ftest-coverage']
+
+    def compile(self, program_file, harness_file, output_file):
+        output_file = super().compile(program_file, harness_file, output_file)
+        self._harness_object = os.path.abspath(compilation.get_object_name(harness_file))
+        return output_file
+
+    def reset_coverage(self):
+        """Remove the coverage data of all earlier executions.
 
-        return cmd
+        The object file of the program may be reused from a different work directory,
+        so its coverage data isn't necessarily in the current work directory.
+        """
+        for object_file in (self._program_object, self._harness_object):
+            if object_file:
+                coverage_data = compilation.get_coverage_data_file(object_file)
+                if os.path.exists(coverage_data):
+                    os.remove(coverage_data)
 
     @staticmethod
     def _get_gcov_val(gcov_line):
@@ -393,7 +759,9 @@ class CoverageMeasuringExecutionRunner(ExecutionRunner):
             return None
 
     def get_coverage(self, program_file):
-        cmd = ['gcov', '-bc', self.harness_file]
+        if not self._program_object:
+            return None, None, None
+        cmd = ['gcov', '-bc', self._program_object]
         res = utils.execute(cmd, quiet=False, err_to_output=False)
         full_cov = res.stdout.splitlines()
 
@@ -413,35 +781,20 @@ class CoverageMeasuringExecutionRunner(ExecutionRunner):
 
 class KleeReplayRunner(object):
 
-    def __init__(self, machine_model):
+    def __init__(self, machine_model, compile_cache=None, output_limit=None):
         self.machine_model = machine_model
+        self.compile_cache = compile_cache
+        self.output_limit = output_limit
         self.executable_name = './a.out'
         self.executable = None
+        self._executable_lock = threading.Lock()
         if os.path.exists(self.executable_name):
             os.remove(self.executable_name)
 
-    def run(self, program_file, test_vector, error_method, nondet_methods):
-        from tbf.tools import klee
-
-        klee_prepared_file = utils.get_prepared_name(program_file, klee.name)
-        c_version = 'gnu11'
-        if not self.executable:
-            compile_cmd = ['gcc']
-            compile_cmd += [
-                '-std={}'.format(c_version), "-L", klee.lib_dir,
-                '-D__alias__(x)=', '-o', self.executable_name,
-                klee_prepared_file, '-lkleeRuntest', '-lm'
-            ]
-            result = utils.execute(compile_cmd)
-            if result.returncode != 0:
-                c_version = 'gnu90'
-                compile_cmd = ['gcc']
-                compile_cmd += [
-                    '-std={}'.format(c_version), "-L", klee.lib_dir,
-                    '-D__alias__(x)=', '-o', self.executable_name,
-                    klee_prepared_file, '-lkleeRuntest', '-lm'
-                ]
-            self.executable = self.executable_name
+    def run(self, program_file, test_vector, error_method, nondet_methods, stop_flag=None):
+        with self._executable_lock:
+            if not self.executable:
+                self._compile(program_file)
 
         if not os.path.exists(self.executable_name):
             return [ERROR]
@@ -450,9 +803,34 @@ class KleeReplayRunner(object):
         curr_env['KTEST_FILE'] = test_vector.origin
 
         result = utils.execute(
-            [self.executable], env=curr_env, err_to_output=False)
+            [self.executable],
+            env=curr_env,
+            err_to_output=False,
+            stop_flag=stop_flag,
+            stop_on_output=utils.ERROR_STRING,
+            output_limit=self.output_limit)
 
         if utils.found_err(result):
             return [FALSE]
         else:
             return [UNKNOWN]
+
+    def _compile(self, program_file):
+        from tbf.tools import klee
+
+        klee_prepared_file = utils.get_prepared_name(program_file, klee.name)
+        compile_cmd = self._get_compile_cmd(klee_prepared_file, klee.lib_dir, 'gnu11')
+        result = cache.execute_cached(compile_cmd, self.compile_cache)
+        if result.returncode != 0:
+            compile_cmd = self._get_compile_cmd(klee_prepared_file, klee.lib_dir, 'gnu90')
+            cache.execute_cached(compile_cmd, self.compile_cache)
+        self.executable = self.executable_name
+
+    def _get_compile_cmd(self, program_file, lib_dir, c_version):
+        compile_cmd = ['gcc']
+        compile_cmd += [
+            '-std={}'.format(c_version), "-L", lib_dir,
+            '-D__alias__(x)=', '-o', self.executable_name,
+            program_file, '-lkleeRuntest', '-lm'
+        ]
+        return utils.CompileCommand(compile_cmd, inputs=[program_file, lib_dir], outputs=[self.executable_name])
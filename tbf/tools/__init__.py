@@ -0,0 +1,77 @@
+"""Registry of the test-case generators that tbf can use.
+
+Each test-case generator is provided by a module that defines:
+
+    tests_dir: the directory, relative to the work directory, that the generator writes its tests to
+    create_input_generator(args): returns the input generator for the parsed tbf arguments
+    create_test_converter(args, nondet_methods): returns the test converter for the tests of the generator,
+        for the parsed tbf arguments
+
+Generator modules are only imported when they are used.
+Other packages can provide additional generators through the entry point group 'tbf.generators'.
+The name of an entry point is the name of the generator, and the entry point refers to its module,
+e.g., `mytool = mypackage.mytool`.
+"""
+
+import importlib
+
+ENTRY_POINT_GROUP = 'tbf.generators'
+
+_BUILTIN_GENERATORS = [
+    ('afl', 'tbf.tools.afl'),
+    ('fshell', 'tbf.tools.fshell'),
+    ('klee', 'tbf.tools.klee'),
+    ('crest', 'tbf.tools.crest'),
+    ('cpatiger', 'tbf.tools.cpatiger'),
+    ('random', 'tbf.tools.random_tester'),
+    ('dummy', 'tbf.tools.dummy'),
+]
+
+BUILTIN_GENERATOR_NAMES = [name for name, _ in _BUILTIN_GENERATORS]
+
+_entry_points = None
+
+
+def _get_entry_points():
+    global _entry_points
+    if _entry_points is None:
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            # Python < 3.8
+            try:
+                import pkg_resources
+            except ImportError:
+                found = []
+            else:
+                found = list(pkg_resources.iter_entry_points(ENTRY_POINT_GROUP))
+        else:
+            all_entry_points = entry_points()
+            if hasattr(all_entry_points, 'select'):
+                found = list(all_entry_points.select(group=ENTRY_POINT_GROUP))
+            else:
+                # Python < 3.10
+                found = list(all_entry_points.get(ENTRY_POINT_GROUP, []))
+        _entry_points = dict((e.name, e) for e in found if e.name not in BUILTIN_GENERATOR_NAMES)
+    return _entry_points
+
+
+def get_generator_names():
+    """Return the names of all available test-case generators, built-in generators first."""
+    return BUILTIN_GENERATOR_NAMES + sorted(_get_entry_points().keys())
+
+
+def is_generator(name):
+    """Return whether a test-case generator with the given name is available."""
+    return name in BUILTIN_GENERATOR_NAMES or name in _get_entry_points()
+
+
+def get_generator(name):
+    """Return the module of the test-case generator with the given name.
+
+    :raises KeyError: if no generator with the given name is available
+    """
+    for builtin_name, module_name in _BUILTIN_GENERATORS:
+        if builtin_name == name:
+            return importlib.import_module(module_name)
+    return _get_entry_points()[name].load()
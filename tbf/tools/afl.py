@@ -1,6 +1,8 @@
+import fnmatch
 import glob
 import logging
 import os
+import re
 
 import tbf.utils as utils
 from tbf.input_generation import BaseInputGenerator
@@ -12,29 +14,157 @@ FINDINGS_DIR = './findings'
 QUEUE_DIR = os.path.join(FINDINGS_DIR, 'queue')
 name = 'afl-fuzz'
 tests_dir = '.'
+test_name_pattern = 'id:*'
+# Name part of the queue entries that an instance took over from other instances
+SYNCED_TEST_MARKER = ',sync:'
+# Environment variables that influence the instrumentation of the afl compiler wrappers
+AFL_COMPILE_ENV_KEYS = ('AFL_CC', 'AFL_AS', 'AFL_PATH', 'AFL_HARDEN', 'AFL_USE_ASAN', 'AFL_USE_MSAN',
+                        'AFL_INST_RATIO', 'AFL_DONT_OPTIMIZE')
+# Compiler wrapper of afl that supports persistent mode
+PERSISTENT_COMPILER = 'afl-clang-fast'
+# Number of inputs that a process handles in persistent mode before afl-fuzz starts a new one
+PERSISTENT_ITERATIONS = 1000
+# Maximum size of an input in persistent mode, in bytes
+PERSISTENT_INPUT_SIZE = 1024 * 1024
+PROGRAM_MAIN = '__tbf_program_main'
+# Number of input lines of the seed that only consists of zeros
+ZERO_SEED_LINES = 1000
+# Number of input lines of all other seeds. Seeds that are too short for the program are skipped by afl-fuzz
+SEED_LINES = 100
+# Maximum number of values to create seeds from
+MAX_SEED_VALUES = 32
+
+_MAIN_PATTERN = re.compile(r'\bmain(?=\s*\()')
 
 
 class Preprocessor:
 
+    def __init__(self, machine_model=None, persistent=False):
+        """Create a new preprocessor for afl-fuzz.
+
+        :param machine_model: the machine model to parse the program with. Only required for persistent mode.
+        :param bool persistent: whether to prepare the program for afl's persistent mode.
+            In persistent mode, the function main of the program is renamed and called in a loop,
+            once for each input, and all global variables are reset before each call.
+            If the program can't be run in persistent mode, it is prepared as usual.
+        """
+        self.machine_model = machine_model
+        self.persistent = persistent
+
     def prepare(self, filecontent, nondet_methods_used, error_method=None):
+        persistent_driver = self._get_persistent_driver(filecontent) if self.persistent else None
         content = filecontent
+        if persistent_driver:
+            content = _MAIN_PATTERN.sub(PROGRAM_MAIN, content)
         content += '\n'
         content += utils.EXTERNAL_DECLARATIONS
         content += '\n'
         content += utils.get_assume_method()
         content += '\n'
-        content += self._get_vector_read_method()
+        content += self._get_vector_read_method(bool(persistent_driver))
+        if persistent_driver:
+            content += self._get_persistent_input_method()
         if error_method:
             content += utils.get_error_method_definition(error_method)
         for method in nondet_methods_used:
             # append method definition at end of file content
             nondet_method_definition = self._get_nondet_method_definition(method['name'], method['type'],
-                                                                          method['params'])
+                                                                          method['params'], bool(persistent_driver))
             content += nondet_method_definition
+        if persistent_driver:
+            content += persistent_driver
         return content
 
+    def _get_persistent_driver(self, filecontent):
+        """Return the function main that runs the given program in persistent mode,
+        or None if the program can't be run in persistent mode."""
+        import pycparser
+        import tbf.ast_visitor as ast_visitor
+
+        try:
+            ast = utils.parse_file_with_preprocessing(filecontent, self.machine_model)
+        except pycparser.plyparser.ParseError as e:
+            logging.warning("Can't parse program for persistent mode, using normal mode: %s", e)
+            return None
+
+        static_collector = ast_visitor.StaticLocalVariableCollector()
+        static_collector.visit(ast)
+        if static_collector.static_variables:
+            # Static local variables can't be reset from outside of their function
+            logging.warning("Program has static local variables, using normal mode instead of persistent mode")
+            return None
+
+        func_def_collector = ast_visitor.FuncDefCollector()
+        func_def_collector.visit(ast)
+        main_defs = [f for f in func_def_collector.func_defs if f.name == 'main']
+        if len(main_defs) != 1:
+            logging.warning("Program has no function main, using normal mode instead of persistent mode")
+            return None
+        main_params = main_defs[0].type.args.params if main_defs[0].type.args else []
+        if len(main_params) == 1 and ast_visitor.get_type(main_params[0]) == 'void':
+            main_params = []
+        main_args = 'argc, argv' if main_params else ''
+
+        global_collector = ast_visitor.GlobalVariableCollector()
+        global_collector.visit(ast)
+        global_variables = [d.name for d in global_collector.global_variables]
+
+        driver = ''
+        for var in global_variables:
+            driver += 'static unsigned char __tbf_initial_{0}[sizeof({0})];\n'.format(var)
+        driver += '\nint main(int argc, char ** argv) {\n'
+        for var in global_variables:
+            driver += '    memcpy(__tbf_initial_{0}, &{0}, sizeof({0}));\n'.format(var)
+        driver += '    setvbuf(stdin, 0, 2, 0);  /* _IONBF: afl-fuzz rewinds stdin for each input */\n'
+        driver += '    while (__AFL_LOOP({})) {{\n'.format(PERSISTENT_ITERATIONS)
+        for var in global_variables:
+            driver += '        memcpy(&{0}, __tbf_initial_{0}, sizeof({0}));\n'.format(var)
+        driver += '        clearerr(stdin);\n'
+        driver += '        __tbf_input_length = fread(__tbf_input, 1, sizeof(__tbf_input), stdin);\n'
+        driver += '        __tbf_input_position = 0;\n'
+        driver += '        {}({});\n'.format(PROGRAM_MAIN, main_args)
+        driver += '    }\n'
+        driver += '    return 0;\n'
+        driver += '}\n'
+        return driver
+
     @staticmethod
-    def _get_vector_read_method():
+    def _get_persistent_input_method():
+        return """extern size_t fread (void *__restrict __ptr, size_t __size,
+    size_t __n, FILE *__restrict __stream);
+extern void clearerr (FILE *__stream) __attribute__ ((__nothrow__ , __leaf__));
+extern int setvbuf (FILE *__restrict __stream, char *__restrict __buf,
+    int __modes, size_t __n) __attribute__ ((__nothrow__ , __leaf__));
+
+char __tbf_input[""" + str(PERSISTENT_INPUT_SIZE) + """];
+size_t __tbf_input_length = 0;
+size_t __tbf_input_position = 0;
+
+char * __tbf_next_input_line() {
+    static char line[3000];
+    size_t length = 0;
+    if (__tbf_input_position >= __tbf_input_length) {
+        fprintf(stderr, "No input left\\n");
+        abort();
+    }
+    while (__tbf_input_position < __tbf_input_length && length < sizeof(line) - 1) {
+        char c = __tbf_input[__tbf_input_position++];
+        line[length++] = c;
+        if (c == '\\n') {
+            break;
+        }
+    }
+    line[length] = '\\0';
+    return line;
+}\n\n"""
+
+    @staticmethod
+    def _get_vector_read_method(persistent=False):
+        if persistent:
+            # The value is used right after parsing, so we don't allocate new memory for each value
+            value_definition = "static char value_pointer[16];"
+        else:
+            value_definition = "char * value_pointer = malloc(16);"
         return """char * parse_inp(char * __inp_var) {
         unsigned int input_length = strlen(__inp_var)-1;
         /* Remove '\\n' at end of input */
@@ -43,7 +173,7 @@ class Preprocessor:
         }
 
         char * parseEnd;
-        char * value_pointer = malloc(16);
+        """ + value_definition + """
 
         unsigned long long intVal = strtoull(__inp_var, &parseEnd, 0);
         if (*parseEnd != 0) {
@@ -68,12 +198,14 @@ class Preprocessor:
     }\n\n"""
 
     @staticmethod
-    def _get_nondet_method_definition(method_name, method_type, method_param):
+    def _get_nondet_method_definition(method_name, method_type, method_param, persistent=False):
         definition = ""
         definition += utils.get_method_head(method_name, method_type,
                                             method_param)
         definition += ' {\n'
-        if method_type != 'void':
+        if method_type != 'void' and persistent:
+            definition += "    return *((" + method_type + "*) parse_inp(__tbf_next_input_line()));\n"
+        elif method_type != 'void':
             definition += "    unsigned int inp_size = 3000;\n"
             definition += "    char * inp_var = malloc(inp_size);\n"
             definition += "    fgets(inp_var, inp_size, stdin);\n"
@@ -83,21 +215,172 @@ class Preprocessor:
         return definition
 
 
+def get_afl_executable(executable):
+    """Return the path to the given executable of afl, or None if it isn't available.
+
+    The executables bundled with tbf are preferred over those on the PATH.
+    """
+    bundled_executable = os.path.join(bin_dir, executable)
+    if os.path.exists(bundled_executable):
+        return bundled_executable
+    return utils.get_executable(executable)
+
+
+def get_persistent_compiler():
+    """Return the path to the afl compiler wrapper that supports persistent mode, or None if it isn't available."""
+    return get_afl_executable(PERSISTENT_COMPILER)
+
+
+def get_boundary_values(type_name, machine_model):
+    """Return the boundary values of the given C type, except for 0.
+
+    :param str type_name: the C type
+    :param utils.MachineModel machine_model: the machine model that defines the size of the type
+    :return list: the boundary values as ints or floats. Empty if the type isn't a number type.
+    """
+    type_name = type_name.lower()
+    if '*' in type_name or '[' in type_name or type_name == 'void':
+        return []
+    if 'bool' in type_name:
+        return [1]
+    if 'double' in type_name:
+        return [1.0, -1.0, 0.5, 1e308]
+    if 'float' in type_name:
+        return [1.0, -1.0, 0.5, 1e38]
+
+    if 'char' in type_name:
+        size = 1
+    else:
+        try:
+            size = machine_model.get_size(type_name)
+        except AssertionError:
+            if 'signed' not in type_name:
+                return []
+            # 'signed' and 'unsigned' are int types
+            size = machine_model.int_size
+    bits = 8 * size
+    if 'unsigned' in type_name:
+        return [1, 2**bits - 1, 2**(bits - 1)]
+    return [1, -1, 2**(bits - 1) - 1, -2**(bits - 1)]
+
+
+def get_seed_values(program_content, nondet_methods, machine_model):
+    """Return the values that seeds for afl-fuzz should consist of, most interesting first.
+
+    These are the constants that the program compares with, their neighbors,
+    and the boundary values of the return types of the given nondet methods.
+    At most MAX_SEED_VALUES values are returned, and 0 is never returned.
+    """
+    import pycparser
+    import tbf.ast_visitor as ast_visitor
+
+    try:
+        ast = utils.parse_file_with_preprocessing(program_content, machine_model)
+        constant_collector = ast_visitor.ComparisonConstantCollector()
+        constant_collector.visit(ast)
+        constants = constant_collector.constants
+    except pycparser.plyparser.ParseError as e:
+        logging.info("Can't parse program for seed values: %s", e)
+        constants = []
+
+    values = list(constants)
+    for constant in constants:
+        if type(constant) is int:
+            values += [constant - 1, constant + 1]
+    for method in nondet_methods:
+        values += get_boundary_values(method['type'], machine_model)
+
+    seed_values = list()
+    for value in values:
+        if value != 0 and value not in seed_values:
+            seed_values.append(value)
+    return seed_values[:MAX_SEED_VALUES]
+
+
+def write_seeds(seed_values, directory):
+    """Write seeds for afl-fuzz to the given directory, which must not exist yet.
+
+    There is one seed that only consists of zeros, one seed for each given value that repeats that value,
+    and, if there are multiple values, one seed that goes through all values.
+    """
+    os.mkdir(directory)
+
+    def write_seed(seed_name, lines):
+        with open(os.path.join(directory, seed_name + '.afl-test'), 'w+') as outp:
+            outp.write(''.join(line + '\n' for line in lines))
+
+    write_seed('0', ZERO_SEED_LINES * ['0'])
+    seed_lines = [str(v) for v in seed_values]
+    for idx, line in enumerate(seed_lines):
+        write_seed('seed{:03d}'.format(idx), SEED_LINES * [line])
+    if len(seed_lines) > 1:
+        write_seed('all', [seed_lines[i % len(seed_lines)] for i in range(SEED_LINES)])
+
+
+def get_instance_name(instance):
+    """Return the name of the afl-fuzz instance with the given number, when multiple instances run.
+
+    The instance with number 0 is the master instance.
+    """
+    return 'fuzzer{:02d}'.format(instance)
+
+
+def get_queue_dirs(directory, instances):
+    """Return the queue directories of the given number of afl-fuzz instances in the given directory."""
+    if instances == 1:
+        return [os.path.join(directory, QUEUE_DIR)]
+    return [os.path.join(directory, FINDINGS_DIR, get_instance_name(i), 'queue') for i in range(instances)]
+
+
 class InputGenerator(BaseInputGenerator):
 
-    def __init__(self, machine_model, log_verbose, additional_options):
-        super().__init__(machine_model, log_verbose, additional_options, Preprocessor())
+    def __init__(self, machine_model, log_verbose, additional_options, instances=1, persistent=False):
+        """Create a new input generator for afl-fuzz.
+
+        :param int instances: the number of afl-fuzz instances to run in parallel.
+            If more than one, one master and instances - 1 secondary instances share the findings directory.
+        :param bool persistent: whether to run the program in afl's persistent mode.
+            This requires the compiler wrapper afl-clang-fast. If it isn't available, normal mode is used.
+        """
+        self.instances = instances
+        self.persistent_compiler = None
+        if persistent:
+            self.persistent_compiler = get_persistent_compiler()
+            if not self.persistent_compiler:
+                logging.warning("Persistent mode requires %s, which wasn't found. Using normal mode.",
+                                PERSISTENT_COMPILER)
+        super().__init__(machine_model, log_verbose, additional_options,
+                         Preprocessor(machine_model, self.persistent_compiler is not None))
 
     def create_input_generation_cmds(self, program_file, cli_options):
         instrumented_program = './tested.out'
-        compiler = self._get_compiler()
+        if self.persistent_compiler:
+            compiler = self.persistent_compiler
+            # afl-clang-fast instruments the program in a compiler pass
+            compile_inputs = [program_file, compiler]
+        else:
+            compiler = os.path.join(bin_dir, self._get_compiler())
+            # The afl compiler wrappers inject their instrumentation through afl-as
+            compile_inputs = [program_file, os.path.join(bin_dir, 'afl-as')]
         compile_cmd = [
-            os.path.join(bin_dir,
-                         compiler), self.machine_model.compile_parameter, '-o',
+            compiler, self.machine_model.compile_parameter, '-o',
             instrumented_program, program_file
         ]
+        compile_cmd = utils.CompileCommand(
+            compile_cmd,
+            inputs=compile_inputs,
+            outputs=[instrumented_program],
+            env_keys=AFL_COMPILE_ENV_KEYS)
 
-        testcase_dir = self._create_testcase_dir()
+        seed_dir = './seeds'
+        write_seeds(get_seed_values(self._program_content, self._nondet_methods, self.machine_model), seed_dir)
+        testcase_dir = './initial_testcases'
+        minimize_cmd = self._get_minimize_cmd(seed_dir, testcase_dir, instrumented_program)
+        if minimize_cmd:
+            prepare_cmds = [compile_cmd, minimize_cmd]
+        else:
+            prepare_cmds = [compile_cmd]
+            testcase_dir = seed_dir
         input_gen_cmd = [
             os.path.join(bin_dir, 'afl-fuzz'), '-i', testcase_dir, '-o',
             FINDINGS_DIR
@@ -108,17 +391,46 @@ class InputGenerator(BaseInputGenerator):
         # the program name and fail
         if cli_options:
             input_gen_cmd += cli_options
-        input_gen_cmd += ['--', instrumented_program]
-        return [compile_cmd, input_gen_cmd]
+        if self.instances == 1:
+            input_gen_cmd += ['--', instrumented_program]
+            return prepare_cmds + [input_gen_cmd]
 
-    def _create_testcase_dir(self):
-        testcase_dir = './initial_testcases'
-        os.mkdir(testcase_dir)
-        initial_testcase = os.path.join(testcase_dir, '0.afl-test')
-        with open(initial_testcase, 'w+') as outp:
-            outp.write(
-                1000 * '0\n')  # FIXME: This is an unreliable first test case
-        return testcase_dir
+        input_gen_cmds = list()
+        for instance in range(self.instances):
+            mode = '-M' if instance == 0 else '-S'
+            input_gen_cmds.append(input_gen_cmd + [mode, get_instance_name(instance), '--', instrumented_program])
+        return prepare_cmds + [utils.ParallelCommands(input_gen_cmds, self._get_cpus())]
+
+    def _get_cpus(self):
+        if 'AFL_NO_AFFINITY' in utils.get_env():
+            # The user doesn't want afl-fuzz to be pinned to CPU cores
+            return None
+        available_cpus = sorted(os.sched_getaffinity(0))
+        if len(available_cpus) < self.instances:
+            logging.warning("Running %s afl-fuzz instances on %s CPU cores", self.instances, len(available_cpus))
+        return [available_cpus[i % len(available_cpus)] for i in range(self.instances)]
+
+    def prepare_input_generation(self, filename, error_method, nondet_methods):
+        # The seeds are derived from the original program and its nondet methods
+        self.timer_file_access.start()
+        with open(filename, 'r') as inp:
+            self._program_content = inp.read()
+        self.timer_file_access.stop()
+        self._nondet_methods = nondet_methods
+        return super().prepare_input_generation(filename, error_method, nondet_methods)
+
+    @staticmethod
+    def _get_minimize_cmd(seed_dir, testcase_dir, instrumented_program):
+        """Return the command that reduces the seeds to those with different coverage, or None if
+        afl-cmin isn't available."""
+        cmin = get_afl_executable('afl-cmin')
+        showmap = get_afl_executable('afl-showmap')
+        if not cmin or not showmap:
+            logging.debug("afl-cmin or afl-showmap not found, using all seeds")
+            return None
+        # afl-cmin fails if, e.g., all seeds crash the program. Then all seeds are used
+        return ['sh', '-c', 'AFL_PATH="$4" "$0" -i "$1" -o "$2" -- "$3" || { rm -rf "$2"; cp -r "$1" "$2"; }',
+                cmin, seed_dir, testcase_dir, instrumented_program, os.path.dirname(showmap)]
 
     def get_name(self):
         return name
@@ -131,6 +443,13 @@ class InputGenerator(BaseInputGenerator):
             env['AFL_I_DONT_CARE_ABOUT_MISSING_CRASHES'] = 'true'
         if 'AFL_SKIP_CPUFREQ' not in env.keys():
             env['AFL_SKIP_CPUFREQ'] = 'true'
+        if 'AFL_SKIP_CRASHES' not in env.keys():
+            # Seeds that are too short for the program make it crash, but afl-fuzz shouldn't stop because of them
+            env['AFL_SKIP_CRASHES'] = 'true'
+        if self.instances > 1 and 'AFL_NO_AFFINITY' not in env.keys():
+            # We pin the instances to CPU cores ourselves. Otherwise, instances that start
+            # at the same time may bind to the same free core
+            env['AFL_NO_AFFINITY'] = 'true'
         return env
 
     def _get_compiler(self):
@@ -149,33 +468,72 @@ class InputGenerator(BaseInputGenerator):
 
 class AflTestConverter(TestConverter):
 
+    def __init__(self, instances=1):
+        """Create a new test converter for afl-fuzz.
+
+        :param int instances: the number of afl-fuzz instances that create tests
+        """
+        self.instances = instances
+
     def _get_test_name(self, test_file):
-        return os.path.basename(test_file)
+        name = os.path.basename(test_file)
+        instance_dir = os.path.dirname(os.path.dirname(os.path.abspath(test_file)))
+        if os.path.basename(instance_dir) == os.path.basename(FINDINGS_DIR):
+            return name
+        # Each instance numbers its tests separately, so we add the name of the instance
+        return os.path.basename(instance_dir) + '_' + name
 
     def _get_test_cases_in_dir(self, directory=None, exclude=None):
         if directory is None:
             directory = tests_dir
-        # 'crashes' and 'hangs' cannot lead to an error as long as we don't abort in __VERIFIER_error()
-        interesting_subdirs = (os.path.join(directory, d) for d in [QUEUE_DIR])
+        # 'crashes' and 'hangs' cannot lead to an error as long as we don't abort in __VERIFIER_error().
+        # The given directory may contain the tests of any number of instances
+        interesting_subdirs = [os.path.join(directory, QUEUE_DIR)]
+        interesting_subdirs += sorted(glob.glob(os.path.join(directory, FINDINGS_DIR, '*', 'queue')))
         tcs = list()
         for s in interesting_subdirs:
             abs_dir = os.path.abspath(s)
             if not os.path.exists(s):
                 continue
-            for t in glob.glob(abs_dir + '/id:*'):
+            for t in glob.glob(abs_dir + '/' + test_name_pattern):
+                if not self.is_test_file(t):
+                    continue
                 test_name = self._get_test_name(t)
                 if test_name not in exclude:
                     tcs.append(self._get_test_case_from_file(t))
         return tcs
 
+    def get_test_directories(self, directory=None):
+        if directory is None:
+            directory = tests_dir
+        return get_queue_dirs(directory, self.instances)
+
+    def is_test_file(self, test_file):
+        name = os.path.basename(test_file)
+        # Tests that an instance took over from another instance were already reported for the other instance
+        return fnmatch.fnmatch(name, test_name_pattern) and SYNCED_TEST_MARKER not in name
+
     def _get_test_case_from_file(self, test_file):
         test_name = self._get_test_name(test_file)
         with open(test_file, 'rb') as inp:
             content = inp.read()
         return utils.TestCase(test_name, test_file, content)
 
+    def get_priority_hint(self, test_vector):
+        # afl-fuzz marks queue entries that cover new branches
+        return 1 if '+cov' in test_vector.name else 0
+
     def get_test_vector(self, test_case):
         vector = utils.TestVector(test_case.name, test_case.origin)
         for line in test_case.content.split(b'\n'):
             vector.add(line)
         return vector
+
+
+def create_input_generator(args):
+    return InputGenerator(args.machine_model, args.log_verbose, args.ig_options, args.afl_instances,
+                          args.afl_persistent)
+
+
+def create_test_converter(args, nondet_methods):
+    return AflTestConverter(args.afl_instances)
@@ -3,6 +3,7 @@ import os
 import tbf.utils as utils
 from tbf.input_generation import BaseInputGenerator
 from tbf.testcase_converter import TestConverter
+from tbf.testcase_intake import TailReader
 
 module_dir = os.path.dirname(os.path.realpath(__file__))
 base_dir = os.path.join(module_dir, 'cpatiger')
@@ -100,22 +101,40 @@ class InputGenerator(BaseInputGenerator):
 
 class CpaTigerTestConverter(TestConverter):
 
+    def __init__(self):
+        # The test suite grows while CPATiger runs, so we only parse the lines appended since the last call
+        self._reader = TailReader()
+        self._tests = dict()
+
     def _get_test_cases_in_dir(self, directory=None, exclude=()):
         if directory is None:
             directory = tests_dir
+        if exclude is None:
+            exclude = ()
         tests_file = os.path.join(directory, 'testsuite.txt')
-        if os.path.exists(tests_file):
-            with open(tests_file, 'r') as inp:
-                tests = [
-                    l.strip()
-                    for l in inp.readlines()
-                    if l.strip().startswith('[') and l.strip().endswith(']')
-                ]
-            tests = [t for i, t in enumerate(tests) if str(i) not in exclude]
-            tcs = list()
-            for i, t in enumerate(tests):
-                tcs.append(utils.TestCase(str(i), tests_file, t))
-            return tcs
+        new_lines, restarted = self._reader.read_new_lines(tests_file)
+        if restarted or tests_file not in self._tests:
+            self._tests[tests_file] = list()
+        tests = self._tests[tests_file]
+        tests += [l.strip() for l in new_lines if l.strip().startswith('[') and l.strip().endswith(']')]
+        return [utils.TestCase(str(i), tests_file, t) for i, t in enumerate(tests) if str(i) not in exclude]
+
+    def get_test_directories(self, directory=None):
+        if directory is None:
+            directory = tests_dir
+        return [directory]
+
+    def is_test_file(self, test_file):
+        return os.path.basename(test_file) == 'testsuite.txt'
+
+    def is_growing_test_file(self, test_file):
+        return self.is_test_file(test_file)
+
+    def get_test_vectors_from_files(self, test_files, exclude=None):
+        # All test cases are in a single file, so we have to look at the full test suite
+        test_suites = [f for f in test_files if self.is_test_file(f)]
+        if test_suites:
+            return self.get_test_vectors(os.path.dirname(test_suites[0]), exclude)
         else:
             return []
 
@@ -138,3 +157,15 @@ class CpaTigerTestConverter(TestConverter):
         for value in test_values:
             test_vector.add(value)
         return test_vector
+
+
+def create_input_generator(args):
+    return InputGenerator(
+        args.ig_timelimit,
+        args.log_verbose,
+        args.ig_options,
+        machine_model=args.machine_model)
+
+
+def create_test_converter(args, nondet_methods):
+    return CpaTigerTestConverter()
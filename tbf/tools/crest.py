@@ -1,3 +1,4 @@
+import fnmatch
 import glob
 import logging
 import os
@@ -130,6 +131,14 @@ class CrestTestConverter(TestConverter):
             content = inp.read()
         return utils.TestCase(self._get_file_name(test_file), test_file, content)
 
+    def get_test_directories(self, directory=None):
+        if directory is None:
+            directory = tests_dir
+        return [directory]
+
+    def is_test_file(self, test_file):
+        return fnmatch.fnmatch(self._get_file_name(test_file), test_name_pattern)
+
     def get_test_vector(self, test_case):
         test_vector = utils.TestVector(test_case.name, test_case.origin)
         for line in test_case.content.split('\n'):
@@ -141,3 +150,14 @@ class CrestTestConverter(TestConverter):
     @staticmethod
     def _get_file_name(test_file):
         return os.path.basename(test_file)
+
+
+def create_input_generator(args):
+    return InputGenerator(
+        args.log_verbose,
+        args.ig_options,
+        machine_model=args.machine_model)
+
+
+def create_test_converter(args, nondet_methods):
+    return CrestTestConverter()
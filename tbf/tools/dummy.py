@@ -3,6 +3,7 @@ from tbf.input_generation import BaseInputGenerator
 from tbf.testcase_converter import TestConverter
 
 name = "Dummy"
+tests_dir = '.'
 
 
 class Preprocessor:
@@ -65,3 +66,15 @@ class DummyTestConverter(TestConverter):
 
     def get_test_vector(self, test_case):
         raise NotImplementedError("Should never be called")
+
+
+def create_input_generator(args):
+    return InputGenerator(
+        args.machine_model,
+        args.log_verbose,
+        args.ig_options
+    )
+
+
+def create_test_converter(args, nondet_methods):
+    return DummyTestConverter()
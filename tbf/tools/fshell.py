@@ -3,6 +3,7 @@ import os
 import tbf.utils as utils
 from tbf.input_generation import BaseInputGenerator
 from tbf.testcase_converter import TestConverter
+from tbf.testcase_intake import TailReader
 
 name = "fshell"
 module_dir = os.path.dirname(os.path.realpath(__file__))
@@ -68,41 +69,72 @@ class InputGenerator(BaseInputGenerator):
         return [input_generation_cmd]
 
 
+class _TestSuiteState(object):
+    """Parser state of a partially read test suite."""
+
+    def __init__(self):
+        self.suite_count = 0
+        self.count = 0
+        self.curr_test = list()
+        self.test_cases = list()
+
+
 class FshellTestConverter(TestConverter):
 
     def __init__(self, nondet_methods):
         self._interesting_methods = [m['name'].replace('nondet', '_nondet') for m in nondet_methods]
+        # The test suite grows while fshell runs, so we only parse the lines appended since the last call
+        self._reader = TailReader()
+        self._suites = dict()
 
     def _get_test_cases_in_dir(self, directory=None, exclude=None):
         if directory is None:
             directory = tests_dir
+        if exclude is None:
+            exclude = ()
         tests_file = os.path.join(directory, 'testsuite.txt')
-        if os.path.exists(tests_file):
-            with open(tests_file, 'r') as inp:
-                content = [l.strip() for l in inp.readlines()]
-            if len([l for l in content if "Test Suite" in l]) > 1:
-                raise AssertionError("More than one test suite exists in " +
-                                     tests_file)
-
-            curr_test = list()
-            test_cases = list()
-            count = 0
-            for line in content:
-                if line.startswith("IN:"):
-                    test_name = str(count)
-                    if test_name not in exclude and count > 0:
-                        test_cases.append(
-                            utils.TestCase(test_name, tests_file, curr_test))
-                    curr_test = list()
-                    count += 1
-                if any(line.startswith(m + '(') for m in self._interesting_methods):
-                    test_value = line.split("=")[1]
-                    curr_test.append(test_value)
-            test_name = str(count)
-            if curr_test and test_name not in exclude:
-                test_cases.append(
-                    utils.TestCase(test_name, tests_file, curr_test))
-            return test_cases
+        new_lines, restarted = self._reader.read_new_lines(tests_file)
+        if restarted or tests_file not in self._suites:
+            self._suites[tests_file] = _TestSuiteState()
+        suite = self._suites[tests_file]
+
+        for line in new_lines:
+            line = line.strip()
+            if "Test Suite" in line:
+                suite.suite_count += 1
+                if suite.suite_count > 1:
+                    raise AssertionError("More than one test suite exists in " + tests_file)
+            if line.startswith("IN:"):
+                if suite.count > 0:
+                    suite.test_cases.append(utils.TestCase(str(suite.count), tests_file, suite.curr_test))
+                suite.curr_test = list()
+                suite.count += 1
+            if any(line.startswith(m + '(') for m in self._interesting_methods):
+                test_value = line.split("=")[1]
+                suite.curr_test.append(test_value)
+
+        test_cases = [t for t in suite.test_cases if t.name not in exclude]
+        test_name = str(suite.count)
+        if suite.curr_test and test_name not in exclude:
+            test_cases.append(utils.TestCase(test_name, tests_file, list(suite.curr_test)))
+        return test_cases
+
+    def get_test_directories(self, directory=None):
+        if directory is None:
+            directory = tests_dir
+        return [directory]
+
+    def is_test_file(self, test_file):
+        return os.path.basename(test_file) == 'testsuite.txt'
+
+    def is_growing_test_file(self, test_file):
+        return self.is_test_file(test_file)
+
+    def get_test_vectors_from_files(self, test_files, exclude=None):
+        # All test cases are in a single file, so we have to look at the full test suite
+        test_suites = [f for f in test_files if self.is_test_file(f)]
+        if test_suites:
+            return self.get_test_vectors(os.path.dirname(test_suites[0]), exclude)
         else:
             return []
 
@@ -122,3 +154,11 @@ class FshellTestConverter(TestConverter):
             vector.add(tv)
 
         return vector
+
+
+def create_input_generator(args):
+    return InputGenerator(args.machine_model, args.log_verbose, args.ig_options)
+
+
+def create_test_converter(args, nondet_methods):
+    return FshellTestConverter(nondet_methods)
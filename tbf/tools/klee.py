@@ -2,6 +2,7 @@ import glob
 import logging
 import os
 
+import tbf.ktest as ktest
 import tbf.utils as utils
 from tbf.input_generation import BaseInputGenerator
 from tbf.testcase_converter import TestConverter
@@ -87,6 +88,7 @@ class InputGenerator(BaseInputGenerator):
             '-I', include_dir, '-emit-llvm', '-c', '-g', '-o', compiled_file,
             filename
         ]
+        compile_cmd = utils.CompileCommand(compile_cmd, inputs=[filename, include_dir], outputs=[compiled_file])
         input_generation_cmd = ['klee']
         if self.timelimit > 0:
             input_generation_cmd += ['-max-time', str(self.timelimit)]
@@ -114,68 +116,51 @@ class KleeTestConverter(TestConverter):
             tcs.append(self._get_test_case_from_file(t))
         return tcs
 
+    def get_test_directories(self, directory=None):
+        if directory is None:
+            directory = tests_dir
+        return [directory]
+
+    def is_test_file(self, test_file):
+        return test_file.endswith('.ktest')
+
     def _get_test_case_from_file(self, test_file):
         file_name = self._get_test_name(test_file)
         with open(test_file, mode='rb') as inp:
             content = inp.read()
         return utils.TestCase(file_name, test_file, content)
 
+    def get_priority_hint(self, test_vector):
+        # KLEE writes a file 'testN.<type>.err' next to each test that triggers an error, e.g., a failing assertion
+        error_files = glob.glob(glob.escape(os.path.splitext(test_vector.origin)[0]) + '.*.err')
+        return 1 if error_files else 0
+
     def get_test_vector(self, test):
-        def _get_value(single_line):
-            var_name = single_line.split(':')[2].strip()
-            prefix_end = var_name.find("'")
-            var_name = var_name[prefix_end + 1:-1]
-            return var_name
-
-        def _convert_bytestring_to_hex(bytestring):
-            bytes = bytestring.split(r'\x')
-            value = ''.join(reversed(bytes))
-            value = '0x' + value
-            return value
-
-        def _get_var_number(test_info_line):
-            assert 'object' in test_info_line
-            # Object number should be at end, e.g. 'object  1: ...'
-            return test_info_line.split(':')[0].split(' ')[-1]
-
-        ktest_tool = [os.path.join(bin_dir, 'ktest-tool')]
-        exec_output = utils.execute(
-            ktest_tool + [test.origin], err_to_output=False, quiet=True)
-        test_info = exec_output.stdout.split('\n')
+        try:
+            ktest_content = ktest.read_ktest(test.content)
+        except utils.ParseError as e:
+            logging.warning("Can't read ktest file %s: %s", test.origin, e.msg)
+            ktest_content = ktest.KTest()
         vector = utils.TestVector(test.name, test.origin)
-        last_number = -1
-        last_nondet_method = None
-        last_value = None
-        for line in [l for l in test_info if l.startswith('object')]:
-            logging.debug("Looking at line: %s", line)
-            if 'name:' in line:
-                # assert len(line.split(':')) == 3
-                var_number = int(_get_var_number(line))
-                assert var_number > last_number
-                last_number = var_number
-                var_name = _get_value(line)
-                assert last_nondet_method is None, \
-                    "Last nondet method already or still assigned: %s" % last_nondet_method
-                assert "'" not in var_name, \
-                    "Variable name contains \"'\": %s" % var_name
-                last_nondet_method = utils.get_corresponding_method_name(
-                    var_name)
-            elif 'data:' in line:
-                # assert len(line.split(':')) == 3
-                var_number = _get_var_number(line)
-                assert last_nondet_method is not None
-                # we get the value in bytestring notation, so we have to convert it afterwards
-                value = _get_value(line)
-                value = _convert_bytestring_to_hex(value)
-                assert last_value is None
-                last_value = str(value)
-            if last_nondet_method is not None and last_value is not None:
-                vector.add(last_value, last_nondet_method)
-                last_nondet_method = None
-                last_value = None
+        for name, data in ktest_content.objects:
+            var_name = name.decode(errors='replace')
+            logging.debug("Looking at object %s", var_name)
+            vector.add(ktest.get_test_value(data), utils.get_corresponding_method_name(var_name))
 
         return vector
 
     @staticmethod
     def _get_test_name(test_file):
         return os.path.basename(test_file).split('.')[0]
+
+
+def create_input_generator(args):
+    return InputGenerator(
+        args.ig_timelimit,
+        args.log_verbose,
+        args.ig_options,
+        machine_model=args.machine_model)
+
+
+def create_test_converter(args, nondet_methods):
+    return KleeTestConverter()
@@ -6,6 +6,11 @@
 #include<setjmp.h>
 #include<math.h>
 #include<stdint.h>
+#include<errno.h>
+#include<unistd.h>
+#include<sys/mman.h>
+#include<sys/prctl.h>
+#include<sys/wait.h>
 
 #include <sanitizer/coverage_interface.h>
 
@@ -15,25 +20,46 @@
 
 #define SUCCESS_STATUS 147
 
+// Number of worker processes that create tests in parallel
+#ifndef WORKERS
+#define WORKERS 1
+#endif
+
+// State shared by all worker processes
+struct shared_state {
+  // Number of generated, meaningful tests
+  unsigned int test_runs;
+  // Number of program runs that tried to produce meaningful tests
+  unsigned long long total_runs;
+  // Whether a test reached the error method
+  int done;
+  // Coverage bitmap with one entry per guard, set as soon as any worker covers the guard
+  unsigned char covered[];
+};
+
+static struct shared_state * shared = NULL;
+// Number of coverage guards in the program
+static uint32_t guard_count = 0;
+// Index of this worker process
+static int worker_id = 0;
+
 // Size of current test vector
 static unsigned int test_size = 0;
-// Number of generated, meaningful tests
-static unsigned int test_runs = 0;
-// Number of program runs that tried to produce meaningful tests
-static unsigned long long total_runs = 0;
 
 static int test_is_new = 0;
 static int done = 0;
 
+static pid_t workers[WORKERS] = {};
+
 static char test_vector[MAX_TEST_SIZE + 1][100] = {};
 
 unsigned int get_rand_seed() {
 #ifdef FIXED_SEED
-  return FIXED_SEED;
+  return FIXED_SEED + worker_id;
 #else
   struct timespec curr_time;
   clock_gettime(CLOCK_REALTIME, &curr_time);
-  return curr_time.tv_nsec;
+  return curr_time.tv_nsec + worker_id;
 #endif
 }
 
@@ -69,14 +95,22 @@ void abort_handler(int sig) {
   longjmp(env, 1);
 }
 
+void print_statistics() {
+  printf("\nNumber of program executions: %llu\n", shared->total_runs);
+  printf("Number of created tests: %u\n", shared->test_runs);
+}
+
 void exit_handler(int status, void * nullarg) {
   if (done) {
-    printf("\nNumber of program executions: %llu\n", total_runs);
-    printf("Number of created tests: %u\n", test_runs);
+    // With multiple workers, the parent process prints the statistics of all workers
+    if (WORKERS == 1) {
+      print_statistics();
+    }
     exit(0);
   } else if (status == SUCCESS_STATUS) {
     write_test();
     done = 1;
+    __atomic_store_n(&shared->done, 1, __ATOMIC_SEQ_CST);
     exit_handler(status, NULL);
   } else {
     on_exit(exit_handler, NULL);
@@ -89,12 +123,19 @@ void exit_gracefully(int sig) {
   exit(-sig);
 }
 
+void stop_workers(int sig) {
+  for (int i = 0; i < WORKERS; i++) {
+    if (workers[i] > 0) {
+      kill(workers[i], sig);
+    }
+  }
+}
+
 void __sanitizer_cov_trace_pc_guard_init(uint32_t *start,
                                                     uint32_t *stop) {
-  static uint64_t N;  // Counter for the guards.
   if (start == stop || *start) return;  // Initialize only once.
   for (uint32_t *x = start; x < stop; x++)
-    *x = ++N;  // Guards should start from 1.
+    *x = ++guard_count;  // Guards should start from 1.
 }
 
 void __sanitizer_cov_trace_pc_guard(uint32_t * guard) {
@@ -102,21 +143,26 @@ void __sanitizer_cov_trace_pc_guard(uint32_t * guard) {
     return;
   }
 
+  // Guards that are covered before the shared state exists are covered by all workers,
+  // so they don't have to be marked in the shared bitmap
+  if (shared == NULL || !__atomic_exchange_n(&shared->covered[*guard], 1, __ATOMIC_RELAXED)) {
+    test_is_new = 1;
+  }
   *guard = 0;
-  test_is_new = 1;
 }
 
-int main() {
+void run_worker() {
   srand(get_rand_seed());
   signal(SIGINT, exit_gracefully);
   signal(SIGTERM, exit_gracefully);
   signal(SIGABRT, abort_handler);
   on_exit(exit_handler, NULL);
 
-  while (test_runs < MAX_TEST_NUMBER) {
+  while (!__atomic_load_n(&shared->done, __ATOMIC_SEQ_CST)
+      && __atomic_load_n(&shared->test_runs, __ATOMIC_SEQ_CST) < MAX_TEST_NUMBER) {
     reset_test_vector();
     if (setjmp(env) == 0) {
-      total_runs++;
+      __atomic_fetch_add(&shared->total_runs, 1, __ATOMIC_RELAXED);
       __main();
     }
     if (test_is_new) {
@@ -127,6 +173,50 @@ int main() {
   exit(0);
 }
 
+int main() {
+  size_t shared_size = sizeof(struct shared_state) + guard_count + 1;
+  shared = mmap(NULL, shared_size, PROT_READ | PROT_WRITE, MAP_SHARED | MAP_ANONYMOUS, -1, 0);
+  if (shared == MAP_FAILED) {
+    perror("Can't create shared memory");
+    return 1;
+  }
+
+  if (WORKERS == 1) {
+    run_worker();
+  }
+
+  // Stop all workers if we are stopped. This must be set before the workers are started,
+  // because each worker replaces it with its own handler.
+  signal(SIGINT, stop_workers);
+  signal(SIGTERM, stop_workers);
+  pid_t parent = getpid();
+  for (int i = 0; i < WORKERS; i++) {
+    pid_t pid = fork();
+    if (pid == 0) {
+      worker_id = i;
+      // The parent may be killed without a chance to stop the workers, so they stop themselves
+      prctl(PR_SET_PDEATHSIG, SIGTERM);
+      if (getppid() != parent) {
+        exit(0);
+      }
+      run_worker();
+    } else if (pid < 0) {
+      perror("Can't start worker process");
+      break;
+    }
+    workers[i] = pid;
+  }
+
+  while (wait(NULL) > 0 || errno == EINTR) {
+    // Workers that are still executing the program don't notice that the error was reached
+    if (__atomic_load_n(&shared->done, __ATOMIC_SEQ_CST)) {
+      stop_workers(SIGTERM);
+    }
+  }
+  print_statistics();
+  return 0;
+}
+
 void reset_test_vector() {
   for (int i = 0; i < MAX_TEST_SIZE && test_vector[i][0] != 0; i++) {
     memset(test_vector[i], 0, 1);
@@ -136,15 +226,19 @@ void reset_test_vector() {
 }
 
 void write_test() {
-  unsigned int digits_needed = log10(test_runs+1) + 1;
+  // Tests are numbered across all workers
+  unsigned int test_number = __atomic_fetch_add(&shared->test_runs, 1, __ATOMIC_SEQ_CST);
+  unsigned int digits_needed = log10(test_number+1) + 1;
   // 11 characters for vector.test, 1 for \0
   char vector_name[11+1+digits_needed];
-  sprintf(vector_name, "vector%u.test", test_runs);
-  FILE *vector = fopen("tmp_vector", "w");
+  sprintf(vector_name, "vector%u.test", test_number);
+  // Each worker writes to its own temporary file
+  char tmp_name[32];
+  snprintf(tmp_name, sizeof(tmp_name), "tmp_vector%d", worker_id);
+  FILE *vector = fopen(tmp_name, "w");
   for (int i = 0; test_vector[i][0] != '\0'; i++) {
       fprintf(vector, "%s\n", test_vector[i]);
   }
   fclose(vector);
-  rename("tmp_vector", vector_name);
-  test_runs++;
+  rename(tmp_name, vector_name);
 }
@@ -1,3 +1,4 @@
+import fnmatch
 import glob
 import os
 import pathlib
@@ -10,6 +11,8 @@ name = "prtest"
 module_dir = pathlib.Path(__file__).resolve().parent
 include_dir = module_dir / "random" / "include"
 generator_harness = module_dir / "random" / "random_tester.c"
+tests_dir = '.'
+test_name_pattern = 'vector[0-9]*.test'
 
 SUCCESS_EXIT_STATUS = 147
 
@@ -58,8 +61,14 @@ class Preprocessor:
 
 class InputGenerator(BaseInputGenerator):
 
-    def __init__(self, machine_model, log_verbose, additional_options):
+    def __init__(self, machine_model, log_verbose, additional_options, workers=1):
+        """Create a new input generator for PRTest.
+
+        :param int workers: the number of worker processes that create tests in parallel, each with a different seed.
+            The workers share their coverage, so that each test covers a coverage guard no earlier test covered.
+        """
         super().__init__(machine_model, log_verbose, additional_options, Preprocessor(), show_tool_output=True)
+        self.workers = workers
 
     def get_run_env(self):
         return utils.get_env()
@@ -72,9 +81,11 @@ class InputGenerator(BaseInputGenerator):
         machinem_arg = self.machine_model.compile_parameter
         compile_cmd = [
             'clang', '-std=gnu11', "-fsanitize-coverage=trace-pc-guard", machinem_arg,
-            '-DSUCCESS_STATUS=' + str(SUCCESS_EXIT_STATUS), '-I', str(include_dir),
+            '-DSUCCESS_STATUS=' + str(SUCCESS_EXIT_STATUS), '-DWORKERS=' + str(self.workers), '-I', str(include_dir),
             '-o', compiled_file, str(generator_harness), filename, '-lm'
         ]
+        compile_cmd = utils.CompileCommand(
+            compile_cmd, inputs=[str(generator_harness), filename, str(include_dir)], outputs=[compiled_file])
 
         input_generation_cmd = [compiled_file]
         if cli_options:
@@ -94,10 +105,18 @@ class RandomTestConverter(TestConverter):
             content = inp.read()
         return utils.TestCase(self._get_test_name(test_file), test_file, content)
 
+    def get_test_directories(self, directory=None):
+        if directory is None:
+            directory = tests_dir
+        return [directory]
+
+    def is_test_file(self, test_file):
+        return fnmatch.fnmatch(self._get_test_name(test_file), test_name_pattern)
+
     def _get_test_cases_in_dir(self, directory=None, exclude=()):
         if directory is None:
-            directory = '.'
-        all_tests = [t for t in glob.glob(directory + '/vector[0-9]*.test')]
+            directory = tests_dir
+        all_tests = [t for t in glob.glob(directory + '/' + test_name_pattern)]
         tcs = list()
         for t in [
             t for t in all_tests if self._get_test_name(t) not in exclude
@@ -120,3 +139,11 @@ class RandomTestConverter(TestConverter):
             vector.add(value)
 
         return vector
+
+
+def create_input_generator(args):
+    return InputGenerator(args.machine_model, args.log_verbose, args.ig_options, args.prtest_workers)
+
+
+def create_test_converter(args, nondet_methods):
+    return RandomTestConverter()
@@ -1,14 +1,19 @@
 import logging
+import multiprocessing
 import subprocess
 import os
 import hashlib
 import tempfile
-import pycparser
 import re
+import select
+import selectors
 from struct import unpack
 import codecs
+import heapq
+import itertools
 import shutil
 
+from decimal import Decimal
 from math import floor
 
 import threading
@@ -137,6 +142,8 @@ class TestVector(object):
         self.name = name
         self.origin = origin_file
         self._vector = list()
+        # The number of inputs the program read when this test vector was executed, if known
+        self.inputs_read = None
 
     def add(self, value, method=None):
         self._vector.append({'value': value, 'name': method})
@@ -160,6 +167,35 @@ class TestVector(object):
     def __str__(self):
         return self.origin + " (" + str(self.vector) + " )"
 
+    def get_canonical_values(self):
+        """Return the test inputs of this test vector in a canonical form.
+
+        Two test vectors with the same canonical values are read the same by the test harness.
+        Integer inputs are represented by their value, floating-point inputs by their exact value.
+        Inputs that the harness can't parse abort the harness, so all later inputs are ignored.
+        Inputs that the harness wouldn't read as a single line are kept as they are.
+
+        :return list: the canonical test inputs. Each input is a tuple.
+        """
+        canonical = list()
+        for item in self.vector:
+            value = item['value']
+            if type(value) is bytes:
+                value = value.decode('latin-1')
+            if '\n' in value or '\0' in value or len(value) >= _HARNESS_LINE_LENGTH:
+                canonical.append(('raw', value))
+                continue
+
+            parsed_value = parse_c_value(value)
+            if parsed_value is None:
+                canonical.append(('invalid',))
+                break
+            elif type(parsed_value) is int:
+                canonical.append(('int', parsed_value))
+            else:
+                canonical.append(('float', _get_exact_value(value)))
+        return canonical
+
 
 class ConfigError(Exception):
 
@@ -189,6 +225,56 @@ class CompileError(Exception):
         self.cause = cause
 
 
+class ForkServerError(Exception):
+
+    def __init__(self, msg=None, cause=None):
+        self.msg = msg
+        self.cause = cause
+
+
+class CompileCommand(list):
+    """Command line of a compilation, with its input and output files.
+
+    A compile command is a list of command-line arguments, just like any other command,
+    but it also knows which files it reads and creates.
+    This allows to reuse the outputs of earlier, identical compilations.
+    """
+
+    def __init__(self, command, inputs, outputs, env_keys=()):
+        """Create a new compile command.
+
+        :param Sequence[str] command: the command line
+        :param Sequence[str] inputs: all source files and directories the compilation depends on
+        :param Sequence[str] outputs: all files the compilation creates
+        :param Sequence[str] env_keys: names of all environment variables that influence the compilation
+        """
+        super().__init__(command)
+        self.inputs = [str(i) for i in inputs]
+        self.outputs = [str(o) for o in outputs]
+        self.env_keys = list(env_keys)
+
+
+class ParallelCommands(object):
+    """Commands that run at the same time, e.g., multiple instances of a test-case generator.
+
+    The commands are run and stopped together, and each of them can be pinned to a CPU core.
+    """
+
+    def __init__(self, commands, cpus=None):
+        """Create new parallel commands.
+
+        :param Sequence[Sequence[str]] commands: the command lines
+        :param Sequence[int] cpus: the CPU core to pin each command to. Commands with CPU core None
+            are not pinned. If None, no command is pinned.
+        """
+        self.commands = [list(c) for c in commands]
+        self.cpus = list(cpus) if cpus is not None else [None] * len(self.commands)
+        assert len(self.cpus) == len(self.commands)
+
+    def __str__(self):
+        return ' & '.join(' '.join(c) for c in self.commands)
+
+
 class ExecutionResult(object):
     """Results of a subprocess execution."""
 
@@ -248,9 +334,320 @@ class VerdictUnknown(Verdict):
         super().__init__(UNKNOWN)
 
 
+class StopEvent(object):
+    """Event that tells to stop, and that is set as soon as its parent event is set.
+
+    The event can be waited on and can be given to child processes at their creation.
+    Callbacks are called in the process that added them, even if another process sets the event.
+    """
+
+    def __init__(self, parent=None):
+        self._event = multiprocessing.Event()
+        self._pid = os.getpid()
+        self._callbacks = list()
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent.add_callback(self.set)
+
+    def __getstate__(self):
+        # Callbacks belong to the process that added them
+        return {'_event': self._event}
+
+    def __setstate__(self, state):
+        self._event = state['_event']
+        self._pid = None
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            # We are in a child process, where the callbacks of the parent process don't apply.
+            # The parent process may set the event, so we wait for it in a separate thread.
+            self._pid = os.getpid()
+            self._callbacks = list()
+            self._lock = threading.Lock()
+            threading.Thread(target=self._wait_and_call_back, daemon=True).start()
+
+    def _wait_and_call_back(self):
+        self._event.wait()
+        self._call_back()
+
+    def _call_back(self):
+        with self._lock:
+            callbacks = self._callbacks
+            self._callbacks = list()
+        for callback in callbacks:
+            callback()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        self._check_process()
+        self._event.set()
+        self._call_back()
+
+    def wait(self, timeout=None):
+        """Block until the event is set or the timeout is reached.
+
+        :return bool: whether the event is set
+        """
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback):
+        """Call the given function without arguments as soon as this event is set.
+
+        If the event is already set, the function is called immediately.
+        """
+        self._check_process()
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        self._check_process()
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
 def set_stop_timer(timelimit, stop_event):
     timewatcher = threading.Timer(timelimit, stop_event.set)
     timewatcher.start()
+    return timewatcher
+
+
+class _SupervisedProcess(object):
+
+    def __init__(self, process, timelimit, stop_flag):
+        self.process = process
+        self.timelimit = timelimit
+        self.deadline = time.monotonic() + timelimit if timelimit else None
+        self.stop_flag = stop_flag
+        # A StopEvent tells when it is set, all other stop flags have to be polled
+        self.polled = stop_flag is not None and not isinstance(stop_flag, StopEvent)
+
+
+# Guards the start of the process supervisor, which happens lazily when the first process is supervised
+_supervisor_start_lock = threading.Lock()
+if hasattr(os, 'register_at_fork'):
+    # A forked process may inherit the lock while another thread holds it
+    os.register_at_fork(after_in_child=lambda: globals().update(_supervisor_start_lock=threading.Lock()))
+
+
+class _ProcessSupervisor(object):
+    """Kills processes that exceed their time limit or whose stop flag is set.
+
+    A single thread supervises all processes started by `execute`.
+    It sleeps until the next deadline or until a StopEvent is set.
+    Only stop flags of other types are polled.
+    """
+
+    # Interval in seconds in which stop flags are checked
+    STOP_FLAG_INTERVAL = 0.01
+
+    def __init__(self):
+        self._pid = None
+        self._condition = None
+        self._thread = None
+        self._processes = None
+        self._deadlines = None
+        self._next_id = None
+
+    def _start(self):
+        # Threads don't survive a fork, so a forked process starts its own supervisor
+        with _supervisor_start_lock:
+            if self._pid == os.getpid():
+                # Another thread started the supervisor in the meantime
+                return
+            self._condition = threading.Condition()
+            self._processes = dict()
+            # Heap of (deadline, process id)
+            self._deadlines = list()
+            self._next_id = itertools.count()
+            self._thread = threading.Thread(target=self._supervise, name='process-supervisor', daemon=True)
+            self._thread.start()
+            # Set last, so that other threads only use the supervisor after it is completely started
+            self._pid = os.getpid()
+
+    def add(self, process, timelimit=None, stop_flag=None):
+        """Supervise the given process until `remove` is called for the returned id.
+
+        :param subprocess.Popen process: the process to supervise
+        :param timelimit: the time limit for the process, in seconds
+        :param stop_flag: an event that tells to kill the process
+        :return: the id of the supervised process
+        """
+        if not timelimit and not stop_flag:
+            return None
+        if self._pid != os.getpid():
+            self._start()
+        supervised = _SupervisedProcess(process, timelimit, stop_flag)
+        with self._condition:
+            process_id = next(self._next_id)
+            self._processes[process_id] = supervised
+            if supervised.deadline is not None:
+                heapq.heappush(self._deadlines, (supervised.deadline, process_id))
+            self._condition.notify()
+        if stop_flag is not None and not supervised.polled:
+            stop_flag.add_callback(self._wake_up)
+        return process_id
+
+    def remove(self, process_id):
+        """Stop supervising the process with the given id."""
+        if process_id is None:
+            return
+        with self._condition:
+            supervised = self._processes.pop(process_id, None)
+        if supervised and supervised.stop_flag is not None and not supervised.polled:
+            supervised.stop_flag.remove_callback(self._wake_up)
+
+    def _wake_up(self):
+        with self._condition:
+            self._condition.notify()
+
+    def _kill(self, process_id):
+        supervised = self._processes.pop(process_id)
+        logging.info("Timeout of %ss expired or told to stop. Killing process.",
+                     supervised.timelimit if supervised.timelimit else "- ")
+        supervised.process.kill()
+        if supervised.stop_flag is not None and not supervised.polled:
+            supervised.stop_flag.remove_callback(self._wake_up)
+
+    def _supervise(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._deadlines and (self._deadlines[0][0] <= now
+                                           or self._deadlines[0][1] not in self._processes):
+                    _, process_id = heapq.heappop(self._deadlines)
+                    if process_id in self._processes:
+                        self._kill(process_id)
+
+                for process_id, supervised in list(self._processes.items()):
+                    if supervised.stop_flag and supervised.stop_flag.is_set():
+                        self._kill(process_id)
+
+                timeout = None
+                if self._deadlines:
+                    timeout = self._deadlines[0][0] - now
+                if any(supervised.polled for supervised in self._processes.values()):
+                    timeout = min(timeout, self.STOP_FLAG_INTERVAL) if timeout is not None \
+                        else self.STOP_FLAG_INTERVAL
+                self._condition.wait(timeout)
+
+
+_process_supervisor = _ProcessSupervisor()
+
+
+class _TailBuffer(object):
+    """Buffer that only keeps the last bytes written to it, up to a maximum size."""
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._content = bytearray()
+        self.truncated = False
+
+    def write(self, data):
+        self._content += data
+        if self._max_size is not None and len(self._content) > self._max_size:
+            del self._content[:len(self._content) - self._max_size]
+            self.truncated = True
+
+    def getvalue(self):
+        if self.truncated:
+            return strip_partial_character(bytes(self._content))
+        return bytes(self._content)
+
+
+def strip_partial_character(data):
+    """Remove the rest of a UTF-8 encoded character from the start of the given bytes.
+
+    If output is truncated, its kept end may start in the middle of a multibyte character.
+
+    :param bytes data: the end of some UTF-8 encoded output
+    :return bytes: the given bytes without leading UTF-8 continuation bytes
+    """
+    start = 0
+    # A UTF-8 encoded character has at most three continuation bytes
+    while start < min(len(data), 3) and 0x80 <= data[start] <= 0xbf:
+        start += 1
+    return data[start:]
+
+
+def _communicate_streaming(process, input_str, stop_on_output, output_limit):
+    """Exchange data with the given process until it closes its output, like Popen.communicate.
+
+    If stop_on_output is given and appears in the error output of the process
+    (or in its output, if the error output isn't piped separately), the process is killed.
+    Only the last output_limit bytes of each output are kept.
+    All data after the first occurrence of stop_on_output is dropped.
+
+    :return (bytes, bytes): the output and the error output of the process
+    """
+    buffers = {process.stdout: _TailBuffer(output_limit)}
+    if process.stderr:
+        buffers[process.stderr] = _TailBuffer(output_limit)
+        scanned_stream = process.stderr
+    else:
+        scanned_stream = process.stdout
+    if stop_on_output is not None and type(stop_on_output) is not bytes:
+        stop_on_output = stop_on_output.encode()
+    # The end of the last read chunk, to find stop_on_output if it's split between two chunks
+    scanned_tail = b''
+
+    with selectors.DefaultSelector() as selector:
+        for stream in buffers:
+            selector.register(stream, selectors.EVENT_READ)
+        input_view = memoryview(input_str) if input_str else None
+        input_offset = 0
+        if process.stdin:
+            if input_view:
+                selector.register(process.stdin, selectors.EVENT_WRITE)
+            else:
+                process.stdin.close()
+
+        found = False
+        while selector.get_map() and not found:
+            for key, _ in selector.select():
+                if key.fileobj is process.stdin:
+                    try:
+                        # Writes of at most PIPE_BUF bytes don't block if the pipe is writable
+                        input_offset += os.write(key.fd, input_view[input_offset:input_offset + select.PIPE_BUF])
+                    except BrokenPipeError:
+                        input_offset = len(input_view)
+                    if input_offset >= len(input_view):
+                        selector.unregister(process.stdin)
+                        process.stdin.close()
+                    continue
+
+                data = os.read(key.fd, 32768)
+                if not data:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    continue
+                if stop_on_output and key.fileobj is scanned_stream:
+                    position = (scanned_tail + data).find(stop_on_output)
+                    if position >= 0:
+                        # Keep the data up to the end of the line that contains stop_on_output
+                        end = position - len(scanned_tail) + len(stop_on_output)
+                        line_end = data.find(b'\n', max(end, 0))
+                        data = data[:line_end + 1] if line_end >= 0 else data
+                        found = True
+                    scanned_tail = (scanned_tail + data)[-len(stop_on_output):]
+                buffers[key.fileobj].write(data)
+                if found:
+                    logging.debug("Found '%s' in output, killing process.", stop_on_output.decode(errors='replace'))
+                    process.kill()
+                    break
+
+    for stream in [process.stdin, process.stdout, process.stderr]:
+        if stream and not stream.closed:
+            stream.close()
+    process.wait()
+    if any(buffer.truncated for buffer in buffers.values()):
+        logging.debug("Output of process was longer than %s bytes, only kept the last bytes", output_limit)
+    return buffers[process.stdout].getvalue(), buffers[process.stderr].getvalue() if process.stderr else None
 
 
 def execute(command,
@@ -260,28 +657,27 @@ def execute(command,
             stop_flag=None,
             input_str=None,
             timelimit=None,
-            show_output=False):
-
-    def wait_and_terminate(timelimit, stop_flag, process):
-        def shut_down(process):
-            process.kill()
-            returncode = process.wait()
-
-            return returncode
-
-        if timelimit:
-            stopwatch = Stopwatch()
-            stopwatch.start()
-
-        returncode = process.poll()
-        while returncode is None:
-            if (stop_flag and stop_flag.is_set()) \
-                    or (timelimit and stopwatch.curr_s() > timelimit):
-                logging.info("Timeout of %ss expired or told to stop. Killing process.", timelimit if timelimit else "- ")
-                returncode = shut_down(process)
-            else:
-                time.sleep(0.001)
-                returncode = process.poll()
+            show_output=False,
+            stop_on_output=None,
+            output_limit=None,
+            cpu=None):
+    """Execute the given command.
+
+    :param command: the command to execute, as list of arguments
+    :param bool quiet: whether to log the command on debug level only
+    :param dict env: the environment to execute the command in. If None, the current environment is used.
+    :param bool err_to_output: whether to merge the error output into the output
+    :param stop_flag: an event that tells to kill the process
+    :param input_str: the input for the process, as str or bytes
+    :param timelimit: the time limit for the process, in seconds
+    :param bool show_output: whether to log the output of the process on info level
+    :param stop_on_output: if given, the process is killed as soon as this str appears in its error output
+        (or in its output, if err_to_output is True)
+    :param int output_limit: if given, only the last output_limit bytes of the output
+        and of the error output are kept
+    :param int cpu: if given, the process is pinned to this CPU core
+    :return ExecutionResult: the result of the execution
+    """
 
     log_cmd = logging.debug if quiet else logging.info
 
@@ -299,12 +695,23 @@ def execute(command,
         stderr=subprocess.STDOUT if err_to_output else subprocess.PIPE,
         universal_newlines=False,
         env=env)
+    if cpu is not None:
+        # preexec_fn isn't safe if other threads are running, so we pin the process after its start
+        try:
+            os.sched_setaffinity(p.pid, {cpu})
+        except OSError as e:
+            logging.debug("Couldn't pin process %s to CPU %s: %s", p.pid, cpu, e)
 
-    waiter = threading.Thread(target=wait_and_terminate, args=(timelimit, stop_flag, p))
-    waiter.start()
-    if input_str and type(input_str) is not bytes:
-        input_str = input_str.encode()
-    output, err_output = p.communicate(input=input_str)
+    supervised_id = _process_supervisor.add(p, timelimit, stop_flag)
+    try:
+        if input_str and type(input_str) is not bytes:
+            input_str = input_str.encode()
+        if stop_on_output is not None or output_limit is not None:
+            output, err_output = _communicate_streaming(p, input_str, stop_on_output, output_limit)
+        else:
+            output, err_output = p.communicate(input=input_str)
+    finally:
+        _process_supervisor.remove(supervised_id)
     returncode = p.poll()
 
     try:
@@ -324,6 +731,53 @@ def execute(command,
     return ExecutionResult(returncode, output, err_output)
 
 
+def execute_parallel(parallel_commands, stop_flag=None, **kwargs):
+    """Execute the given commands at the same time and wait for all of them to finish.
+
+    As soon as one of the commands ends, all other commands are stopped.
+
+    :param ParallelCommands parallel_commands: the commands to execute
+    :param StopEvent stop_flag: an event that tells to stop all commands
+    :param kwargs: the arguments for `execute`, for each of the commands
+    :return ExecutionResult: the combined result of all executions. Its return code is that of the
+        command that ended first.
+    :raises Exception: the first exception raised by the execution of a command, after all commands ended
+    """
+    # Set as soon as one of the commands ends, to stop all others
+    stop_commands = StopEvent(stop_flag)
+    results = [None] * len(parallel_commands.commands)
+    errors = list()
+    ended = list()
+    ended_lock = threading.Lock()
+
+    def execute_single(index):
+        try:
+            results[index] = execute(parallel_commands.commands[index], cpu=parallel_commands.cpus[index],
+                                     stop_flag=stop_commands, **kwargs)
+        except Exception as e:
+            with ended_lock:
+                errors.append(e)
+        finally:
+            with ended_lock:
+                ended.append(index)
+            stop_commands.set()
+
+    threads = [threading.Thread(target=execute_single, args=(i,)) for i in range(len(results))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if stop_flag is not None:
+        stop_flag.remove_callback(stop_commands.set)
+    if errors:
+        raise errors[0]
+
+    returncode = results[ended[0]].returncode
+    output = ''.join(r.stdout for r in results if isinstance(r.stdout, str))
+    err_output = ''.join(r.stderr for r in results if isinstance(r.stderr, str))
+    return ExecutionResult(returncode, output, err_output)
+
+
 def get_executable(exec):
     """
     Returns the full path to the given executable.
@@ -333,9 +787,26 @@ def get_executable(exec):
 
 
 def get_output_path(filename):
+    """Return the path of the given file in the output directory.
+
+    The output directory is created if it does not exist yet.
+    """
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
     return os.path.join(OUTPUT_DIR, filename)
 
 
+def set_output_dir(directory):
+    """Set the directory that all persistent output files are written to.
+
+    The directory is created if it does not exist yet.
+    """
+    global OUTPUT_DIR
+    OUTPUT_DIR = os.path.abspath(directory)
+    if not os.path.exists(OUTPUT_DIR):
+        os.makedirs(OUTPUT_DIR)
+
+
 def create_temp():
     return tempfile.mkdtemp(prefix='tbf_')
 
@@ -443,78 +914,122 @@ class Stopwatch(object):
         return str_rep
 
 
+_COMMENT_PATTERN = re.compile(r'/\*.*?\*/')
+_COMMENT_START_PATTERN = re.compile(r'/\*.*')
+_COMMENT_END_PATTERN = re.compile(r'.*\*/')
+_SIMPLE_ATTRIBUTE_PATTERN = re.compile(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\)\)\s*')
+_ATTRIBUTE_PATTERN = re.compile(r'__attribute__\s*\(\(.*\)\)\s*')
+_ATTRIBUTE_START_PATTERN = re.compile(r'__attribute__\s*\(\(.*')
+_ATTRIBUTE_END_PATTERN = re.compile(r'.*\)\)')
+# GCC extensions and their replacements, in the order they are rewritten
+_GCC_KEYWORD_REWRITES = (
+    ('__extension__', ''),
+    ('__restrict', ''),
+    ('__restrict__', ''),
+    ('__inline__', ''),
+    ('__inline', ''),
+    ('__const', 'const'),
+    ('__signed__', 'signed'),
+    ('__builtin_va_list', 'int'),
+)
+_STRUCT_START_PATTERN = re.compile(r'^\s*struct\s+[a-zA-Z0-9_]+\s*{\s*$')
+_STRUCT_END_PATTERN = re.compile(r'^\s*}\s*;\s*$')
+_EMPTY_LINE_PATTERN = re.compile(r'^\s*$')
+_ASM_START_PATTERN = re.compile(r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*$')
+_ASM_END_PATTERN = re.compile(r'\)\s*;\s*$')
+_ASM_PATTERN = re.compile(r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*\)\s*;\s*$')
+_ASM_RENAMING_PATTERN = re.compile(r'__asm__\s*\(""\s+"[a-zA-Z0-9_]+"\)')
+
+
 def _rewrite_cproblems(content):
+    """Rewrite the given preprocessed C code so that pycparser can parse it.
+
+    Removes comments, attributes and inline assembler, and rewrites GCC extensions to standard C.
+    The code is processed line by line, in a single pass. Lines that can't contain
+    any of the rewritten constructs are passed through without further checks.
+    """
     need_struct_body = False
     skip_asm = False
     in_attribute = False
     in_cxx_comment = False
-    prepared_content = ''
-    for line in [c + "\n" for c in content.split('\n')]:
+    prepared_lines = list()
+    for line in content.split('\n'):
+        line += '\n'
+        if not (in_cxx_comment or in_attribute or need_struct_body or skip_asm) \
+                and '__' not in line and '/*' not in line and 'struct' not in line:
+            prepared_lines.append(line)
+            continue
+
         # remove C++-style comments
         if in_cxx_comment:
-            if re.search(r'\*/', line):
-                line = re.sub(r'.*\*/', '', line)
+            if '*/' in line:
+                line = _COMMENT_END_PATTERN.sub('', line)
                 in_cxx_comment = False
             else:
                 line = ''
-        else:
-            line = re.sub(r'/\*.*?\*/', '', line)
-        if re.search(r'/\*', line):
-            line = re.sub(r'/\*.*', '', line)
+        elif '/*' in line:
+            line = _COMMENT_PATTERN.sub('', line)
+        if '/*' in line:
+            line = _COMMENT_START_PATTERN.sub('', line)
             in_cxx_comment = True
         # remove __attribute__
-        line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\)\)\s*', '', line)
-        # line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\(\s*[a-zA-Z0-9_, "\.]+\s*\)\s*\)\)\s*', '', line)
-        # line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\(\s*sizeof\s*\([a-z ]+\)\s*\)\s*\)\)\s*', '', line)
-        # line = re.sub(r'__attribute__\s*\(\(\s*[a-z_, ]+\s*\(\s*\([0-9]+\)\s*<<\s*\([0-9]+\)\s*\)\s*\)\)\s*', '', line)
-        line = re.sub(r'__attribute__\s*\(\(.*\)\)\s*', '', line)
-        if re.search(r'__attribute__\s*\(\(', line):
-            line = re.sub(r'__attribute__\s*\(\(.*', '', line)
+        if '__attribute__' in line:
+            line = _SIMPLE_ATTRIBUTE_PATTERN.sub('', line)
+            line = _ATTRIBUTE_PATTERN.sub('', line)
+        if '__attribute__' in line and _ATTRIBUTE_START_PATTERN.search(line):
+            line = _ATTRIBUTE_START_PATTERN.sub('', line)
             in_attribute = True
         elif in_attribute:
-            line = re.sub(r'.*\)\)', '', line)
+            line = _ATTRIBUTE_END_PATTERN.sub('', line)
             in_attribute = False
         # rewrite some GCC extensions
-        line = re.sub(r'__extension__', '', line)
-        line = re.sub(r'__restrict', '', line)
-        line = re.sub(r'__restrict__', '', line)
-        line = re.sub(r'__inline__', '', line)
-        line = re.sub(r'__inline', '', line)
-        line = re.sub(r'__const', 'const', line)
-        line = re.sub(r'__signed__', 'signed', line)
-        line = re.sub(r'__builtin_va_list', 'int', line)
+        if '__' in line:
+            for keyword, replacement in _GCC_KEYWORD_REWRITES:
+                if keyword in line:
+                    line = line.replace(keyword, replacement)
         # a hack for some C-standards violating code in LDV benchmarks
-        if need_struct_body and re.match(r'^\s*}\s*;\s*$', line):
+        if need_struct_body and _STRUCT_END_PATTERN.match(line):
             line = 'int __dummy; ' + line
             need_struct_body = False
         elif need_struct_body:
-            need_struct_body = re.match(r'^\s*$', line) is not None
-        elif re.match(r'^\s*struct\s+[a-zA-Z0-9_]+\s*{\s*$', line):
+            need_struct_body = _EMPTY_LINE_PATTERN.match(line) is not None
+        elif 'struct' in line and _STRUCT_START_PATTERN.match(line):
             need_struct_body = True
         # remove inline asm
-        if re.match(r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*$', line):
+        if '__asm__' in line and _ASM_START_PATTERN.match(line):
             skip_asm = True
-        elif skip_asm and re.search(r'\)\s*;\s*$', line):
+        elif skip_asm and _ASM_END_PATTERN.search(line):
             skip_asm = False
             line = '\n'
-        if (skip_asm or re.match(
-                r'^\s*__asm__(\s+volatile)?\s*\("([^"]|\\")*"[^;]*\)\s*;\s*$',
-                line)):
+        if skip_asm or ('__asm__' in line and _ASM_PATTERN.match(line)):
             line = '\n'
         # remove asm renaming
-        line = re.sub(r'__asm__\s*\(""\s+"[a-zA-Z0-9_]+"\)', '', line)
-        prepared_content += line
-    return prepared_content
+        if '__asm__' in line:
+            line = _ASM_RENAMING_PATTERN.sub('', line)
+        prepared_lines.append(line)
+    return ''.join(prepared_lines)
 
 
 def parse_file_with_preprocessing(file_content, machine_model, includes=()):
     preprocessed_content = preprocess(file_content, machine_model, includes)
     preprocessed_content = _rewrite_cproblems(preprocessed_content)
-    parser = pycparser.CParser()
-    ast = parser.parse(preprocessed_content)
+    ast = _get_parser().parse(preprocessed_content)
     return ast
 
 
+_parser = None
+
+
+def _get_parser():
+    # Creating a CParser builds the lexer and parser tables, so we only do it once per process
+    global _parser
+    if _parser is None:
+        import pycparser
+
+        _parser = pycparser.CParser()
+    return _parser
+
+
 def preprocess(file_content, machine_model, includes=()):
     mm_arg = machine_model.compile_parameter
 
@@ -535,13 +1050,25 @@ def preprocess(file_content, machine_model, includes=()):
     return p.stdout
 
 
-def find_nondet_methods(filename, svcomp_only, excludes=None):
+def find_nondet_methods(filename, svcomp_only, excludes=None, file_cache=None):
+    """Return the signatures of all functions that are declared, but not defined in the given program.
+
+    :param str filename: the program to search
+    :param bool svcomp_only: whether to only search for the __VERIFIER_nondet_* functions of SV-COMP.
+        If True, the program is not parsed, but searched with regular expressions.
+    :param excludes: names of functions to ignore
+    :param tbf.cache.FileCache file_cache: cache for the undefined functions of programs.
+        If None, only an in-memory cache is used.
+    :return list: a dict with keys 'name', 'type' and 'params' for each undefined function
+    """
+    import pycparser
+
     logging.debug("Finding undefined methods")
     with open(filename, 'r') as inp:
         file_content = inp.read()
     if not svcomp_only:
         try:
-            undefined_methods = _find_undefined_methods(file_content, excludes)
+            undefined_methods = _find_undefined_methods(file_content, excludes, file_cache)
         except pycparser.plyparser.ParseError as e:
             logging.warning("Parse failure with pycparser while parsing: %s", e)
             undefined_methods = _find_nondet_methods(file_content, excludes)
@@ -551,10 +1078,58 @@ def find_nondet_methods(filename, svcomp_only, excludes=None):
     return undefined_methods
 
 
-def _find_undefined_methods(file_content, excludes):
+# Increase whenever the computation of undefined functions changes
+_UNDEFINED_FUNCTIONS_VERSION = '1'
+# Maps cache keys to the undefined functions of a program, or to the error message of its parse failure
+_undefined_functions_memo = dict()
+
+
+def _get_undefined_functions_key(file_content, machine_model, includes):
+    import pycparser
+    import tbf.cache as cache
+
+    return cache.FileCache.get_value_key(
+        'undefined-functions', _UNDEFINED_FUNCTIONS_VERSION,
+        hashlib.sha256(file_content.encode()).hexdigest(), machine_model.name, list(includes),
+        cache.get_compiler_identity('gcc'), pycparser.__version__)
+
+
+def _find_undefined_methods(file_content, excludes, file_cache=None):
+    import pycparser
+
+    machine_model = MACHINE_MODEL_32
+    includes = ()
+    key = _get_undefined_functions_key(file_content, machine_model, includes)
+    cached = _undefined_functions_memo.get(key)
+    if cached is None and file_cache is not None:
+        cached = file_cache.get_value(key)
+        if cached is not None:
+            logging.info("Using cached undefined functions of program")
+    if cached is None:
+        try:
+            cached = {'functions': _get_undefined_functions(file_content, machine_model, includes)}
+        except pycparser.plyparser.ParseError as e:
+            cached = {'parse_error': str(e)}
+        if file_cache is not None:
+            try:
+                file_cache.put_value(key, cached)
+            except OSError as e:
+                logging.warning("Couldn't write to cache: %s", e)
+    _undefined_functions_memo[key] = cached
+
+    if 'parse_error' in cached:
+        raise pycparser.plyparser.ParseError(cached['parse_error'])
+    if not excludes:
+        excludes = ()
+    # Copy the signatures so that callers can't modify the cached ones
+    return [{'name': f['name'], 'type': f['type'], 'params': list(f['params'])}
+            for f in cached['functions'] if f['name'] not in excludes]
+
+
+def _get_undefined_functions(file_content, machine_model, includes):
     import tbf.ast_visitor as ast_visitor
 
-    ast = parse_file_with_preprocessing(file_content, MACHINE_MODEL_32)
+    ast = parse_file_with_preprocessing(file_content, machine_model, includes)
 
     func_decl_collector = ast_visitor.FuncDeclCollector()
     func_def_collector = ast_visitor.FuncDefCollector()
@@ -565,9 +1140,6 @@ def _find_undefined_methods(file_content, excludes):
     function_definitions = [f.name for f in func_def_collector.func_defs]
     function_definitions += IMPLICIT_FUNCTIONS
 
-    if excludes:
-        function_definitions += excludes
-
     undef_func_prepared = [
         f for f in function_declarations
         if ast_visitor.get_name(f) not in function_definitions
@@ -651,6 +1223,87 @@ def _prettify(func_def):
     return {'name': name, 'type': return_type, 'params': params}
 
 
+# Syntax accepted by strtoull and strtoll with base 0, and by strtold.
+# Leading whitespace is allowed, as defined by C's isspace.
+_C_INTEGER_PATTERN = re.compile(r'[ \t\n\v\f\r]*([+-]?)(0[xX][0-9a-fA-F]+|0[0-7]*|[1-9][0-9]*)')
+_C_DECIMAL_FLOAT_PATTERN = re.compile(r'[ \t\n\v\f\r]*[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?')
+_C_HEX_FLOAT_PATTERN = re.compile(
+    r'[ \t\n\v\f\r]*([+-]?0[xX]([0-9a-fA-F]+\.?[0-9a-fA-F]*|\.[0-9a-fA-F]+)([pP][+-]?[0-9]+)?)')
+_C_SPECIAL_FLOAT_PATTERN = re.compile(r'[ \t\n\v\f\r]*([+-]?)(inf|infinity|nan(\([0-9a-zA-Z_]*\))?)',
+                                      re.IGNORECASE)
+_MAX_ULLONG = 2**64 - 1
+# The test harness reads inputs with fgets into a buffer of this size, so longer inputs are split
+_HARNESS_LINE_LENGTH = 2999
+
+
+def _get_exact_value(float_value):
+    float_value = float_value.strip(' \t\n\v\f\r')
+    if not _C_DECIMAL_FLOAT_PATTERN.fullmatch(float_value):
+        # Hexadecimal floats, infinity and NaN are compared by their text
+        return float_value
+    # Sign, significant digits and exponent, without leading and trailing zeros
+    sign, digits, exponent = Decimal(float_value).as_tuple()
+    digits = list(digits)
+    while digits and digits[0] == 0:
+        digits.pop(0)
+    while digits and digits[-1] == 0:
+        digits.pop()
+        exponent += 1
+    if not digits:
+        exponent = 0
+    return sign, tuple(digits), exponent
+
+
+def parse_c_value(value):
+    """Parse the given test input the same way as the test harness does.
+
+    The harness tries strtoull, strtoll and strtold, in this order, and
+    uses the first one that consumes the full value.
+
+    :param value: the test input, as str or bytes, without the trailing newline
+    :return: the parsed value as an int in the range of unsigned long long, as a float,
+        or None if the value can't be parsed.
+        Float values are only as precise as Python's floats, not as precise as long double.
+    """
+    if type(value) is bytes:
+        value = value.decode('latin-1')
+    if value.endswith('\n'):
+        value = value[:-1]
+    if not value:
+        # strtoull parses the empty string as 0
+        return 0
+
+    # strtoll accepts the same syntax as strtoull, so we only have to look at strtoull
+    match = _C_INTEGER_PATTERN.fullmatch(value)
+    if match:
+        sign, number = match.groups()
+        if number[:2] in ('0x', '0X'):
+            number = int(number, 16)
+        elif number.startswith('0'):
+            number = int(number, 8)
+        else:
+            number = int(number)
+        if number > _MAX_ULLONG:
+            return _MAX_ULLONG
+        if sign == '-':
+            return (-number) & _MAX_ULLONG
+        return number
+
+    if _C_DECIMAL_FLOAT_PATTERN.fullmatch(value):
+        return float(value.strip(' \t\n\v\f\r'))
+    match = _C_HEX_FLOAT_PATTERN.fullmatch(value)
+    if match:
+        number = match.group(1)
+        if 'p' not in number.lower():
+            number += 'p0'
+        return float.fromhex(number)
+    match = _C_SPECIAL_FLOAT_PATTERN.fullmatch(value)
+    if match:
+        sign, name = match.group(1), match.group(2).lower()
+        return float(sign + ('nan' if name.startswith('nan') else 'inf'))
+    return None
+
+
 def get_sym_var_name(method_name):
     name = SYM_VAR_PREFIX + method_name
     logging.debug("Getting sym var name for method %s: %s", method_name, name)
@@ -726,13 +1379,16 @@ class StatisticsPool(object):
         self._stat_objects.append(stat)
         return stat
 
+    def add(self, statistics):
+        self._stat_objects.append(statistics)
+
     def __str__(self):
         return '\n\n'.join([str(s) for s in self._stat_objects])
 
 
 def found_err(run_result):
     if isinstance(run_result.stderr, bytes):
-        err_out = run_result.stderr.decode()
+        err_out = run_result.stderr.decode(errors='replace')
     else:
         err_out = run_result.stderr
     return run_result.stderr and ERROR_STRING in err_out
@@ -775,9 +1431,6 @@ MACHINE_MODEL_32 = MachineModel(32, "32 bit linux", 2, 4, 4, 8, 4, 8, 12,
 MACHINE_MODEL_64 = MachineModel(64, "64 bit linux", 2, 4, 8, 8, 4, 8, 16,
                                 '-m64')
 
-if not os.path.exists(OUTPUT_DIR):
-    os.mkdir(OUTPUT_DIR)
-
 EXTERNAL_DECLARATIONS = """
 struct _IO_FILE;
 typedef struct _IO_FILE FILE;